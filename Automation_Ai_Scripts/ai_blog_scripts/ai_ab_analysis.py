@@ -1,12 +1,27 @@
 import json
 import os
+import sys
+import numpy as np
 import pandas as pd
+from scipy.special import ndtr
 from ai_logger import logger
 import ai_utils
+import engagement_store
+import engagement_rollups
 
 # Files for processing and storing data
 LOG_JSON_FILE = "fetch_data.json"  # Raw JSON data
-OUTPUT_CSV = "ab_results.csv"  # Structured CSV output
+# Snapshots are appended to the partitioned Parquet dataset in engagement_store.DATASET_DIR
+TITLE_LOG_FILE = "title_variations_log.json"  # Variant groups written by ai_topic_generator
+WINNERS_FILE = "ab_winners.json"  # Winners table read by ai_topic_generator
+
+# A/B test settings
+ANALYSIS_WINDOW_DAYS = 365
+MIN_VIEWS = 50  # Variants with fewer views are not tested
+MAX_VARIANTS_PER_GROUP = 50  # Keeps the pairwise matrix small for the site-wide group
+ALPHA = 0.05  # Significance level for the z-tests
+POSTERIOR_DRAWS = 2000  # Monte Carlo draws for P(best)
+SITEWIDE_GROUP = "all"  # Titles without an experiment with 2+ observed variants compete here
 
 
 def load_engagement_data():
@@ -40,29 +55,168 @@ def load_engagement_data():
 
 
 def process_engagement_data():
-    """Processes engagement logs and converts them into structured CSV data."""
+    """
+    Processes engagement logs and appends them to the Parquet engagement dataset.
+    Returns False if the export failed (no new data is not a failure).
+    """
     data = load_engagement_data()
     
     if not data:
-        logger.warning("⚠️ No data to process. Skipping CSV export.")
-        return
+        logger.warning("⚠️ No data to process. Skipping dataset export.")
+        return True
 
     try:
-        df = pd.DataFrame(data)
-
-        # Ensure required columns exist
-        required_columns = ["title", "timestamp", "clicks", "shares", "views"]
-        for col in required_columns:
-            if col not in df.columns:
-                df[col] = 0  # Fill missing columns with default values
-
-        df.to_csv(OUTPUT_CSV, index=False)
-        logger.info(f"✅ Engagement data saved to CSV: {OUTPUT_CSV}")
+        # Missing columns are filled and dtypes compacted (int32 counts, categorical titles)
+        engagement_store.append_snapshots(pd.DataFrame(data))
+        return True
 
     except Exception as e:
         logger.error(f"❌ Error processing engagement data: {e}")
+        return False
+
+
+def load_variant_groups():
+    """Maps every logged title variant to its experiment (the original title it came from)."""
+    entries = ai_utils.load_json(TITLE_LOG_FILE, [])
+    if isinstance(entries, dict):
+        entries = [entries]  # Older logs held only the latest run
+
+    groups = {}
+    for entry in entries:
+        for title in [entry.get("original"), entry.get("selected"), *entry.get("variations", [])]:
+            if title:
+                groups[title] = entry.get("original")
+    return groups
+
+
+def title_stats(df):
+    """Per-title totals. Ghost counters are cumulative, so the latest (max) snapshot wins."""
+    stats = df.groupby("title", observed=True)[["clicks", "shares", "views"]].max()
+    stats = stats[stats["views"] >= MIN_VIEWS].astype("int64")
+    stats[["clicks", "shares"]] = stats[["clicks", "shares"]].clip(upper=stats["views"], axis=0)
+
+    groups = pd.Series(stats.index.astype(str), index=stats.index).map(load_variant_groups())
+    observed = groups.map(groups.value_counts())
+    stats["group"] = groups.where(observed >= 2, SITEWIDE_GROUP)
+
+    # Only the most viewed variants of each group are compared
+    rank = stats.groupby("group")["views"].rank(method="first", ascending=False)
+    return stats[rank <= MAX_VARIANTS_PER_GROUP].reset_index()
+
+
+def pairwise_tests(stats, metric):
+    """
+    Two-proportion z-tests and Beta-Binomial P(A > B) for every variant pair in every group,
+    computed column-wise over a single self-join (no Python loop over rows or pairs).
+    """
+    pairs = stats.merge(stats, on="group", suffixes=("_a", "_b"))
+    pairs = pairs[pairs["title_a"].astype(str) < pairs["title_b"].astype(str)]
+
+    success_a, success_b = pairs[f"{metric}_a"].to_numpy(float), pairs[f"{metric}_b"].to_numpy(float)
+    views_a, views_b = pairs["views_a"].to_numpy(float), pairs["views_b"].to_numpy(float)
+    rate_a, rate_b = success_a / views_a, success_b / views_b
+
+    pooled = (success_a + success_b) / (views_a + views_b)
+    se = np.sqrt(pooled * (1 - pooled) * (1 / views_a + 1 / views_b))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(se > 0, (rate_a - rate_b) / se, 0.0)
+    p_value = 2 * ndtr(-np.abs(z))
+
+    # Beta(1 + successes, 1 + failures) posteriors; P(A > B) from their normal approximation
+    alpha_a, beta_a = 1 + success_a, 1 + views_a - success_a
+    alpha_b, beta_b = 1 + success_b, 1 + views_b - success_b
+    mean_a, mean_b = alpha_a / (alpha_a + beta_a), alpha_b / (alpha_b + beta_b)
+    var_a = alpha_a * beta_a / ((alpha_a + beta_a) ** 2 * (alpha_a + beta_a + 1))
+    var_b = alpha_b * beta_b / ((alpha_b + beta_b) ** 2 * (alpha_b + beta_b + 1))
+    prob_a_better = ndtr((mean_a - mean_b) / np.sqrt(var_a + var_b))
+
+    return pd.DataFrame({
+        "group": pairs["group"].to_numpy(),
+        "title_a": pairs["title_a"].astype(str).to_numpy(),
+        "title_b": pairs["title_b"].astype(str).to_numpy(),
+        "metric": metric,
+        "rate_a": rate_a, "rate_b": rate_b,
+        "z": z, "p_value": p_value,
+        "prob_a_better": prob_a_better,
+    })
+
+
+def probability_best(stats, metric, seed=0):
+    """P(variant has the highest rate in its group), sampled for all variants at once."""
+    stats = stats.sort_values("group", kind="stable")  # reduceat needs each group contiguous
+    rng = np.random.default_rng(seed)
+    successes, views = stats[metric].to_numpy(float), stats["views"].to_numpy(float)
+    draws = rng.beta(1 + successes, 1 + views - successes, size=(POSTERIOR_DRAWS, len(stats)))
+
+    codes = pd.factorize(stats["group"])[0]
+    group_starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    group_max = np.maximum.reduceat(draws, group_starts, axis=1)
+    is_best = draws >= group_max[:, codes]
+    return pd.Series(is_best.mean(axis=0), index=stats.index)
+
+
+def find_winners(stats, pairs):
+    """One row per group: the variant most likely to be best, and how it compares to the runner-up."""
+    ranked = stats.sort_values(["group", "prob_best", "ctr"], ascending=[True, False, False])
+    leaders = ranked.groupby("group").head(2).copy()
+    leaders["position"] = leaders.groupby("group").cumcount()
+    winners = leaders[leaders["position"] == 0].set_index("group")
+    runners_up = leaders[leaders["position"] == 1].set_index("group")["title"].astype(str)
+
+    winners["runner_up"] = runners_up.reindex(winners.index)
+    winners["title"] = winners["title"].astype(str)
+
+    # Look up the winner-vs-runner-up test whichever way round the pair was stored
+    ctr_pairs = pairs[pairs["metric"] == "clicks"]
+    forward = ctr_pairs.set_index(["group", "title_a", "title_b"])
+    backward = ctr_pairs.rename(columns={"title_a": "title_b", "title_b": "title_a"}).set_index(["group", "title_a", "title_b"])
+    backward["prob_a_better"] = 1 - backward["prob_a_better"]
+    lookup = pd.concat([forward, backward])
+    keys = pd.MultiIndex.from_arrays([winners.index, winners["title"], winners["runner_up"]])
+    matched = lookup[["p_value", "prob_a_better"]].reindex(keys)
+
+    winners["p_value"] = matched["p_value"].to_numpy()
+    winners["prob_beats_runner_up"] = matched["prob_a_better"].to_numpy()
+    winners["significant"] = winners["p_value"] < ALPHA
+    return winners.reset_index()
+
+
+def run_ab_analysis():
+    """Tests every title variant against the others in its group and writes the winners table."""
+    # Daily rollups hold the end-of-day counters per title, so this never scans raw snapshots
+    df = engagement_rollups.query_rollups(
+        "day", since=pd.Timestamp.now().floor("D") - pd.Timedelta(days=ANALYSIS_WINDOW_DAYS),
+    )[["title", "clicks", "shares", "views"]]
+    if df.empty:
+        logger.warning("⚠️ No engagement history to analyze.")
+        ai_utils.save_json(WINNERS_FILE, [])  # Don't leave an older winners table behind
+        return []
+
+    stats = title_stats(df)
+    if stats.empty:
+        logger.warning(f"⚠️ No title has at least {MIN_VIEWS} views yet. Skipping A/B tests.")
+        ai_utils.save_json(WINNERS_FILE, [])
+        return []
+
+    stats["ctr"] = stats["clicks"] / stats["views"]
+    stats["share_rate"] = stats["shares"] / stats["views"]
+    stats["prob_best"] = probability_best(stats, "clicks")
+    pairs = pd.concat([pairwise_tests(stats, "clicks"), pairwise_tests(stats, "shares")], ignore_index=True)
+    winners = find_winners(stats, pairs)
+
+    columns = ["group", "title", "ctr", "share_rate", "views", "prob_best", "runner_up",
+               "p_value", "prob_beats_runner_up", "significant"]
+    records = json.loads(winners[columns].to_json(orient="records"))
+    ai_utils.save_json(WINNERS_FILE, records)
+
+    significant = int(winners["significant"].sum())
+    logger.info(f"✅ A/B analysis: {len(stats)} variants, {len(pairs)} pairwise tests, "
+                f"{len(winners)} groups ({significant} significant winners) -> {WINNERS_FILE}")
+    return records
 
 
 if __name__ == "__main__":
-    ai_utils.create_file(OUTPUT_CSV)
-    process_engagement_data()
+    if not process_engagement_data():
+        sys.exit(1)
+    engagement_rollups.update_rollups()
+    run_ab_analysis()  # Errors propagate, so the stage exits non-zero
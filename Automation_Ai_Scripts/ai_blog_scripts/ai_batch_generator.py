@@ -0,0 +1,126 @@
+import os
+import argparse
+from datetime import datetime
+import ai_utils
+import ai_prompts
+import ai_dedup
+from ai_logger import logger
+from ai_topic_generator import TOPICS_FILE, load_winning_titles
+
+# Offline generation for large content backlogs. Instead of one synchronous chat call per
+# step, every topic's title variations, ranking and full post are submitted as three batch
+# jobs (cheaper, higher throughput, no open connections while OpenAI works through them).
+# The in-flight batch IDs are checkpointed in BATCH_STATE_FILE, so an interrupted run
+# resumes polling the same jobs instead of paying for them twice.
+#   python3 ai_batch_generator.py --backlog content_backlog.json
+
+BACKLOG_FILE = "content_backlog.json"  # List of topics/working titles to write about
+BATCH_STATE_FILE = "batch_state.json"
+OUTPUT_FILE = "batch_posts.json"  # Generated posts waiting for review/publishing
+STEPS = ("variations", "ranking", "post")
+
+
+def load_backlog(path, limit=None):
+    """Topics from the backlog file, or every topic in topics.json if there is no backlog."""
+    backlog = ai_utils.load_json(path, [])
+    if not backlog:
+        groups = ai_utils.load_json(TOPICS_FILE, {"topics": []}).get("topics", [])
+        backlog = [topic for group in groups for topic in group]
+    return backlog[:limit] if limit else backlog
+
+
+def build_requests(step, items, winning_titles):
+    """Batch requests for one step, keyed by custom_id `<step>-<item index>`."""
+    requests = {}
+    for i, item in enumerate(items):
+        if step == "variations":
+            prompt = ai_prompts.title_variations_prompt(item["topic"], winning_titles)
+        elif step == "ranking":
+            prompt = ai_prompts.ranking_prompt(item["variations"], winning_titles)
+        else:
+            prompt = ai_prompts.blog_post_prompt(item["title"])
+        requests[f"{step}-{i}"] = ai_utils.chat_request(*prompt)
+    return requests
+
+
+def apply_results(step, items, results):
+    for i, item in enumerate(items):
+        response = results.get(f"{step}-{i}")
+        if step == "variations":
+            item["variations"] = ai_prompts.parse_title_variations(response, item["topic"])
+        elif step == "ranking":
+            item["title"] = ai_prompts.parse_ranking(response, item["variations"])
+        else:
+            item["content"] = ai_prompts.parse_blog_post(response)
+
+
+def run_batch_generation(backlog_file=BACKLOG_FILE, limit=None, poll_interval=ai_utils.BATCH_POLL_INTERVAL):
+    """Runs (or resumes) the three batch steps and appends the finished posts to OUTPUT_FILE."""
+    state = ai_utils.load_json(BATCH_STATE_FILE, {})
+    if not state:
+        topics = load_backlog(backlog_file, limit)
+        if not topics:
+            logger.error("❌ Nothing to generate: the content backlog is empty.")
+            return 0
+        state = {"items": [{"topic": topic} for topic in topics], "done": [], "batch_id": None,
+                 "batch_key": datetime.now().strftime("%Y%m%d%H%M%S")}
+        ai_utils.save_json(BATCH_STATE_FILE, state)
+    else:
+        logger.info(f"🔁 Resuming batch generation ({len(state['done'])}/{len(STEPS)} steps done)")
+
+    winning_titles = load_winning_titles()
+    items = state["items"]
+    for step in STEPS:
+        if step in state["done"]:
+            continue
+        if not state["batch_id"]:
+            requests = build_requests(step, items, winning_titles)
+            state["batch_id"] = ai_utils.submit_batch(requests, description=f"blog {step}")
+            ai_utils.save_json(BATCH_STATE_FILE, state)
+
+        batch = ai_utils.wait_for_batch(state["batch_id"], poll_interval)
+        if batch.status == "failed":
+            # Nothing ran (e.g. the input file was rejected); the next run resubmits this step
+            logger.error(f"❌ Batch {batch.id} for step '{step}' failed: {batch.errors}")
+            state["batch_id"] = None
+            ai_utils.save_json(BATCH_STATE_FILE, state)
+            return 0
+        apply_results(step, items, ai_utils.batch_results(batch))
+        state["done"].append(step)
+        state["batch_id"] = None
+        ai_utils.save_json(BATCH_STATE_FILE, state)
+
+    generated_at = datetime.now().isoformat(timespec="seconds")
+    ai_dedup.sync_published_posts()
+    posts = []
+    for i, item in enumerate(items):
+        if not item.get("content"):
+            continue
+        duplicate = ai_dedup.find_duplicate(item["content"])
+        if duplicate:
+            logger.warning(f"♻️ Dropping '{item['title']}': near duplicate of '{duplicate['title']}'")
+            continue
+        ai_dedup.add_document(f"batch:{state['batch_key']}-{i}", item["title"], item["content"])  # Also catches repeats within this batch
+        posts.append({**item, "generated_at": generated_at})
+    ai_utils.save_json(OUTPUT_FILE, ai_utils.load_json(OUTPUT_FILE, []) + posts)
+    os.remove(BATCH_STATE_FILE)
+
+    if len(posts) < len(items):
+        logger.warning(f"⚠️ {len(items) - len(posts)} backlog topics produced no usable or new post")
+    logger.info(f"✅ Batch generated {len(posts)} posts into {OUTPUT_FILE}")
+    return len(posts)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate a content backlog through the OpenAI Batch API.")
+    parser.add_argument("--backlog", default=BACKLOG_FILE, help="JSON list of topics (default: every topic in topics.json)")
+    parser.add_argument("--limit", type=int, help="Only generate the first N topics")
+    parser.add_argument("--poll-interval", dest="poll_interval", type=float, default=ai_utils.BATCH_POLL_INTERVAL,
+                        help="Seconds between batch status checks")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    ai_utils.load_api_keys()
+    args = parse_args()
+    run_batch_generation(args.backlog, args.limit, args.poll_interval)
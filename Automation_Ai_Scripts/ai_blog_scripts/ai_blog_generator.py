@@ -4,18 +4,22 @@ import os
 import textstat
 import language_tool_python
 import ai_utils
-from ai_logger import logger
+import ai_metrics
+import ai_prompts
+import ai_dedup
+import draft_revisions
+from ai_logger import logger, lazy_json
 
 # Load API keys
 ai_utils.load_api_keys()
 
 GHOST_ADMIN_API_KEY = os.getenv("GHOST_ADMIN_API_KEY")
 GHOST_ADMIN_API_URL = os.getenv("GHOST_ADMIN_API_URL")
+BLOG_URL = os.getenv("BLOG_URL", "https://bytewhere.com").rstrip("/")
 
 # Files for storing and processing
 PREDICTED_FILE = "predicted_titles.json"
 IMG_URL_FILE = "img_urls.json"
-DRAFTS_FILE = "blog_drafts.json"
 
 QUALITY_THRESHOLD = 80  # Posts with a score below this go to manual review
 
@@ -39,13 +43,15 @@ def analyze_blog_quality(content):
 
         if JAVA_AVAILABLE:
             # ✅ Java-based grammar check
-            matches = tool.check(content)
-            grammar_errors = len(matches)
-            corrected_content = tool.correct(content)
+            with ai_metrics.span("grammar_check", dependency="languagetool"):
+                matches = tool.check(content)
+                grammar_errors = len(matches)
+                corrected_content = tool.correct(content)
             logger.info("✅ Using Java-based grammar check.")
         else:
             # ❌ Java failed → Fallback to OpenAI
-            corrected_content = ai_utils.openai_create(f"Fix any grammar mistakes in this text: {content}")
+            with ai_metrics.span("grammar_check", dependency="openai"):
+                corrected_content = ai_utils.openai_create(f"Fix any grammar mistakes in this text: {content}")
             grammar_errors = sum(1 for x, y in zip(content, corrected_content) if x != y)
             logger.info("🔄 Using OpenAI GPT as fallback.")
 
@@ -64,78 +70,26 @@ def analyze_blog_quality(content):
 
 
 
-def save_draft_for_review(title, content, post_url):
+def save_draft_for_review(title, content, post_url, draft_id, image_url=None, score=None):
     """
-    Saves AI-generated blog drafts to a JSON file for manual review.
+    Saves an AI-generated blog draft for manual review. Every save is a new revision in
+    draft_revisions, stored as a diff against the previous one.
     """
-    drafts = []
-
-    # Load existing drafts
-    if os.path.exists(DRAFTS_FILE):
-        with open(DRAFTS_FILE, "r") as file:
-            try:
-                drafts = json.load(file)
-            except json.JSONDecodeError:
-                drafts = []
-
-    # Add new draft
-    drafts.append({
-        "title": title,
-        "content": content,
-        "post_url": post_url,
-        "status": "pending"
-    })
-
-    # Save back to file
-    with open(DRAFTS_FILE, "w") as file:
-        json.dump(drafts, file, indent=4)
-
+    draft_revisions.save_revision(draft_id, content, title, source="generator",
+                                  post_url=post_url, image_url=image_url, score=score)
     logger.info(f"✅ Draft saved for review: {title}")
 
 
 def format_blog_post(title):
     """Generates a structured, SEO-optimized blog post using OpenAI."""
-    prompt = f"""
-        Write a well-structured, SEO-optimized blog post titled "{title}" in **valid HTML**.
-        Use the following structure:
-
-        <article>
-        <h2>Introduction</h2>
-        <p>Engaging introduction about the topic.</p>
-
-        <h2>Key Sections</h2>
-        <h3>Subheading 1</h3>
-        <p>Details about the first key point.</p>
-
-        <h3>Subheading 2</h3>
-        <p>Details about the second key point.</p>
-
-        <h2>Real-World Example</h2>
-        <p>Provide a compelling real-world use case. Cite sources where applicable.</p>
-        <blockquote>
-            <p>Include a relevant statistic or expert quote.</p>
-            <cite>Source Name - <a href='SOURCE_LINK' target='_blank'>SOURCE_LINK</a></cite>
-        </blockquote>
-
-        <h2>Conclusion</h2>
-        <p>Summarize the blog and include a call-to-action.</p>
-        </article>
-
-        **Rules:**
-        - **Use only valid HTML** (no Markdown).
-        - **Cite sources** when including statistics, case studies, or expert opinions.
-        - **Avoid wrapping the article in `<html>`, `<head>`, or `<body>`**.
-    """
-
-
     try:
-        response = ai_utils.openai_create(prompt, content="You are a professional SEO blogger.")
-        
-        if not response or len(response.strip()) < 50:  # Validate response length
+        response = ai_prompts.parse_blog_post(ai_utils.openai_create(*ai_prompts.blog_post_prompt(title)))
+
+        if not response:  # Validate response length
             logger.error("❌ AI Model returned an empty or too-short response.")
             return None
-        
-        return response.strip()
+
+        return response
 
     except Exception as e:
         logger.error(f"❌ AI Blog Generation Failed: {e}")
@@ -143,25 +97,30 @@ def format_blog_post(title):
 
 
 
-def post_to_ghost(title, content, image_url, manual_review=True):
-    """Sends the AI-generated blog to Ghost CMS."""
+def ghost_headers():
     jwt_token = ai_utils.generate_token(GHOST_ADMIN_API_KEY)
-
-    headers = {
+    return {
         "Authorization": f"Ghost {jwt_token}",
         "Content-Type": "application/json"
     }
 
-    cleaned_content = content.strip()
 
+def to_mobiledoc(content):
+    """Wraps the post HTML in a single mobiledoc HTML card."""
     # ✅ Ensure proper encoding
-    mobiledoc_content = json.dumps({
+    return json.dumps({
         "version": "0.3.1",
         "atoms": [],
-        "cards": [["html", {"html": f"<article>{cleaned_content}</article>"}]],
+        "cards": [["html", {"html": f"<article>{content.strip()}</article>"}]],
         "markups": [],
         "sections": [[10, 0]]
     })
+
+
+def post_to_ghost(title, content, image_url, manual_review=True, score=None):
+    """Sends the AI-generated blog to Ghost CMS. Returns the new post's ID, or None if it failed."""
+    headers = ghost_headers()
+    mobiledoc_content = to_mobiledoc(content)
     scheduled_time = ai_utils.get_scheduled_time()
     status = "draft" if manual_review else "scheduled"
 
@@ -193,20 +152,20 @@ def post_to_ghost(title, content, image_url, manual_review=True):
             ]
         }
 
-    logger.info(f"📤 Blog POST Payload: {json.dumps(data, indent=4)}")
-
-    # ✅ Log the full request payload before sending
-    logger.info(f"📤 Sending Blog Post Request: {json.dumps(data, indent=4)}")
+    # ✅ Log the full request payload before sending (formatted off-thread, truncated if huge)
+    logger.info("📤 Sending Blog Post Request: %s", lazy_json(data))
 
     try:
-        response = requests.post(GHOST_ADMIN_API_URL, json=data, headers=headers)
+        with ai_metrics.span("ghost_request", dependency="ghost", endpoint="posts"):
+            response = requests.post(GHOST_ADMIN_API_URL, json=data, headers=headers)
         logger.info(f"🔄 Response Status: {response.status_code}")
-        logger.info(f"🔄 Response Content: {response.text}")
+        logger.info("🔄 Response Content: %s", response.text)
 
         response.raise_for_status()  # Raise an error if the request fails
 
         blog_id = response.json()["posts"][0]["id"]
-        preview_url = f"https://bytewhere.com/ghost/#/editor/post/{blog_id}"
+        preview_url = f"{BLOG_URL}/ghost/#/editor/post/{blog_id}"
+        ai_dedup.add_document(f"ghost:{blog_id}", title, content)  # Drafts never show up in the content API
 
         logger.info(f"✅ Blog '{title}' sent to Ghost!")
 
@@ -217,10 +176,52 @@ def post_to_ghost(title, content, image_url, manual_review=True):
 
         # Save draft for review if manual
         if manual_review:
-            save_draft_for_review(title, content, preview_url)
+            save_draft_for_review(title, content, preview_url, blog_id, image_url, score)
+        return blog_id
 
     except requests.exceptions.RequestException as e:
         logger.error(f"❌ Blog posting failed: {e}")
+        return None
+
+
+def publish_draft(draft_id, title, content, image_url):
+    """
+    Schedules the Ghost draft `draft_id` with the reviewed title/content instead of creating
+    a second post. Returns True if Ghost accepted the update.
+    """
+    post_url = f"{GHOST_ADMIN_API_URL.rstrip('/')}/{draft_id}/"
+    headers = ghost_headers()
+    try:
+        # Ghost rejects updates without the post's current updated_at (collision detection)
+        with ai_metrics.span("ghost_request", dependency="ghost", endpoint="posts"):
+            response = requests.get(post_url, headers=headers, timeout=30)
+            response.raise_for_status()
+        updated_at = response.json()["posts"][0]["updated_at"]
+
+        data = {
+            "posts": [
+                {
+                    "title": title,
+                    "mobiledoc": to_mobiledoc(content),
+                    "status": "scheduled",
+                    "published_at": ai_utils.get_scheduled_time(),
+                    "feature_image": image_url,
+                    "updated_at": updated_at
+                }
+            ]
+        }
+        with ai_metrics.span("ghost_request", dependency="ghost", endpoint="posts"):
+            response = requests.put(post_url, json=data, headers=headers, timeout=30)
+        logger.info(f"🔄 Response Status: {response.status_code}")
+        response.raise_for_status()
+
+    except (requests.exceptions.RequestException, KeyError, IndexError, ValueError) as e:
+        logger.error(f"❌ Publishing draft '{title}' failed: {e}")
+        return False
+
+    ai_dedup.add_document(f"ghost:{draft_id}", title, content)  # Index the reviewed version
+    logger.info(f"✅ Draft '{title}' scheduled on Ghost!")
+    return True
 
 
 # Blog Generation & Filtering Process
@@ -236,22 +237,30 @@ def generate_blog_and_post():
         blog_content = format_blog_post(best_title)
 
         # Log the raw AI response before proceeding
-        logger.info(f"📝 Generated Blog Content: {repr(blog_content)}")  # Log full response
+        logger.info("📝 Generated Blog Content: %r", blog_content)  # Log full response
 
         if not blog_content or len(blog_content.strip()) < 100:
             logger.error("❌ Failed to generate a valid blog post: Content is too short or empty.")
-            logger.error(f"📝 Raw AI Response: {blog_content}")
+            logger.error("📝 Raw AI Response: %s", blog_content)
             return
 
+        # Reject rewrites of an existing article before any grammar check or upload
+        ai_dedup.sync_published_posts()
+        duplicate = ai_dedup.find_duplicate(blog_content)
+        if duplicate:
+            logger.warning(f"♻️ '{best_title}' is a near duplicate of '{duplicate['title']}' "
+                           f"({duplicate['similarity']:.0%} similar). Skipping.")
+            ai_utils.notify_discord(f"♻️ Skipped AI blog '{best_title}': too similar to '{duplicate['title']}'")
+            return
 
         # Load image URL safely
         img_url_data = ai_utils.load_json(IMG_URL_FILE, [])
 
         if not img_url_data or not isinstance(img_url_data, list) or len(img_url_data) == 0:
             logger.error("❌ Image URL data is empty or invalid.")
-            img_url = "https://bytewhere.com/content/images/ai-blog.jpg"  # Fallback image
+            img_url = f"{BLOG_URL}/content/images/ai-blog.jpg"  # Fallback image
         else:
-            img_url = img_url_data[0] if img_url_data[0].startswith("http") else f"https://bytewhere.com/content/images/{img_url_data[0]}"  # Ensure full URL
+            img_url = img_url_data[0] if img_url_data[0].startswith("http") else f"{BLOG_URL}/content/images/{img_url_data[0]}"  # Ensure full URL
 
         logger.info("🔎 Checking for Blog Quality....")
 
@@ -263,11 +272,8 @@ def generate_blog_and_post():
             post_to_ghost(best_title, blog_content, img_url, manual_review=False)
         else:
             logger.warning(f"⚠️ Low-quality blog detected (Score: {quality_score}%). Sending to manual review.")
-            drafts = ai_utils.load_json(DRAFTS_FILE, [])
-            drafts.append({"title": best_title, "content": blog_content, "score": quality_score})
-            ai_utils.save_json(DRAFTS_FILE, drafts)
             # Sends blog post to dashboard for approve/rejection
-            post_to_ghost(best_title, blog_content, img_url, manual_review=True)
+            post_to_ghost(best_title, blog_content, img_url, manual_review=True, score=quality_score)
 
     except Exception as e:
         logger.error(f"❌ Blog generation failed: {e}")
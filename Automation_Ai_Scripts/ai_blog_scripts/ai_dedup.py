@@ -0,0 +1,195 @@
+import os
+import re
+import random
+import sqlite3
+import hashlib
+from array import array
+from datetime import datetime, timezone
+import ai_metrics
+from ai_logger import logger
+
+# Near-duplicate index over every published and drafted article body. Each body becomes
+# a set of word shingles (single words and word pairs, markup and stopwords removed) and
+# a MinHash signature of NUM_PERM minimums, whose agreement rate estimates the Jaccard
+# similarity of two articles. Signatures are split into BANDS bands of ROWS rows, hashed
+# into an indexed SQLite table (LSH), so a lookup only compares articles sharing a band.
+# Banding is probabilistic: a pair at similarity s shares a band with probability
+# 1 - (1 - s^ROWS)^BANDS, about 99.8% at s = 0.3 and 93% at s = 0.2 with the values below,
+# so the candidate curve sits below THRESHOLD and the signature comparison decides.
+
+DEDUP_DB = os.getenv("AI_DEDUP_DB", "dedup_index.db")
+SCHEMA_VERSION = 2  # 1 was a 64-bit SimHash; older indexes are rebuilt on first use
+BANDS = 64
+ROWS = 2
+NUM_PERM = BANDS * ROWS
+# Sentence-by-sentence rewrites of a post score ~0.4, different posts on a related topic ~0.05
+THRESHOLD = float(os.getenv("AI_DEDUP_THRESHOLD", 0.3))
+MIN_WORD_LENGTH = 3
+STOPWORDS = set("""the and for are but not you your with this that from have has was were will can our out all
+any how its into more most than then them they their there these those what when where which who why also
+about just like use using used one two get make may been being over such only other some very""".split())
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1380)  # Fixed seed: stored signatures must stay comparable across runs
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    key TEXT PRIMARY KEY,
+    title TEXT,
+    signature BLOB NOT NULL,
+    added TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    key TEXT NOT NULL REFERENCES documents (key) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS bands_lookup ON bands (band, value);
+CREATE TABLE IF NOT EXISTS dedup_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _connect():
+    conn = sqlite3.connect(DEDUP_DB, timeout=30)
+    conn.execute("PRAGMA foreign_keys = ON")
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        # Signatures from another scheme can't be compared; start over and re-sync everything
+        conn.executescript("DROP TABLE IF EXISTS bands; DROP TABLE IF EXISTS documents; DROP TABLE IF EXISTS dedup_state;")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def shingles(text):
+    """Word and word-pair shingles of an article, ignoring markup and stopwords."""
+    text = re.sub(r"<[^>]+>", " ", text or "").lower()
+    words = [w for w in re.findall(r"[a-z0-9']+", text) if len(w) >= MIN_WORD_LENGTH and w not in STOPWORDS]
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def minhash(text):
+    """MinHash signature (NUM_PERM integers) of an article body; all zeros for an empty body."""
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big") for s in shingles(text)]
+    if not hashes:
+        return [0] * NUM_PERM
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(x == y for x, y in zip(signature, other)) / NUM_PERM
+
+
+def _bands(signature):
+    bands = []
+    for band in range(BANDS):
+        rows = array("Q", signature[band * ROWS:(band + 1) * ROWS]).tobytes()
+        value = int.from_bytes(hashlib.blake2b(rows, digest_size=8).digest(), "big", signed=True)  # SQLite integers are signed
+        bands.append((band, value))
+    return bands
+
+
+def add_document(key, title, text, conn=None):
+    """Indexes (or re-indexes) one article under a stable key such as `ghost:<post id>`."""
+    signature = minhash(text)
+    own_conn = conn is None
+    conn = conn or _connect()
+    try:
+        conn.execute("DELETE FROM documents WHERE key = ?", (key,))
+        conn.execute("INSERT INTO documents VALUES (?, ?, ?, ?)",
+                     (key, title, array("Q", signature).tobytes(), datetime.now(timezone.utc).isoformat(timespec="seconds")))
+        conn.executemany("INSERT INTO bands VALUES (?, ?, ?)", [(band, value, key) for band, value in _bands(signature)])
+        if own_conn:
+            conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
+    return signature
+
+
+def find_duplicate(text, threshold=THRESHOLD):
+    """
+    Returns {"key", "title", "similarity"} for the most similar indexed article at or
+    above `threshold` estimated Jaccard similarity to `text`, or None if the article is new.
+    """
+    signature = minhash(text)
+    if not any(signature):
+        return None
+    bands = _bands(signature)
+    with ai_metrics.span("dedup_lookup", dependency="sqlite"):
+        conn = _connect()
+        try:
+            rows = conn.execute(
+                "SELECT DISTINCT d.key, d.title, d.signature FROM bands b JOIN documents d ON d.key = b.key WHERE "
+                + " OR ".join(["(b.band = ? AND b.value = ?)"] * len(bands)),
+                [v for pair in bands for v in pair],
+            ).fetchall()
+        finally:
+            conn.close()
+
+    best = None
+    for key, title, stored in rows:
+        score = similarity(signature, array("Q", stored))
+        if score >= threshold and (best is None or score > best["similarity"]):
+            best = {"key": key, "title": title, "similarity": score}
+    return best
+
+
+def sync_published_posts():
+    """Indexes every Ghost post created or updated since the last sync. Returns posts indexed."""
+    import requests
+    api_url, api_key = os.getenv("GHOST_CONTENT_API_URL"), os.getenv("GHOST_CONTENT_API_KEY")
+    if not api_url or not api_key:
+        logger.warning("⚠️ Ghost content API not configured; duplicate index not synced.")
+        return 0
+
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT value FROM dedup_state WHERE key = 'last_sync'").fetchone()
+        params = {"key": api_key, "limit": "all", "fields": "id,title,html,updated_at", "formats": "html"}
+        if row:
+            params["filter"] = f"updated_at:>'{row[0]}'"
+        started = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        with ai_metrics.span("ghost_request", dependency="ghost", endpoint="content_posts"):
+            response = requests.get(f"{api_url}/posts/", params=params, headers={"Accept": "application/json"}, timeout=30)
+            response.raise_for_status()
+        posts = response.json().get("posts", [])
+        for post in posts:
+            add_document(f"ghost:{post['id']}", post.get("title"), post.get("html"), conn)
+        conn.execute("INSERT OR REPLACE INTO dedup_state VALUES ('last_sync', ?)", (started,))
+        conn.commit()
+    except requests.exceptions.RequestException as e:
+        logger.error(f"❌ Could not sync published posts into the duplicate index: {e}")
+        return 0
+    finally:
+        conn.close()
+
+    if posts:
+        logger.info(f"🧬 Indexed {len(posts)} published posts for duplicate detection")
+    return len(posts)
+
+
+def index_drafts():
+    """Backfills drafts awaiting review (they are not visible to the Ghost content API)."""
+    import draft_revisions
+    drafts = draft_revisions.list_drafts("pending")
+    conn = _connect()
+    try:
+        for draft in drafts:
+            add_document(f"ghost:{draft['draft_id']}", draft["title"], draft["content"], conn)
+        conn.commit()
+    finally:
+        conn.close()
+    logger.info(f"🧬 Indexed {len(drafts)} drafts awaiting review")
+    return len(drafts)
+
+
+if __name__ == "__main__":
+    import ai_utils
+    ai_utils.load_api_keys()
+    sync_published_posts()
+    index_drafts()
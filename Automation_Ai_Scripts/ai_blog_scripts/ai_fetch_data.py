@@ -3,6 +3,7 @@ import json
 import os
 from datetime import datetime
 import ai_utils
+import ai_metrics
 from ai_logger import logger
 
 
@@ -25,8 +26,9 @@ def fetch_published_posts():
     headers = {"Accept": "application/json"}
     
     try:
-        response = requests.get(f"{GHOST_CONTENT_API_URL}/posts/?key={GHOST_CONTENT_API_KEY}&filter=visibility:public&limit=5", headers=headers)
-        response.raise_for_status()  # Raise HTTP error if request fails
+        with ai_metrics.span("ghost_request", dependency="ghost", endpoint="content_posts"):
+            response = requests.get(f"{GHOST_CONTENT_API_URL}/posts/?key={GHOST_CONTENT_API_KEY}&filter=visibility:public&limit=5", headers=headers)
+            response.raise_for_status()  # Raise HTTP error if request fails
         blog_posts = response.json().get("posts", [])
 
         log_data = []
@@ -1,7 +1,11 @@
 import requests
 import os
+import re
+import sys
 import json
 import ai_utils
+import ai_metrics
+import ai_image_processing
 from ai_logger import logger
 
 ai_utils.load_api_keys()
@@ -15,13 +19,17 @@ IMAGE_CACHE_DIR = "ai_images"
 # Files for storing and processing
 PREDICTED_FILE = "predicted_titles.json"
 IMG_URL_FILE = "img_urls.json"
+IMG_VARIANTS_FILE = "img_variants.json"  # Every uploaded size/format, for srcset
+
+def slugify(title):
+    return re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-")[:80] or "ai-image"
 
 def fetch_title():
     with open(PREDICTED_FILE, "r") as file:
         return json.load(file)[0]  # Pick the best one
 
 def generate_and_upload():
-    """Generates an image and uploads it to Ghost"""
+    """Generates an image, converts it to web-ready variants and uploads them to Ghost. Returns True on success."""
     try:
         img_title = fetch_title()
         blog_img_url = ai_utils.generate_ai_image(img_title)
@@ -29,45 +37,42 @@ def generate_and_upload():
         # Generate JWT Token for Ghost
         jwt_token = ai_utils.generate_token(GHOST_ADMIN_API_KEY)
 
-        blog_img_file = f"{img_title}.jpg"
-        file_path = os.path.join(IMAGE_CACHE_DIR, blog_img_file)
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        file_path = os.path.join(IMAGE_CACHE_DIR, f"{slugify(img_title)}.png")  # DALL-E returns PNG
 
         # Download the AI-generated image
-        image_data = requests.get(blog_img_url, stream=True)
-        if image_data.status_code == 200:
-            with open(file_path, "wb") as img_file:
-                for chunk in image_data.iter_content(1024):
-                    img_file.write(chunk)
-        else:
+        with ai_metrics.span("image_download", dependency="openai"):
+            image_data = requests.get(blog_img_url, stream=True)
+            if image_data.status_code == 200:
+                with open(file_path, "wb") as img_file:
+                    for chunk in image_data.iter_content(64 * 1024):
+                        img_file.write(chunk)
+        if image_data.status_code != 200:
             logger.error("❌ Failed to download image")
-            return
-
-        logger.info(f"Uploading {blog_img_file} to {GHOST_IMAGE_UPLOAD_URL}")
-
-        # Correcting how the file is uploaded
-        with open(file_path, "rb") as img_file:
-            files = {"file": (blog_img_file, img_file, "image/jpeg")}
-            ghost_headers = {
-                "Authorization": f"Ghost {jwt_token}"
-            }
+            return False
 
-            upload_img_response = requests.post(GHOST_IMAGE_UPLOAD_URL, files=files, headers=ghost_headers)
+        variants = ai_image_processing.process_image(file_path)
 
-        upload_img_response.raise_for_status()  # Ensure request succeeds
+        logger.info(f"Uploading {len(variants)} image variants to {GHOST_IMAGE_UPLOAD_URL}")
+        uploaded = ai_image_processing.upload_variants(variants, GHOST_IMAGE_UPLOAD_URL, jwt_token)
 
-        uploaded_image_url = upload_img_response.json().get("images", [{}])[0].get("url", "")
-        if not uploaded_image_url:
-            raise ValueError("❌ Failed to retrieve uploaded image URL from Ghost response")
-
-        logger.info(f"✅ Image uploaded to Ghost: {uploaded_image_url}")
+        hero = next(v for v in uploaded if v["format"] == ai_image_processing.PRIMARY_FORMAT)
+        logger.info(f"✅ Image uploaded to Ghost: {hero['url']}")
 
         # Store image URL for ai_blog to fetch
-        ai_utils.save_json(IMG_URL_FILE, [uploaded_image_url])  # Store as a list to avoid indexing errors
-       
+        ai_utils.save_json(IMG_URL_FILE, [hero["url"]])  # Store as a list to avoid indexing errors
+        ai_utils.save_json(IMG_VARIANTS_FILE, {
+            "hero": hero["url"],
+            "srcset": {fmt: ai_image_processing.srcset(uploaded, fmt) for fmt in ai_image_processing.FORMATS},
+            "variants": [{key: v[key] for key in ("format", "mime", "width", "height", "bytes", "url")} for v in uploaded],
+        })
+        return True
+
     except requests.exceptions.RequestException as e:
         logger.error(f"❌ Failed to upload image to Ghost: {e}")
     except Exception as e:
         logger.error(f"❌ Unexpected Error: {e}")
+    return False
 
 if __name__ == "__main__":
-    generate_and_upload()
+    sys.exit(0 if generate_and_upload() else 1)
@@ -0,0 +1,90 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import ai_metrics
+from ai_logger import logger
+
+# Turns the raw DALL-E PNG into web-ready variants before upload. The source is decoded
+# once; each responsive width is then resized and encoded as WebP (primary) and JPEG
+# (fallback) on a per-call process pool, with all metadata dropped. Variants are uploaded to
+# Ghost concurrently with their real MIME types, and byte savings go to ai_metrics.
+
+HERO_WIDTH = 1200  # Never upscaled: a 1024px DALL-E image stays 1024px
+THUMBNAIL_WIDTHS = (600, 300)
+FORMATS = {
+    # format: (extension, MIME type, Pillow save options)
+    "WEBP": ("webp", "image/webp", {"quality": 80, "method": 6}),
+    "JPEG": ("jpg", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+PRIMARY_FORMAT = "WEBP"
+MAX_WORKERS = int(os.getenv("AI_IMAGE_WORKERS", min(4, os.cpu_count() or 1)))
+UPLOAD_WORKERS = 4
+REQUEST_TIMEOUT = 60
+
+def _encode_width(mode, size, pixels, width, out_base):
+    """Worker: resizes decoded pixels to `width` and writes one file per format."""
+    from PIL import Image
+    image = Image.frombytes(mode, size, pixels)  # Rebuilt from raw pixels: no EXIF/ICC/text chunks survive
+    if width < image.width:
+        image = image.resize((width, round(image.height * width / image.width)), Image.Resampling.LANCZOS)
+
+    variants = []
+    for fmt, (extension, mime, options) in FORMATS.items():
+        path = f"{out_base}-{image.width}w.{extension}"
+        image.save(path, fmt, **options)
+        variants.append({"format": fmt, "mime": mime, "width": image.width, "height": image.height,
+                         "path": path, "bytes": os.path.getsize(path)})
+    return variants
+
+
+def process_image(source_path, out_dir=None):
+    """
+    Decodes `source_path` once and returns its hero and thumbnail variants (every width in
+    every format), largest first.
+    """
+    from PIL import Image
+    out_dir = out_dir or os.path.dirname(source_path)
+    out_base = os.path.join(out_dir, os.path.splitext(os.path.basename(source_path))[0])
+    original_bytes = os.path.getsize(source_path)
+
+    with ai_metrics.span("image_processing", dependency="pillow"):
+        with Image.open(source_path) as image:
+            image = image.convert("RGB")  # JPEG has no alpha; also drops palette/metadata
+        widths = sorted({min(width, image.width) for width in (HERO_WIDTH, *THUMBNAIL_WIDTHS)}, reverse=True)
+        pixels = image.tobytes()
+        # Scoped to this call: a forked stage exits via os._exit, so nothing may outlive it
+        with ProcessPoolExecutor(max_workers=min(MAX_WORKERS, len(widths))) as executor:
+            futures = [executor.submit(_encode_width, image.mode, image.size, pixels, width, out_base) for width in widths]
+            variants = [variant for future in futures for variant in future.result()]
+
+    hero = next(v for v in variants if v["format"] == PRIMARY_FORMAT)
+    saved = original_bytes - hero["bytes"]
+    ai_metrics.observe("image_output_bytes", hero["bytes"], dependency="pillow", format=hero["format"])
+    ai_metrics.inc("image_bytes_saved", saved, dependency="pillow")
+    logger.info(f"🗜️ {os.path.basename(source_path)}: {original_bytes / 1024:.0f} KB -> {hero['bytes'] / 1024:.0f} KB "
+                f"{hero['format']} hero ({saved / max(original_bytes, 1):.0%} smaller), {len(variants)} variants")
+    return variants
+
+
+def _upload(variant, upload_url, jwt_token):
+    import requests
+    with open(variant["path"], "rb") as file:
+        files = {"file": (os.path.basename(variant["path"]), file, variant["mime"])}
+        with ai_metrics.span("ghost_request", dependency="ghost", endpoint="images"):
+            response = requests.post(upload_url, files=files, data={"purpose": "image"},
+                                     headers={"Authorization": f"Ghost {jwt_token}"}, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+    url = response.json().get("images", [{}])[0].get("url", "")
+    if not url:
+        raise ValueError(f"❌ Ghost returned no URL for {variant['path']}")
+    return {**variant, "url": url}
+
+
+def upload_variants(variants, upload_url, jwt_token):
+    """Uploads every variant to Ghost in parallel and returns them with their `url`s."""
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as executor:
+        return list(executor.map(lambda variant: _upload(variant, upload_url, jwt_token), variants))
+
+
+def srcset(variants, fmt=PRIMARY_FORMAT):
+    """`srcset` attribute value for the uploaded variants of one format."""
+    return ", ".join(f"{v['url']} {v['width']}w" for v in variants if v["format"] == fmt)
@@ -1,30 +1,198 @@
+import os
+import gzip
+import json
+import time
+import uuid
+import queue
+import atexit
+import shutil
 import logging
-from logging.handlers import RotatingFileHandler
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
 LOG_FILE = "ai_pipeline.log"
+LOG_JSON_FILE = "ai_pipeline.jsonl"
+
+# Structured JSON Lines output (opt-in). Run ID and stage are inherited from the pipeline via env.
+LOG_JSON = os.getenv("AI_LOG_JSON", "0") == "1"
+RUN_ID = os.getenv("AI_RUN_ID")
+STAGE = os.getenv("AI_STAGE")
+
+# "async" hands records to a background thread (default), "sync" writes on the calling thread
+LOG_MODE = os.getenv("AI_LOG_MODE", "async")
+MAX_MESSAGE_CHARS = int(os.getenv("AI_LOG_MAX_CHARS", 4000))  # Longer messages are truncated
+MAX_RECORDS_PER_SECOND = int(os.getenv("AI_LOG_RATE_LIMIT", 200))  # INFO/DEBUG above this are dropped
+
+_listener = None
+
+
+class TruncatingFormatter(logging.Formatter):
+    """Formats lazily (on the listener thread) and caps oversized messages such as article bodies."""
+
+    def formatMessage(self, record):
+        message = record.message
+        if MAX_MESSAGE_CHARS and len(message) > MAX_MESSAGE_CHARS:
+            record.message = f"{message[:MAX_MESSAGE_CHARS]}... [truncated {len(message) - MAX_MESSAGE_CHARS} chars]"
+        return super().formatMessage(record)
+
+
+class RateLimitFilter(logging.Filter):
+    """Drops INFO/DEBUG records beyond a per-second budget. Warnings and errors always pass."""
+
+    def __init__(self, per_second):
+        super().__init__()
+        self.per_second = per_second
+        self.window = 0
+        self.count = 0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not self.per_second:
+            return True
+        window = int(time.monotonic())
+        if window != self.window:
+            self.window, self.count = window, 0
+        self.count += 1
+        return self.count <= self.per_second
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Enqueues the record as-is instead of formatting it on the calling thread;
+    message interpolation and formatting happen on the listener thread.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class lazy_json:
+    """Log argument that pretty-prints its payload only if the record is actually formatted."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def __str__(self):
+        return json.dumps(self.data, indent=4)
+
+
+class JsonLinesFormatter(TruncatingFormatter):
+    """One JSON object per record: time, level, run/stage tags, message and any `fields` extra."""
+
+    def format(self, record):
+        record.message = record.getMessage()
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "run_id": RUN_ID,
+            "stage": STAGE,
+            "msg": self.formatMessage(record),
+        }
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+    def formatMessage(self, record):
+        super().formatMessage(record)
+        return record.message
+
+
+def _gzip_rotator(source, dest):
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def set_context(run_id, stage):
+    """Retags records from this process (used by stages forked from a warm worker)."""
+    global RUN_ID, STAGE
+    RUN_ID, STAGE = run_id, stage
+
+
+def new_run_id():
+    return uuid.uuid4().hex[:12]
+
+
+def log_event(event, level=logging.INFO, **fields):
+    """
+    Logs a structured event, e.g. `log_event("stage_finished", stage=..., duration=1.2, outcome="ok")`.
+    Fields become top-level keys in the JSON Lines log and are appended to the text log.
+    """
+    summary = " ".join(f"{key}={value}" for key, value in fields.items())
+    logger.log(level, "%s %s", event, summary, extra={"fields": {"event": event, **fields}})
+
+
+def _build_handlers():
+    # File Logging (Rotates at 5MB, keeps last 5 logs)
+    file_handler = RotatingFileHandler(LOG_FILE, maxBytes=5*1024*1024, backupCount=5)
+    file_handler.setFormatter(TruncatingFormatter("%(asctime)s - %(levelname)s - %(message)s"))
+
+    # Console Logging
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(TruncatingFormatter("%(levelname)s: %(message)s"))
+
+    handlers = [file_handler, console_handler]
+
+    if LOG_JSON:
+        # JSON Lines Logging (rotated files are gzipped: ai_pipeline.jsonl.1.gz, ...)
+        json_handler = RotatingFileHandler(LOG_JSON_FILE, maxBytes=20*1024*1024, backupCount=20)
+        json_handler.namer = lambda name: f"{name}.gz"
+        json_handler.rotator = _gzip_rotator
+        json_handler.setFormatter(JsonLinesFormatter())
+        handlers.append(json_handler)
+
+    return handlers
+
+
+def _start_listener(logger, handlers):
+    global _listener
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(LazyQueueHandler(log_queue))
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_after_fork():
+    """The listener thread does not survive fork(); give the child its own queue and listener."""
+    logger = logging.getLogger("AI_Pipeline_Logger")
+    if _listener is None:
+        return
+    handlers = _listener.handlers
+    for handler in list(logger.handlers):
+        if isinstance(handler, LazyQueueHandler):
+            logger.removeHandler(handler)
+    _start_listener(logger, handlers)
+
+
+def shutdown():
+    """Flushes queued records and stops the listener thread (registered with atexit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
 
 def setup_logger():
     """
     Sets up a global logger for all scripts with both file and console logging.
     - Uses **rotating logs** to prevent unlimited file growth.
     - Logs messages to both the **file** and the **console**.
+    - In `async` mode, records go through a queue so callers never wait on disk I/O.
     """
     logger = logging.getLogger("AI_Pipeline_Logger")
     logger.setLevel(logging.INFO)
 
     # Prevent duplicate handlers when importing this in multiple scripts
     if not logger.hasHandlers():
-        # File Logging (Rotates at 5MB, keeps last 5 logs)
-        file_handler = RotatingFileHandler(LOG_FILE, maxBytes=5*1024*1024, backupCount=5)
-        file_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
-
-        # Console Logging
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+        handlers = _build_handlers()
+        logger.addFilter(RateLimitFilter(MAX_RECORDS_PER_SECOND))
 
-        # Add handlers
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
+        if LOG_MODE == "async":
+            _start_listener(logger, handlers)
+            atexit.register(shutdown)
+            os.register_at_fork(after_in_child=_restart_after_fork)
+        else:
+            for handler in handlers:
+                logger.addHandler(handler)
 
     return logger
 
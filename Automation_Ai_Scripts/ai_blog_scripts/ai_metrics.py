@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import atexit
+import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import wraps
+import ai_logger
+
+# Lightweight metrics for the pipeline: counters, histograms and timing spans around
+# external dependencies (OpenAI, Ghost, Discord, SMTP, LanguageTool, sklearn, disk).
+# Samples are buffered in memory and flushed to a local SQLite time series, which the
+# dashboard summarizes as p50/p95 per dependency. Each flush also adds the samples to
+# cumulative per-series totals, which the dashboard exports in Prometheus text format
+# (Prometheus counters must only ever go up, so the export can't be a sliding window).
+
+METRICS_DB = os.getenv("AI_METRICS_DB", "metrics.db")
+FLUSH_EVERY = 200  # Buffered samples before an automatic flush
+HISTOGRAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_lock = threading.Lock()
+_buffer = []
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    ts REAL NOT NULL,
+    run_id TEXT,
+    stage TEXT,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    dependency TEXT,
+    outcome TEXT,
+    value REAL NOT NULL,
+    tokens INTEGER,
+    labels TEXT
+);
+CREATE INDEX IF NOT EXISTS samples_name_ts ON samples (name, ts);
+CREATE TABLE IF NOT EXISTS totals (
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    field TEXT NOT NULL,
+    dependency TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (kind, name, field, dependency, stage, outcome)
+);
+"""
+
+
+def _connect():
+    conn = sqlite3.connect(METRICS_DB, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _record(kind, name, value, dependency=None, outcome=None, tokens=None, **labels):
+    sample = (time.time(), ai_logger.RUN_ID, labels.pop("stage", ai_logger.STAGE), kind, name, dependency, outcome,
+              float(value), tokens, json.dumps(labels) if labels else None)
+    with _lock:
+        _buffer.append(sample)
+        should_flush = len(_buffer) >= FLUSH_EVERY
+    if should_flush:
+        flush()
+
+
+def flush():
+    """Writes buffered samples to SQLite (also runs at exit)."""
+    with _lock:
+        samples = _buffer[:]
+        _buffer.clear()
+    if not samples:
+        return
+    try:
+        with _connect() as conn:
+            conn.executemany("INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", samples)
+            conn.executemany(
+                "INSERT INTO totals VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT DO UPDATE SET value = value + excluded.value",
+                [(*key, value) for key, value in _totals(samples).items()],
+            )
+    except sqlite3.Error:
+        pass  # Metrics must never break the pipeline
+
+atexit.register(flush)
+
+
+def _totals(samples):
+    """Per-series increments for a batch of samples: counter totals, histogram buckets/sum/count and tokens."""
+    totals = {}
+
+    def add(kind, name, field, value):
+        key = (kind, name, field, dependency or "", stage or "", outcome or "")
+        totals[key] = totals.get(key, 0) + value
+
+    for _, _, stage, kind, name, dependency, outcome, value, tokens, _ in samples:
+        if kind == "counter":
+            add("counter", name, "total", value)
+            continue
+        for bucket in HISTOGRAM_BUCKETS:
+            if value <= bucket:
+                add("histogram", name, f"le={bucket}", 1)
+        add("histogram", name, "count", 1)
+        add("histogram", name, "sum", value)
+        if tokens:
+            add("counter", f"{name}_tokens", "total", tokens)
+    return totals
+
+
+def inc(name, value=1, **labels):
+    """Increments a counter, e.g. `inc("openai_tokens", 512, dependency="openai", model="gpt-4-turbo")`."""
+    _record("counter", name, value, **labels)
+
+
+def observe(name, value, **labels):
+    """Records one histogram observation (seconds, bytes, ...)."""
+    _record("histogram", name, value, **labels)
+
+
+@contextmanager
+def span(name, dependency=None, **labels):
+    """
+    Times the enclosed block and records it as a histogram sample tagged with its outcome.
+    The yielded dict can be updated inside the block, e.g. `s["tokens"] = usage.total_tokens`.
+    """
+    tags = {"tokens": None, **labels}
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield tags
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        tags.setdefault("outcome", outcome)
+        outcome = tags.pop("outcome")
+        _record("histogram", name, time.perf_counter() - start, dependency, outcome, **tags)
+
+
+def timed(name, dependency=None):
+    """Decorator form of `span`."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, dependency):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _recent(since_hours):
+    flush()
+    with _connect() as conn:
+        return conn.execute(
+            "SELECT kind, name, dependency, stage, outcome, value, tokens FROM samples WHERE ts >= ?",
+            (time.time() - since_hours * 3600,),
+        ).fetchall()
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+def latency_summary(since_hours=24 * 7):
+    """Returns {(name, dependency): {"count", "p50", "p95", "errors", "tokens"}} for timing samples."""
+    grouped = {}
+    for kind, name, dependency, _, outcome, value, tokens in _recent(since_hours):
+        if kind != "histogram":
+            continue
+        entry = grouped.setdefault((name, dependency), {"values": [], "errors": 0, "tokens": 0})
+        entry["values"].append(value)
+        entry["errors"] += outcome == "error"
+        entry["tokens"] += tokens or 0
+
+    summary = {}
+    for key, entry in grouped.items():
+        values = sorted(entry["values"])
+        summary[key] = {
+            "count": len(values),
+            "p50": round(_percentile(values, 0.50), 4),
+            "p95": round(_percentile(values, 0.95), 4),
+            "errors": entry["errors"],
+            "tokens": entry["tokens"],
+        }
+    return summary
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels):
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items() if value)
+
+
+def render_prometheus():
+    """Renders the cumulative totals of every series in the Prometheus text exposition format."""
+    flush()
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT kind, name, field, dependency, stage, outcome, value FROM totals "
+            "ORDER BY kind, name, dependency, stage, outcome"
+        ).fetchall()
+
+    counters, histograms = [], {}
+    for kind, name, field, dependency, stage, outcome, value in rows:
+        labels = {"dependency": dependency, "stage": stage, "outcome": outcome}
+        if kind == "counter":
+            counters.append(f"ai_{name}_total{{{_label_text(labels)}}} {value}")
+        else:
+            histograms.setdefault((name, dependency, stage, outcome), {})[field] = value
+
+    lines = counters
+    for (name, dependency, stage, outcome), fields in histograms.items():
+        base = {"dependency": dependency, "stage": stage, "outcome": outcome}
+        for bucket in HISTOGRAM_BUCKETS:
+            count = int(fields.get(f"le={bucket}", 0))
+            lines.append(f"ai_{name}_seconds_bucket{{{_label_text({**base, 'le': bucket})}}} {count}")
+        count = int(fields.get("count", 0))
+        lines.append(f"ai_{name}_seconds_bucket{{{_label_text({**base, 'le': '+Inf'})}}} {count}")
+        lines.append(f"ai_{name}_seconds_sum{{{_label_text(base)}}} {fields.get('sum', 0)}")
+        lines.append(f"ai_{name}_seconds_count{{{_label_text(base)}}} {count}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,228 @@
+import os
+import time
+import queue
+import atexit
+import threading
+import ai_metrics
+from ai_logger import logger
+
+# Background notification dispatcher. `notify_discord` and `send_email` only enqueue, so
+# publishing never waits on delivery. A single worker thread collects events for a short
+# window and folds bursts (e.g. batch-published posts) into one digest per channel, keeps
+# one authenticated SMTP session open between sends, and backs off on Discord 429s.
+# Pending notifications are drained at exit.
+
+FOLD_WINDOW = float(os.getenv("AI_NOTIFY_FOLD_WINDOW", 2.0))  # Seconds to wait for more events
+SMTP_IDLE_TIMEOUT = 60  # Close the SMTP session after this many idle seconds
+DRAIN_TIMEOUT = 30
+DISCORD_MAX_CHARS = 2000
+DISCORD_MAX_ATTEMPTS = 5
+REQUEST_TIMEOUT = 10
+
+_queue = queue.Queue()
+_lock = threading.Lock()
+_worker = None
+_smtp = None
+
+
+def smtp_settings():
+    """Reads the SMTP settings at call time so a warm worker can serve several sites."""
+    return {
+        "server": os.getenv("SMTP_SERVER"),
+        "port": int(os.getenv("SMTP_PORT", 587)),  # Default to 587 for TLS
+        "username": os.getenv("SMTP_USERNAME"),
+        "password": os.getenv("SMTP_PASSWORD"),
+        "notify_email": os.getenv("NOTIFY_EMAIL"),
+    }
+
+
+def _ensure_worker():
+    global _worker
+    with _lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="ai-notifier", daemon=True)
+            _worker.start()
+
+
+def notify_discord(message):
+    """Queues a Discord webhook message."""
+    _queue.put(("discord", message))
+    _ensure_worker()
+
+
+def send_email(subject, html):
+    """Queues an HTML email to NOTIFY_EMAIL."""
+    _queue.put(("email", (subject, html)))
+    _ensure_worker()
+
+
+def _collect(first):
+    """Gathers every event that arrives within FOLD_WINDOW of the first one."""
+    events = [first]
+    deadline = time.monotonic() + FOLD_WINDOW
+    while True:
+        remaining = deadline - time.monotonic()
+        try:
+            events.append(_queue.get(timeout=max(remaining, 0)) if remaining > 0 else _queue.get_nowait())
+        except queue.Empty:
+            return events
+
+
+def _run():
+    while True:
+        try:
+            first = _queue.get(timeout=SMTP_IDLE_TIMEOUT)
+        except queue.Empty:
+            _close_smtp()
+            continue
+
+        events = _collect(first)
+        messages = [payload for kind, payload in events if kind == "discord"]
+        emails = [payload for kind, payload in events if kind == "email"]
+        try:
+            if messages:
+                _deliver_discord(_fold_discord(messages))
+            if emails:
+                _deliver_email(*_fold_email(emails))
+        except Exception as e:
+            logger.error(f"❌ Notification delivery failed: {e}")
+        finally:
+            for _ in events:
+                _queue.task_done()
+
+
+def _fold_discord(messages):
+    if len(messages) == 1:
+        return messages[0]
+    return f"📬 **{len(messages)} pipeline updates**\n" + "\n".join(f"• {message}" for message in messages)
+
+
+def _fold_email(emails):
+    if len(emails) == 1:
+        return emails[0]
+    subject = f"📝 {len(emails)} AI pipeline notifications"
+    html = "<hr>".join(body for _, body in emails)
+    return subject, html
+
+
+def _chunks(text, size=DISCORD_MAX_CHARS):
+    """Splits a digest on line boundaries into Discord-sized messages."""
+    chunk = ""
+    for line in text.split("\n"):
+        line = line[:size]
+        if chunk and len(chunk) + len(line) + 1 > size:
+            yield chunk
+            chunk = ""
+        chunk = f"{chunk}\n{line}" if chunk else line
+    if chunk:
+        yield chunk
+
+
+def _deliver_discord(text):
+    import requests
+    webhook_url = os.getenv("DISCORD_WEBHOOK_URL")
+    if not webhook_url:
+        logger.error("❌ Discord notification failed: DISCORD_WEBHOOK_URL is not set")
+        return
+
+    for chunk in _chunks(text):
+        for attempt in range(DISCORD_MAX_ATTEMPTS):
+            try:
+                with ai_metrics.span("discord_webhook", dependency="discord") as span:
+                    response = requests.post(webhook_url, json={"content": chunk}, timeout=REQUEST_TIMEOUT)
+                    if response.status_code == 429:
+                        span["outcome"] = "rate_limited"
+                    else:
+                        response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                logger.error(f"❌ Discord notification failed: {e}")
+                break
+
+            if response.status_code == 429:
+                try:
+                    retry_after = float(response.json().get("retry_after", 1))
+                except ValueError:
+                    retry_after = float(response.headers.get("Retry-After", 1))
+                logger.warning(f"⏳ Discord rate limit hit; retrying in {retry_after:.1f}s")
+                time.sleep(retry_after)
+                continue
+
+            logger.info("✅ Notification sent to Discord!")
+            # Respect the bucket before the next chunk instead of waiting for a 429
+            if response.headers.get("X-RateLimit-Remaining") == "0":
+                time.sleep(float(response.headers.get("X-RateLimit-Reset-After", 1)))
+            break
+
+
+def _smtp_session(smtp):
+    """Returns the open, authenticated SMTP session, reconnecting if it went away."""
+    import smtplib
+    global _smtp
+    if _smtp is not None:
+        try:
+            if _smtp.noop()[0] == 250:
+                return _smtp
+        except smtplib.SMTPException:
+            pass
+        _close_smtp()
+
+    with ai_metrics.span("smtp_connect", dependency="smtp"):
+        session = smtplib.SMTP(smtp["server"], smtp["port"], timeout=REQUEST_TIMEOUT)
+        session.starttls()  # Secure connection
+        session.login(smtp["username"], smtp["password"])
+    _smtp = session
+    return _smtp
+
+
+def _close_smtp():
+    global _smtp
+    if _smtp is not None:
+        try:
+            _smtp.quit()
+        except Exception:
+            pass
+        _smtp = None
+
+
+def _deliver_email(subject, html):
+    from email.mime.text import MIMEText
+
+    smtp = smtp_settings()
+    if not all(smtp.values()):
+        logger.error("❌ Email notification failed: Missing SMTP credentials in .env")
+        return
+
+    msg = MIMEText(html, "html")
+    msg["Subject"] = subject
+    msg["From"] = smtp["username"]
+    msg["To"] = smtp["notify_email"]
+
+    try:
+        with ai_metrics.span("smtp_send", dependency="smtp"):
+            _smtp_session(smtp).sendmail(smtp["username"], smtp["notify_email"], msg.as_string())
+        logger.info(f"✅ Email notification sent: {subject}")
+    except Exception as e:
+        _close_smtp()
+        logger.error(f"❌ Failed to send email notification: {e}")
+
+
+def drain(timeout=DRAIN_TIMEOUT):
+    """Waits (up to `timeout` seconds) for queued notifications to be delivered."""
+    if _worker is None:
+        return
+    deadline = time.monotonic() + timeout
+    while _queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.05)
+    if _queue.unfinished_tasks:
+        logger.warning(f"⚠️ {_queue.unfinished_tasks} notifications were not delivered before exit")
+    _close_smtp()
+
+atexit.register(drain)
+
+
+def _reset_after_fork():
+    """The worker thread does not survive fork; start a fresh queue in the child."""
+    global _queue, _lock, _worker, _smtp
+    _queue, _lock, _worker, _smtp = queue.Queue(), threading.Lock(), None, None
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,42 +1,172 @@
 import pandas as pd
+import numpy as np
 import joblib
 import os
+import sys
+import json
+import time
+from itertools import product
+from joblib import Parallel, delayed
+from scipy.sparse import csr_matrix, hstack
+from scipy.stats import spearmanr
+from sklearn.base import clone
+from sklearn.dummy import DummyRegressor
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import Ridge
+from sklearn.metrics import mean_absolute_error
+from sklearn.model_selection import TimeSeriesSplit
 from ai_logger import logger
-from sklearn.ensemble import RandomForestRegressor
 import ai_utils
+import ai_metrics
+import engagement_rollups
 
-INPUT_CSV = "ab_results.csv"
 MODEL_FILE = "ab_predictor.pkl"
+METRICS_FILE = "model_metrics.json"
+TRAINING_WINDOW_DAYS = 365  # Only this much history (in daily rollup buckets) is used
+TARGET = "clicks"  # Titles are ranked by predicted clicks
+CV_SPLITS = 5
+N_JOBS = int(os.getenv("AI_TRAIN_JOBS", -1))  # -1 uses every core
+HASH_FEATURES = 2 ** 10
+SELECTION_ROWS = int(os.getenv("AI_SELECTION_ROWS", 3000))  # Most recent rows used to pick a model; the winner trains on all
+N_HANDCRAFTED = 8  # Columns built in title_features before the hashed words
+POWER_WORDS = ("ultimate", "secret", "proven", "essential", "best", "easy", "fast", "free", "new", "why", "how")
+
+# Candidate models and their parameter grids. The mean baseline is always evaluated so a
+# model is only kept if it actually ranks titles better than predicting the average.
+CANDIDATES = {
+    "baseline_mean": (DummyRegressor(strategy="mean"), {}),
+    "ridge": (Ridge(), {"alpha": [0.1, 1.0, 10.0]}),
+    # Feature subsampling and leaf size keep each tree cheap on ~1k sparse hashed columns
+    "random_forest": (RandomForestRegressor(n_estimators=100, max_features=0.3, min_samples_leaf=5, n_jobs=1, random_state=42),
+                      {"max_depth": [12, None]}),
+    "hist_gradient_boosting": (HistGradientBoostingRegressor(random_state=42), {"learning_rate": [0.05, 0.1], "max_leaf_nodes": [15, 31]}),
+}
+DENSE_ONLY = {"hist_gradient_boosting"}  # These get only the handcrafted columns, densified
+
+def training_since():
+    return pd.Timestamp.now().floor("D") - pd.Timedelta(days=TRAINING_WINDOW_DAYS)
+
+def title_features(titles):
+    """Feature matrix (one row per title): shape/wording statistics plus hashed title words."""
+    titles = pd.Series(titles, dtype=str).reset_index(drop=True)
+    lower = titles.str.lower()
+    handcrafted = pd.DataFrame({
+        "length": titles.str.len(),
+        "words": titles.str.split().str.len(),
+        "has_number": titles.str.contains(r"\d", regex=True),
+        "question": titles.str.contains("?", regex=False),
+        "exclamation": titles.str.contains("!", regex=False),
+        "colon": titles.str.contains(":", regex=False),
+        "upper_ratio": titles.str.count(r"[A-Z]") / titles.str.len().clip(lower=1),
+        "power_words": sum(lower.str.contains(rf"\b{word}\b", regex=True).astype(int) for word in POWER_WORDS),
+    }).astype(float)
+    hashed = HashingVectorizer(n_features=HASH_FEATURES, alternate_sign=False, norm="l2").transform(titles)
+    return hstack([csr_matrix(handcrafted.to_numpy()), hashed]).tocsr()
+
+def model_input(name, X):
+    """Dense-only models see the handcrafted columns as a dense array; the rest get the sparse matrix."""
+    return X[:, :N_HANDCRAFTED].toarray() if name in DENSE_ONLY else X
+
+def load_training_data():
+    """Daily rollup rows in time order, with features computed once per distinct title."""
+    df = engagement_rollups.query_rollups("day", since=training_since()).sort_values("bucket", kind="stable")
+    if df.empty:
+        raise ValueError(f"❌ No engagement rollups in {engagement_rollups.ROLLUP_DB}!")
+    categories = df["title"].cat.categories
+    X = title_features(categories)[df["title"].cat.codes.to_numpy()]
+    return df, X, df[TARGET].to_numpy(float)
+
+def build_folds(X, y, titles):
+    """Time-ordered CV folds, sliced once and shared (memory-mapped) by every candidate."""
+    folds = []
+    for train_idx, test_idx in TimeSeriesSplit(n_splits=CV_SPLITS).split(X):
+        folds.append((X[train_idx], X[test_idx], y[train_idx], y[test_idx], titles[test_idx]))
+    return folds
+
+def ranking_score(titles, y_true, y_pred):
+    """Spearman correlation between predicted and actual per-title engagement (0 if undefined)."""
+    per_title = pd.DataFrame({"title": titles, "true": y_true, "pred": y_pred}).groupby("title").mean()
+    if len(per_title) < 2 or per_title["pred"].nunique() < 2:
+        return 0.0
+    return float(np.nan_to_num(spearmanr(per_title["true"], per_title["pred"]).statistic))
+
+def evaluate(name, params, fold):
+    X_train, X_test, y_train, y_test, test_titles = fold
+    model = clone(CANDIDATES[name][0]).set_params(**params)
+    model.fit(model_input(name, X_train), y_train)
+    predictions = model.predict(model_input(name, X_test))
+    return name, params, ranking_score(test_titles, y_test, predictions), mean_absolute_error(y_test, predictions)
+
+def select_model(X, y, titles):
+    """
+    Evaluates every candidate/parameter/fold combination in parallel and returns the leaderboard.
+    Only the latest SELECTION_ROWS rows are cross-validated, so selection cost stays bounded.
+    """
+    if len(y) > SELECTION_ROWS:
+        X, y, titles = X[-SELECTION_ROWS:], y[-SELECTION_ROWS:], titles[-SELECTION_ROWS:]
+    folds = build_folds(X, y, titles)
+    jobs = [
+        (name, dict(zip(grid, values)), fold)
+        for name, (_, grid) in CANDIDATES.items()
+        for values in product(*grid.values())
+        for fold in folds
+    ]
+    results = Parallel(n_jobs=N_JOBS)(delayed(evaluate)(*job) for job in jobs)
+
+    scores = pd.DataFrame(results, columns=["model", "params", "spearman", "mae"])
+    scores["params_key"] = scores["params"].map(lambda p: json.dumps(p, sort_keys=True))
+    leaderboard = scores.groupby(["model", "params_key"], as_index=False).agg(
+        spearman=("spearman", "mean"), mae=("mae", "mean"), params=("params", "first"))
+    return leaderboard.sort_values(["spearman", "mae"], ascending=[False, True]).reset_index(drop=True)
 
 def train_ai_model():
     """
-    Trains AI model to predict engagement (clicks, shares, views) from blog titles.
+    Selects and trains the model that best predicts engagement (clicks) from blog titles.
+    Returns True if a new model was saved.
     """
     try:
-        if not os.path.exists(INPUT_CSV):
-            raise FileNotFoundError(f"❌ Training failed: {INPUT_CSV} not found.")
-
-        df = pd.read_csv(INPUT_CSV)
-        
-        # Ensure dataset has necessary columns
-        if not {"title", "clicks", "shares", "views"}.issubset(df.columns):
-            raise ValueError("❌ CSV missing required columns!")
-
-        # Convert titles into numerical representations using simple text length (improve later)
-        df["title_length"] = df["title"].apply(len)
-
-        # **New:** Predict engagement (clicks, shares, views) instead of predicting titles
-        X = df[["title_length"]]
-        y = df[["clicks", "shares", "views"]]
-
-        model = RandomForestRegressor(n_estimators=100)
-        model.fit(X, y)
-
-        joblib.dump(model, MODEL_FILE)
-        logger.info("✅ AI Model trained and saved.")
+        df, X, y = load_training_data()
+        titles = df["title"].astype(str).to_numpy()
+        if len(df) <= CV_SPLITS:
+            raise ValueError(f"❌ Need more than {CV_SPLITS} rollup rows to cross-validate, got {len(df)}.")
+
+        with ai_metrics.span("model_selection", dependency="sklearn", rows=len(df)):
+            leaderboard = select_model(X, y, titles)
+
+        best = leaderboard.iloc[0]
+        baseline = leaderboard[leaderboard["model"] == "baseline_mean"].iloc[0]
+        logger.info("🏁 Model selection leaderboard:\n%s", leaderboard[["model", "params_key", "spearman", "mae"]].to_string(index=False))
+
+        model = clone(CANDIDATES[best["model"]][0]).set_params(**best["params"])
+        if "n_jobs" in model.get_params():
+            model.set_params(n_jobs=N_JOBS)
+        with ai_metrics.span("model_training", dependency="sklearn", rows=len(df)):
+            model.fit(model_input(best["model"], X), y)
+
+        metrics = {
+            "model": best["model"],
+            "params": best["params"],
+            "target": TARGET,
+            "cv_splits": CV_SPLITS,
+            "rows": len(df),
+            "selection_rows": min(len(df), SELECTION_ROWS),
+            "titles": int(df["title"].nunique()),
+            "cv_spearman": round(float(best["spearman"]), 4),
+            "cv_mae": round(float(best["mae"]), 4),
+            "baseline_spearman": round(float(baseline["spearman"]), 4),
+            "baseline_mae": round(float(baseline["mae"]), 4),
+            "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        joblib.dump({"model": model, "name": best["model"], "metrics": metrics}, MODEL_FILE)
+        ai_utils.save_json(METRICS_FILE, metrics)
+        logger.info(f"✅ AI Model trained and saved: {best['model']} (CV Spearman {metrics['cv_spearman']}, "
+                    f"MAE {metrics['cv_mae']} vs baseline MAE {metrics['baseline_mae']}).")
+        return True
 
     except Exception as e:
         logger.error(f"❌ Training failed: {e}")
+        return False
 
 def predict_best_title():
     """
@@ -47,27 +177,24 @@ def predict_best_title():
             logger.error("❌ No trained model found! Run `train_ai_model()` first.")
             return None
 
-        model = joblib.load(MODEL_FILE)
-
-        if not os.path.exists(INPUT_CSV):
-            logger.error("❌ No engagement data available for prediction.")
+        bundle = joblib.load(MODEL_FILE)
+        if not isinstance(bundle, dict):
+            logger.error("❌ Model file is from an older version. Run `train_ai_model()` again.")
             return None
 
-        df = pd.read_csv(INPUT_CSV)
+        # Only the distinct titles are needed to rank candidates
+        titles = engagement_rollups.query_rollups("day", since=training_since())["title"]
 
-        if df.empty or not {"title", "clicks", "shares", "views"}.issubset(df.columns):
-            logger.error("❌ CSV missing required columns or is empty!")
+        if titles.empty:
+            logger.error("❌ No engagement data available for prediction.")
             return None
 
-        # Use text length as a feature to predict engagement
-        df["title_length"] = df["title"].apply(len)
-        X = df[["title_length"]]
-
-        predicted_scores = model.predict(X)
+        candidates = titles.cat.remove_unused_categories().cat.categories.astype(str)
+        X = title_features(candidates)
+        predicted_scores = bundle["model"].predict(model_input(bundle["name"], X))
 
         # Get the best title based on the **highest predicted engagement**
-        best_index = predicted_scores[:, 0].argmax()  # Use `clicks` as primary ranking metric
-        best_title = df.iloc[best_index]["title"]
+        best_title = candidates[int(np.argmax(predicted_scores))]
 
         logger.info(f"🔮 Predicted best blog title: {best_title}")
         return best_title
@@ -77,6 +204,6 @@ def predict_best_title():
         return None
 
 if __name__ == "__main__":
-    ai_utils.create_file(MODEL_FILE)
-    train_ai_model()
+    if not train_ai_model():
+        sys.exit(1)  # Don't let the pipeline record the previous model as this run's output
     predict_best_title()
@@ -0,0 +1,159 @@
+import os
+import io
+import sys
+import time
+import runpy
+import pstats
+import cProfile
+import argparse
+import threading
+import tracemalloc
+from collections import Counter
+import ai_logger
+from ai_logger import logger
+
+# Opt-in profiling for pipeline stages. Nothing here is imported unless profiling is on:
+#   AI_PROFILE=cprofile  deterministic cProfile + tracemalloc
+#   AI_PROFILE=sample    low-overhead stack sampling + tracemalloc
+# Each stage writes its profile files to profiles/<run_id>/ and logs the top-N hot
+# functions and allocation sites.
+
+MODES = ("cprofile", "sample")
+PROFILE_MODE = os.getenv("AI_PROFILE", "off")
+PROFILE_DIR = os.getenv("AI_PROFILE_DIR", "profiles")
+TOP_N = int(os.getenv("AI_PROFILE_TOP", 15))
+SAMPLE_INTERVAL = 0.005  # Seconds between stack samples
+TRACEMALLOC_FRAMES = 5
+
+
+class StackSampler:
+    """Samples the target thread's stack on a timer and counts leaf functions and full stacks."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.leaves = Counter()
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.leaves[stack[0]] += 1
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed(self, path):
+        """Writes stacks in the collapsed format understood by flamegraph.pl / speedscope."""
+        with open(path, "w") as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+    def summary(self, top_n):
+        lines = [f"{count / max(self.samples, 1):6.1%}  {leaf}" for leaf, count in self.leaves.most_common(top_n)]
+        return "\n".join(lines)
+
+
+def _output_dir():
+    path = os.path.join(PROFILE_DIR, ai_logger.RUN_ID or time.strftime("%Y%m%d-%H%M%S"))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _allocation_summary(snapshot, top_n):
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    stats = snapshot.statistics("lineno")
+    return "\n".join(str(stat) for stat in stats[:top_n])
+
+
+def normalize_mode(mode):
+    """Returns `mode` if it is one of MODES, else "off" (with a warning unless it already was off)."""
+    mode = (mode or "off").strip().lower() or "off"
+    if mode != "off" and mode not in MODES:
+        logger.warning(f"⚠️ Unknown profiling mode {mode!r} (expected one of {', '.join(MODES)}); profiling is off.")
+        return "off"
+    return mode
+
+
+def profile_call(stage, func, mode=PROFILE_MODE, top_n=TOP_N):
+    """Runs `func()` under the chosen profiler and writes per-stage profile files."""
+    mode = normalize_mode(mode)
+    if mode == "off":
+        return func()
+    out_dir = _output_dir()
+    stage_name = os.path.splitext(os.path.basename(stage))[0]
+
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+    profiler = cProfile.Profile() if mode == "cprofile" else None
+    sampler = StackSampler(threading.get_ident()) if mode == "sample" else None
+    start = time.perf_counter()
+
+    if profiler:
+        profiler.enable()
+    if sampler:
+        sampler.start()
+    try:
+        return func()
+    finally:
+        if profiler:
+            profiler.disable()
+        if sampler:
+            sampler.stop()
+        elapsed = time.perf_counter() - start
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        if profiler:
+            profiler.dump_stats(os.path.join(out_dir, f"{stage_name}.prof"))
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(top_n)
+            hot = stream.getvalue()
+        else:
+            sampler.write_collapsed(os.path.join(out_dir, f"{stage_name}.collapsed.txt"))
+            hot = sampler.summary(top_n)
+
+        allocations = _allocation_summary(snapshot, top_n)
+        with open(os.path.join(out_dir, f"{stage_name}.alloc.txt"), "w") as file:
+            file.write(allocations)
+
+        logger.info(f"🔬 Profile for {stage} ({mode}, {elapsed:.2f}s, peak traced memory {peak / 1024 / 1024:.1f} MiB) -> {out_dir}")
+        logger.info("🔥 Hot functions for %s:\n%s", stage, hot)
+        logger.info("🧠 Top allocation sites for %s:\n%s", stage, allocations)
+
+
+def profile_script(script_path, mode=PROFILE_MODE):
+    """Runs a pipeline script as `__main__` under the profiler."""
+    script_dir = os.path.dirname(os.path.abspath(script_path))
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+    sys.argv = [script_path]
+    profile_call(script_path, lambda: runpy.run_path(script_path, run_name="__main__"), mode)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a pipeline stage under a profiler.")
+    parser.add_argument("script", help="Stage script to run, e.g. ai_predictor.py")
+    parser.add_argument("--mode", choices=MODES,
+                        default=PROFILE_MODE if PROFILE_MODE != "off" else "cprofile")
+    args = parser.parse_args()
+    profile_script(args.script, args.mode)
@@ -0,0 +1,95 @@
+import json
+
+# Prompt builders and response parsers shared by the synchronous pipeline stages and the
+# batch generator. Builders return (prompt, system content) for `ai_utils.openai_create`
+# or `ai_utils.chat_request`. Kept free of heavy imports so either side can use them.
+
+MIN_POST_LENGTH = 50
+
+
+def blog_post_prompt(title):
+    """Structured, SEO-optimized HTML blog post for `title`."""
+    prompt = f"""
+        Write a well-structured, SEO-optimized blog post titled "{title}" in **valid HTML**.
+        Use the following structure:
+
+        <article>
+        <h2>Introduction</h2>
+        <p>Engaging introduction about the topic.</p>
+
+        <h2>Key Sections</h2>
+        <h3>Subheading 1</h3>
+        <p>Details about the first key point.</p>
+
+        <h3>Subheading 2</h3>
+        <p>Details about the second key point.</p>
+
+        <h2>Real-World Example</h2>
+        <p>Provide a compelling real-world use case. Cite sources where applicable.</p>
+        <blockquote>
+            <p>Include a relevant statistic or expert quote.</p>
+            <cite>Source Name - <a href='SOURCE_LINK' target='_blank'>SOURCE_LINK</a></cite>
+        </blockquote>
+
+        <h2>Conclusion</h2>
+        <p>Summarize the blog and include a call-to-action.</p>
+        </article>
+
+        **Rules:**
+        - **Use only valid HTML** (no Markdown).
+        - **Cite sources** when including statistics, case studies, or expert opinions.
+        - **Avoid wrapping the article in `<html>`, `<head>`, or `<body>`**.
+    """
+    return prompt, "You are a professional SEO blogger."
+
+
+def parse_blog_post(response):
+    """Returns the stripped post, or None if the model returned nothing usable."""
+    if not response or len(response.strip()) < MIN_POST_LENGTH:
+        return None
+    return response.strip()
+
+
+def title_variations_prompt(title, winning_titles=()):
+    """Five engaging variations of `title`, steered by past A/B test winners."""
+    winners_hint = ""
+    if winning_titles:
+        winners_hint = "- These titles won our A/B tests; match their style:\n" + "\n".join(f"      - {t}" for t in winning_titles)
+
+    prompt = f"""
+    Generate 5 engaging, curiosity-driven variations of the blog title: "{title}".
+    - Use power words, emotional triggers, and curiosity hooks.
+    - Keep each title under 70 characters for SEO.
+    - Example improvements:
+      - Add numbers ("7 Ways to...")
+      - Add urgency ("You NEED to Know This!")
+      - Add intrigue ("The Truth About...")
+    {winners_hint}
+    """
+    return prompt, "You are an expert SEO title strategist."
+
+
+def parse_title_variations(response, title):
+    """Splits the model's list into clean titles, falling back to the original title."""
+    # Clean up titles and remove any numbering or leading characters
+    refined_titles = [line.lstrip("1234567890.- ").strip() for line in (response or "").split("\n") if line.strip()]
+    return refined_titles or [title]
+
+
+def ranking_prompt(titles, winning_titles=()):
+    """Asks the model to pick the single best title from `titles`."""
+    prompt = f"""
+    Rank the following blog titles from best to worst based on engagement potential, SEO, and emotional appeal.
+    Return only the best title.
+
+    Titles:
+    {json.dumps(titles, indent=2)}
+
+    For reference, these past titles won A/B tests on our blog:
+    {json.dumps(list(winning_titles), indent=2)}
+    """
+    return prompt, "You are an expert SEO content strategist."
+
+
+def parse_ranking(response, titles):
+    return response.strip() if response else titles[0]  # Fallback to first title
@@ -0,0 +1,253 @@
+import os
+import time
+import random
+import sqlite3
+import logging
+
+# Shared rate limiter for OpenAI calls. Request (RPM) and token (TPM) buckets live in a
+# SQLite file, and every acquire runs inside `BEGIN IMMEDIATE`, so threads, asyncio tasks,
+# pipeline stages and the chatbot all draw from the same per-model budget. Calls are
+# retried with jittered exponential backoff that honours Retry-After, and every call's
+# usage is written to a cost ledger keyed by the pipeline run ID.
+
+RATELIMIT_DB = os.getenv("AI_RATELIMIT_DB", "ratelimit.db")
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0  # Seconds; doubled every attempt
+BACKOFF_CAP = 60.0
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError", "Timeout", "ConnectionError"}
+
+# (requests/minute, tokens/minute) per model; None means that bucket is not limited.
+# AI_OPENAI_RPM / AI_OPENAI_TPM (set per site in site_config) cap every model further.
+MODEL_LIMITS = {
+    "gpt-4-turbo": (500, 300_000),
+    "gpt-4o": (500, 300_000),
+    "gpt-4o-mini": (500, 2_000_000),
+    "dall-e-3": (7, None),
+    "batch-api": (60, None),  # File uploads and batch polling; the batches themselves have their own queue limits
+}
+DEFAULT_LIMITS = (60, 60_000)
+
+# USD per 1K tokens (prompt, completion), or per image for image models
+PRICES = {
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "dall-e-3": 0.04,
+}
+BATCH_DISCOUNT = 0.5  # Batch API requests are billed at half price
+
+logger = logging.getLogger("AI_Pipeline_Logger")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY,
+    level REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ledger (
+    ts REAL NOT NULL,
+    run_id TEXT,
+    model TEXT NOT NULL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    images INTEGER,
+    cost REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ledger_run ON ledger (run_id);
+"""
+
+
+def _connect():
+    conn = sqlite3.connect(RATELIMIT_DB, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def limits_for(model):
+    """Returns (rpm, tpm) for a model after applying the per-site caps."""
+    rpm, tpm = MODEL_LIMITS.get(model, DEFAULT_LIMITS)
+    site_rpm, site_tpm = os.getenv("AI_OPENAI_RPM"), os.getenv("AI_OPENAI_TPM")
+    if site_rpm:
+        rpm = min(rpm, int(site_rpm)) if rpm else int(site_rpm)
+    if site_tpm and tpm:
+        tpm = min(tpm, int(site_tpm))
+    return rpm, tpm
+
+
+def _buckets(model, tokens):
+    rpm, tpm = limits_for(model)
+    buckets = []
+    if rpm:
+        buckets.append((f"{model}:requests", rpm, 1))
+    if tpm:
+        buckets.append((f"{model}:tokens", tpm, min(tokens, tpm)))
+    return buckets
+
+
+def _try_acquire(model, tokens):
+    """Takes capacity from every bucket of `model` at once. Returns 0 on success or seconds to wait."""
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")  # Serializes acquires across processes
+        wait, levels = 0.0, []
+        for key, per_minute, cost in _buckets(model, tokens):
+            row = conn.execute("SELECT level, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            level = per_minute if row is None else min(per_minute, row[0] + (now - row[1]) * per_minute / 60)
+            if level < cost:
+                wait = max(wait, (cost - level) * 60 / per_minute)
+            levels.append((key, level - cost))
+        if wait == 0:
+            conn.executemany("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", [(key, level, now) for key, level in levels])
+        conn.execute("COMMIT")
+        return wait
+    finally:
+        conn.close()
+
+
+def acquire(model, tokens=0):
+    """Blocks until one request and `tokens` tokens are available for `model`."""
+    while True:
+        wait = _try_acquire(model, tokens)
+        if not wait:
+            return
+        time.sleep(wait)
+
+
+async def acquire_async(model, tokens=0):
+    """asyncio version of `acquire`; waits without blocking the event loop."""
+    import asyncio
+    while True:
+        wait = await asyncio.to_thread(_try_acquire, model, tokens)
+        if not wait:
+            return
+        await asyncio.sleep(wait)
+
+
+def _adjust(key, delta):
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("UPDATE buckets SET level = level + ? WHERE key = ?", (delta, key))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def _drain(model, seconds):
+    """Empties the request bucket so every process backs off after a 429, not just this one."""
+    rpm, _ = limits_for(model)
+    if rpm:
+        _adjust(f"{model}:requests", -rpm * seconds / 60)
+
+
+def estimate_tokens(*texts, completion=1000):
+    """Rough token estimate (~4 characters per token) used to reserve TPM before a call."""
+    return sum(len(text or "") for text in texts) // 4 + completion
+
+
+def price_for(model):
+    """Price entry for `model`, matching dated snapshots (gpt-4o-2024-08-06) to their base model."""
+    if model in PRICES:
+        return PRICES[model]
+    matches = [name for name in PRICES if (model or "").startswith(name)]
+    return PRICES[max(matches, key=len)] if matches else None
+
+
+def record_usage(model, usage=None, images=0, estimated=0, batch=False):
+    """
+    Writes one call to the cost ledger and returns unused reserved tokens to the bucket.
+    `usage` is the SDK usage object or, for batch results, the raw usage dict.
+    """
+    if isinstance(usage, dict):
+        prompt_tokens, completion_tokens = usage.get("prompt_tokens") or 0, usage.get("completion_tokens") or 0
+    else:
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    price = price_for(model)
+    if isinstance(price, tuple):
+        cost = prompt_tokens / 1000 * price[0] + completion_tokens / 1000 * price[1]
+    else:
+        cost = images * (price or 0)
+    if batch:
+        cost *= BATCH_DISCOUNT
+
+    try:
+        if estimated and limits_for(model)[1]:
+            _adjust(f"{model}:tokens", estimated - prompt_tokens - completion_tokens)
+        conn = _connect()
+        try:
+            conn.execute("INSERT INTO ledger VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (time.time(), os.getenv("AI_RUN_ID"), model, prompt_tokens, completion_tokens, images, cost))
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ Could not record OpenAI usage: {e}")
+    return cost
+
+
+def run_cost(run_id):
+    """Returns {"calls", "tokens", "images", "cost"} for one pipeline run."""
+    conn = _connect()
+    try:
+        calls, tokens, images, cost = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(prompt_tokens + completion_tokens), 0), COALESCE(SUM(images), 0), "
+            "COALESCE(SUM(cost), 0) FROM ledger WHERE run_id = ?", (run_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+    return {"calls": calls, "tokens": tokens, "images": images, "cost": round(cost, 4)}
+
+
+def _retry_delay(error, attempt):
+    """Seconds to wait before retrying `error`, or None if it should not be retried."""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status not in RETRYABLE_STATUS and type(error).__name__ not in RETRYABLE_ERRORS:
+        return None
+
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    retry_after = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        if retry_after:
+            return float(retry_after) + random.uniform(0, 1)
+    except ValueError:
+        pass
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))  # Full jitter
+
+
+def _refund(model, tokens, request=False):
+    """Returns a failed call's reserved tokens (and optionally its request slot) to the buckets."""
+    rpm, tpm = limits_for(model)
+    try:
+        if tpm and tokens:
+            _adjust(f"{model}:tokens", min(tokens, tpm))
+        if rpm and request:
+            _adjust(f"{model}:requests", 1)
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ Could not refund reserved OpenAI capacity: {e}")
+
+
+def call_with_retry(func, model, tokens=0):
+    """
+    Runs `func()` once the limiter allows it, retrying rate-limit and transient errors.
+    Each attempt reserves capacity; a failed attempt hands its tokens back, so retries don't
+    drain the shared TPM budget. The last error is re-raised once MAX_RETRIES is reached.
+    The OpenAI client must not retry on its own (max_retries=0) or those retries bypass this.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        acquire(model, tokens)
+        try:
+            return func()
+        except Exception as e:
+            delay = _retry_delay(e, attempt)
+            rate_limited = getattr(e, "status_code", None) == 429
+            # A 429 never reached the model, so its request slot goes back too (then _drain backs everyone off)
+            _refund(model, tokens, request=rate_limited)
+            if delay is None or attempt == MAX_RETRIES:
+                raise
+            if rate_limited:
+                _drain(model, delay)
+            logger.warning(f"⏳ OpenAI {model} call failed ({type(e).__name__}); retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
@@ -1,13 +1,15 @@
-import json
 import random
 import ai_utils
+import ai_prompts
 from ai_logger import logger
-from ai_predictor import predict_best_title
 
 TOPICS_FILE = "topics.json"
 USED_TOPICS_FILE = "used_topics.json"
 OUTPUT_FILE = "predicted_titles.json"
 TITLE_LOG_FILE = "title_variations_log.json"
+WINNERS_FILE = "ab_winners.json"  # Written by ai_ab_analysis
+MAX_TITLE_LOG_ENTRIES = 500
+MAX_WINNER_EXAMPLES = 5
 
 
 def get_unique_topic():
@@ -33,43 +35,27 @@ def get_unique_topic():
     
     return selected_topic
 
-def generate_title_variations(title):
-    """Generates 5 AI-enhanced variations of the title and returns them."""
-    prompt = f"""
-    Generate 5 engaging, curiosity-driven variations of the blog title: "{title}". 
-    - Use power words, emotional triggers, and curiosity hooks.
-    - Keep each title under 70 characters for SEO.
-    - Example improvements: 
-      - Add numbers ("7 Ways to...")
-      - Add urgency ("You NEED to Know This!")
-      - Add intrigue ("The Truth About...")
-    """
+def load_winning_titles():
+    """Returns A/B test winners, most convincing first (significant results before the rest)."""
+    winners = ai_utils.load_json(WINNERS_FILE, [])
+    winners = sorted(winners, key=lambda w: (not w.get("significant"), -(w.get("prob_best") or 0)))
+    return [w["title"] for w in winners[:MAX_WINNER_EXAMPLES]]
 
+def generate_title_variations(title, winning_titles=()):
+    """Generates 5 AI-enhanced variations of the title and returns them."""
     try:
-        ai_response = ai_utils.openai_create(prompt, content="You are an expert SEO title strategist.")
-        generated_titles = ai_response.split("\n")
-
-        # Clean up titles and remove any numbering or leading characters
-        refined_titles = [title.lstrip("1234567890.- ").strip() for title in generated_titles if title.strip()]
-        return refined_titles if refined_titles else [title]  # Fallback to original title if AI fails
+        ai_response = ai_utils.openai_create(*ai_prompts.title_variations_prompt(title, winning_titles))
+        return ai_prompts.parse_title_variations(ai_response, title)  # Fallback to original title if AI fails
 
     except Exception as e:
         logger.error(f"❌ AI Title Enhancement Failed: {e}")
         return [title]  # Fallback to original title
 
-def rank_titles_with_ai(titles):
+def rank_titles_with_ai(titles, winning_titles=()):
     """Ranks AI-generated title variations and picks the best one."""
-    prompt = f"""
-    Rank the following blog titles from best to worst based on engagement potential, SEO, and emotional appeal.
-    Return only the best title.
-
-    Titles:
-    {json.dumps(titles, indent=2)}
-    """
-
     try:
-        ranked_title = ai_utils.openai_create(prompt, content="You are an expert SEO content strategist.")
-        return ranked_title.strip() if ranked_title else titles[0]  # Fallback to first title
+        ranked_title = ai_utils.openai_create(*ai_prompts.ranking_prompt(titles, winning_titles))
+        return ai_prompts.parse_ranking(ranked_title, titles)
 
     except Exception as e:
         logger.error(f"❌ AI Ranking Failed: {e}")
@@ -77,21 +63,28 @@ def rank_titles_with_ai(titles):
 
 def generate_predicted_titles():
     """Predicts the best blog title, generates AI-enhanced variations, ranks them, and logs results."""
+    from ai_predictor import predict_best_title  # sklearn is only needed here, not by ai_batch_generator
     best_title = predict_best_title()
 
     if not best_title:
         logger.warning("⚠️ No predicted title available. Falling back to topics.json.")
         best_title = get_unique_topic()
 
+    # A/B test winners steer both the variations and the ranking
+    winning_titles = load_winning_titles()
+
     # Generate AI variations
-    title_variations = generate_title_variations(best_title)
+    title_variations = generate_title_variations(best_title, winning_titles)
 
     # Rank and select the best title
-    best_ranked_title = rank_titles_with_ai(title_variations)
-
-    # Log all generated titles for review
-    log_data = {"original": best_title, "variations": title_variations, "selected": best_ranked_title}
-    ai_utils.save_json(TITLE_LOG_FILE, log_data)
+    best_ranked_title = rank_titles_with_ai(title_variations, winning_titles)
+
+    # Log all generated titles; ai_ab_analysis uses this history to group variants
+    title_log = ai_utils.load_json(TITLE_LOG_FILE, [])
+    if isinstance(title_log, dict):
+        title_log = [title_log]
+    title_log.append({"original": best_title, "variations": title_variations, "selected": best_ranked_title})
+    ai_utils.save_json(TITLE_LOG_FILE, title_log[-MAX_TITLE_LOG_ENTRIES:])
 
     # Save the selected title for the blog generator
     ai_utils.save_json(OUTPUT_FILE, [best_ranked_title])
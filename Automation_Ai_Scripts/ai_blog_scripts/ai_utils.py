@@ -1,59 +1,84 @@
-import openai
-from openai import OpenAI
-import jwt
 import os
 import json
-import smtplib
-import requests
-from email.mime.text import MIMEText
+import time
+import uuid
+import threading
 from datetime import datetime, timedelta, timezone
 from ai_logger import logger
-from dotenv import load_dotenv
+import ai_metrics
+import ai_ratelimit
+
+# Every pipeline script imports this module, so the heavy SDKs (openai, requests, jwt,
+# dotenv) are imported inside the functions that need them. A stage that never
+# talks to OpenAI never pays for importing it.
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_openai_client(api_key=None, base_url=None):
+    """Returns the process-wide OpenAI client for (api_key, base_url), creating it on first use."""
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    base_url = base_url or os.getenv("OPENAI_BASE_URL")
+    key = (api_key, base_url)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                from openai import OpenAI
+                # ai_ratelimit.call_with_retry does the retrying against the shared budget
+                client = _clients[key] = OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+    return client
+
+# A forked stage must not share the parent's pooled HTTP connections
+os.register_at_fork(after_in_child=_clients.clear)
+
+REQUIRED_KEYS = [
+    "OPENAI_API_KEY", 
+    "GHOST_ADMIN_API_KEY", 
+    "GHOST_CONTENT_API_KEY",
+    "GHOST_ADMIN_API_URL",
+    "GHOST_CONTENT_API_URL",
+    "GHOST_IMAGE_UPLOAD_URL",
+    "DISCORD_WEBHOOK_URL",
+    "SMTP_SERVER",
+    "SMTP_PORT",
+    "SMTP_USERNAME",
+    "SMTP_PASSWORD",
+    "NOTIFY_EMAIL"
+]
+
+def missing_api_keys():
+    return [key for key in REQUIRED_KEYS if not os.getenv(key)]
 
 def load_api_keys():
-    """Loads API keys and verifies they are set."""
+    """
+    Loads API keys and verifies they are set. A multi-site run (AI_SITE set) only reads
+    the site's own env file, never a stray .env, and treats a missing key as an error.
+    """
+    from dotenv import load_dotenv
+    site = os.getenv("AI_SITE")
+    if site:
+        env_file = os.getenv("AI_SITE_ENV_FILE")
+        if env_file:
+            load_dotenv(env_file)
+        missing = missing_api_keys()
+        if missing:
+            raise ValueError(f"❌ Site {site} is missing required keys: {', '.join(missing)}")
+        return
+
     load_dotenv()
-    required_keys = [
-        "OPENAI_API_KEY", 
-        "GHOST_ADMIN_API_KEY", 
-        "GHOST_CONTENT_API_KEY",
-        "GHOST_ADMIN_API_URL",
-        "GHOST_CONTENT_API_URL",
-        "GHOST_IMAGE_UPLOAD_URL",
-        "DISCORD_WEBHOOK_URL",
-        "SMTP_SERVER",
-        "SMTP_PORT",
-        "SMTP_USERNAME",
-        "SMTP_PASSWORD",
-        "NOTIFY_EMAIL"
-    ]
-
-    for key in required_keys:
-        if not os.getenv(key):
-            logger.warning(f"⚠️ Missing API Key: {key}")
-
-SMTP_SERVER = os.getenv("SMTP_SERVER")
-SMTP_PORT = int(os.getenv("SMTP_PORT", 587))  # Default to 587 for TLS
-SMTP_USERNAME = os.getenv("SMTP_USERNAME")
-SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
-NOTIFY_EMAIL = os.getenv("NOTIFY_EMAIL")
-DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL")
+    for key in missing_api_keys():
+        logger.warning(f"⚠️ Missing API Key: {key}")
 
 def notify_discord(message):
-    """Sends blog updates to Discord."""
-    data = {"content": message}
-    try:
-        response = requests.post(DISCORD_WEBHOOK_URL, json=data)
-        response.raise_for_status()
-        logger.info("✅ Notification sent to Discord!")
-    except requests.exceptions.RequestException as e:
-        logger.error(f"❌ Discord notification failed: {e}")
+    """Queues a blog update for Discord (delivered off-thread by ai_notifier)."""
+    import ai_notifier
+    ai_notifier.notify_discord(message)
 
 def send_email_notification(title, preview_url):
-    """Sends an email notification when a new AI-generated blog is ready for review."""
-    if not all([SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, NOTIFY_EMAIL]):
-        logger.error("❌ Email notification failed: Missing SMTP credentials in .env")
-        return
+    """Queues an email notification when a new AI-generated blog is ready for review."""
+    import ai_notifier
 
     subject = f"📝 AI Blog Ready for Review: {title}"
     body = f"""
@@ -64,43 +89,131 @@ def send_email_notification(title, preview_url):
     <br>
     <p>🚀 This is an automated message from your AI Pipeline.</p>
     """
+    ai_notifier.send_email(subject, body)
 
-    msg = MIMEText(body, "html")
-    msg["Subject"] = subject
-    msg["From"] = SMTP_USERNAME
-    msg["To"] = NOTIFY_EMAIL
-
-    try:
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()  # Secure connection
-        server.login(SMTP_USERNAME, SMTP_PASSWORD)
-        server.sendmail(SMTP_USERNAME, NOTIFY_EMAIL, msg.as_string())
-        server.quit()
-
-        logger.info(f"✅ Email notification sent for blog: {title}")
-
-    except Exception as e:
-        logger.error(f"❌ Failed to send email notification: {e}")
 
+def chat_request(prompt, content="You are a professional writer.", model="gpt-4-turbo"):
+    """Chat completion request body, shared by `openai_create` and batch submissions."""
+    return {
+        "model": model,
+        "messages": [{"role": "system", "content": content}, {"role": "user", "content": prompt}],
+    }
 
-def openai_create(prompt, content="You are a professional writer."):
-    """Generates content using OpenAI API."""
+def openai_create(prompt, content="You are a professional writer.", model="gpt-4-turbo"):
+    """Generates content using OpenAI API (rate-limited and retried through ai_ratelimit)."""
+    estimated = ai_ratelimit.estimate_tokens(prompt, content)
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=[{"role": "system", "content": content}, {"role": "user", "content": prompt}]
-        )
+        with ai_metrics.span("openai_request", dependency="openai", model=model) as span:
+            response = ai_ratelimit.call_with_retry(
+                lambda: get_openai_client().chat.completions.create(**chat_request(prompt, content, model)),
+                model, estimated,
+            )
+            if response.usage:
+                span["tokens"] = response.usage.total_tokens
+        ai_ratelimit.record_usage(model, response.usage, estimated=estimated)
         return response.choices[0].message.content.strip()
     except Exception as e:
         logger.error(f"❌ OpenAI request failed: {e}")
         return None
 
+# Batch mode: non-urgent generation is written to a JSONL file, submitted as one batch
+# job (half the price of synchronous calls, separate rate limits) and collected later.
+# Results are matched back to their items by custom_id.
+
+BATCH_DIR = "batches"
+BATCH_POLL_INTERVAL = float(os.getenv("AI_BATCH_POLL_INTERVAL", 30))
+BATCH_TERMINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+
+def submit_batch(requests, description="AI blog pipeline"):
+    """
+    Submits {custom_id: chat_request(...)} as a single batch job and returns the batch ID.
+    The JSONL input file is kept under BATCH_DIR for inspection.
+    """
+    os.makedirs(BATCH_DIR, exist_ok=True)
+    path = os.path.join(BATCH_DIR, f"batch-{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}.jsonl")
+    with open(path, "w") as file:
+        for custom_id, body in requests.items():
+            file.write(json.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body}) + "\n")
+
+    client = get_openai_client()
+    with ai_metrics.span("openai_batch_submit", dependency="openai", requests=len(requests)):
+        with open(path, "rb") as file:
+            upload = (os.path.basename(path), file.read())  # Bytes, so a retried upload starts from the beginning
+        uploaded = ai_ratelimit.call_with_retry(lambda: client.files.create(file=upload, purpose="batch"), "batch-api")
+        batch = ai_ratelimit.call_with_retry(
+            lambda: client.batches.create(
+                input_file_id=uploaded.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h",
+                metadata={"description": description, "run_id": os.getenv("AI_RUN_ID") or ""},
+            ),
+            "batch-api",
+        )
+    logger.info(f"📦 Submitted batch {batch.id} with {len(requests)} requests ({path})")
+    return batch.id
+
+def wait_for_batch(batch_id, poll_interval=BATCH_POLL_INTERVAL, timeout=None):
+    """Polls a batch until it reaches a terminal state (or `timeout` seconds pass) and returns it."""
+    client = get_openai_client()
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        batch = ai_ratelimit.call_with_retry(lambda: client.batches.retrieve(batch_id), "batch-api")
+        if batch.status in BATCH_TERMINAL_STATES:
+            logger.info(f"📦 Batch {batch_id} finished: {batch.status}")
+            return batch
+        if deadline and time.monotonic() >= deadline:
+            logger.info(f"⏳ Batch {batch_id} still {batch.status}; check again later.")
+            return batch
+        counts = batch.request_counts
+        if counts:
+            logger.info(f"⏳ Batch {batch_id} {batch.status}: {counts.completed}/{counts.total} done")
+        time.sleep(poll_interval)
+
+def batch_results(batch):
+    """
+    Returns {custom_id: text or None} for a finished batch. Failed requests (and any
+    missing from an expired batch) map to None; usage is written to the cost ledger.
+    """
+    client = get_openai_client()
+    results = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        with ai_metrics.span("openai_batch_download", dependency="openai"):
+            text = ai_ratelimit.call_with_retry(lambda: client.files.content(file_id).text, "batch-api")
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            body = response.get("body") or {}
+            if response.get("status_code") != 200 or not body.get("choices"):
+                logger.error(f"❌ Batch request {record['custom_id']} failed: {record.get('error') or body.get('error')}")
+                results[record["custom_id"]] = None
+                continue
+            ai_ratelimit.record_usage(body.get("model"), body.get("usage"), batch=True)
+            results[record["custom_id"]] = body["choices"][0]["message"]["content"].strip()
+    return results
+
+def openai_batch(requests, description="AI blog pipeline", poll_interval=BATCH_POLL_INTERVAL):
+    """Submits, waits for and collects a batch: {custom_id: chat_request(...)} -> {custom_id: text or None}."""
+    if not requests:
+        return {}
+    try:
+        batch = wait_for_batch(submit_batch(requests, description), poll_interval)
+        results = batch_results(batch)
+    except Exception as e:
+        logger.error(f"❌ OpenAI batch failed: {e}")
+        results = {}
+    return {custom_id: results.get(custom_id) for custom_id in requests}
+
 
 
 def generate_ai_image(title):
     """
     Uses OpenAI to generate an image.
     """
+    import openai
     try:
         OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
         GHOST_ADMIN_API_KEY = os.getenv("GHOST_ADMIN_API_KEY")
@@ -109,17 +222,22 @@ def generate_ai_image(title):
         if not OPENAI_API_KEY or not GHOST_ADMIN_API_KEY or not GHOST_IMAGE_UPLOAD_URL:
             raise ValueError("❌ Missing required environment variables")
 
-        # Initialize OpenAI client
-        client = OpenAI(api_key=OPENAI_API_KEY)
+        # Shared OpenAI client (created once per process)
+        client = get_openai_client(OPENAI_API_KEY)
 
         # Generate AI Image
-        response = client.images.generate(
-            model="dall-e-3",
-            prompt=f"Generate an AI illustration for '{title}'",
-            size="1024x1024",
-            quality="standard",
-            n=1
-        )
+        with ai_metrics.span("openai_image", dependency="openai", model="dall-e-3"):
+            response = ai_ratelimit.call_with_retry(
+                lambda: client.images.generate(
+                    model="dall-e-3",
+                    prompt=f"Generate an AI illustration for '{title}'",
+                    size="1024x1024",
+                    quality="standard",
+                    n=1
+                ),
+                "dall-e-3",
+            )
+        ai_ratelimit.record_usage("dall-e-3", images=1)
         img_url = response.data[0].url  # Get the image URL from OpenAI
         logger.info(f"✅ AI Image Generated for Blog Post: {title}")
         return img_url
@@ -130,6 +248,7 @@ def generate_ai_image(title):
 
 def generate_token(key):
     """Generates a JWT token for Ghost API authentication."""
+    import jwt
     try:
         if not key or ":" not in key:
             raise ValueError("Invalid API key format. Expected 'key_id:secret'.")
@@ -163,6 +282,28 @@ def get_scheduled_time():
     logger.info(f"📅 Scheduled Post for: {scheduled_time_utc} UTC")
     return scheduled_time_utc
 
+def acquire_lock(lock_path):
+    """
+    Takes an exclusive, non-blocking lock on `lock_path` and writes our PID into it.
+    Returns the open handle (keep it to hold the lock) or None if another process holds it.
+    The OS drops the lock automatically if the holder dies, so stale lock files never block.
+    """
+    import fcntl
+    handle = open(lock_path, "a+")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        handle.seek(0)
+        holder = handle.read().strip()
+        handle.close()
+        logger.warning(f"🔒 {lock_path} is held by PID {holder or '?'}")
+        return None
+    handle.seek(0)
+    handle.truncate()
+    handle.write(str(os.getpid()))
+    handle.flush()
+    return handle
+
 def create_file(filename):
     if not os.path.exists(filename):
         open(filename, 'w').close()
@@ -172,13 +313,13 @@ def load_json(file_path, default_value=None):
     """Loads JSON data from a file, returning a default value if the file is missing or corrupted."""
     if os.path.exists(file_path):
         try:
-            with open(file_path, "r") as file:
+            with ai_metrics.span("file_io", dependency="disk", op="read"), open(file_path, "r") as file:
                 return json.load(file)
         except json.JSONDecodeError as e:
             logger.error(f"❌ JSON Error in {file_path}: {e}")
-    return default_value or []
+    return [] if default_value is None else default_value
 
 def save_json(file_path, data):
     """Saves data as JSON to a file."""
-    with open(file_path, "w") as file:
+    with ai_metrics.span("file_io", dependency="disk", op="write"), open(file_path, "w") as file:
         json.dump(data, file, indent=4)
\ No newline at end of file
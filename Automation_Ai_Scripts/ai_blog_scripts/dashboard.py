@@ -1,39 +1,89 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 import ai_utils
+import ai_metrics
+import engagement_rollups
+import draft_revisions
+import pandas as pd
 from ai_logger import logger
-from ai_blog_generator import post_to_ghost
+from ai_blog_generator import publish_draft
 
 app = Flask(__name__)
 
-DRAFTS_FILE = "drafts.json"
-
-def load_drafts():
-    """Loads draft blog posts pending approval."""
-    return ai_utils.load_json(DRAFTS_FILE, [])
-
-def save_drafts(drafts):
-    """Saves the updated drafts list."""
-    ai_utils.save_json(DRAFTS_FILE, drafts)
-
 @app.route("/")
 def dashboard():
-    drafts = load_drafts()
+    drafts = draft_revisions.list_drafts("pending")
     return render_template("dashboard.html", drafts=drafts)
 
+@app.route("/metrics")
+def metrics():
+    """Prometheus-style export of cumulative pipeline metric totals (counters only ever increase)."""
+    return Response(ai_metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/metrics/summary")
+def metrics_summary():
+    """p50/p95 latency, error and token totals per metric and dependency over the last week."""
+    summary = ai_metrics.latency_summary()
+    return jsonify([{"name": name, "dependency": dependency, **stats} for (name, dependency), stats in summary.items()])
+
+@app.route("/engagement/trends")
+def engagement_trends():
+    """Engagement per post per hour/day/week, read from the rollups (e.g. ?granularity=week&days=90&title=...)."""
+    granularity = request.args.get("granularity", "day")
+    if granularity not in engagement_rollups.GRANULARITIES:
+        return jsonify({"error": f"granularity must be one of {', '.join(engagement_rollups.GRANULARITIES)}"}), 400
+
+    since = pd.Timestamp.now().floor("D") - pd.Timedelta(days=request.args.get("days", 30, type=int))
+    df = engagement_rollups.query_rollups(granularity, since=since, titles=request.args.getlist("title") or None)
+    df["bucket"] = df["bucket"].dt.strftime("%Y-%m-%dT%H:%M")
+    df["title"] = df["title"].astype(str)
+    return Response(df.to_json(orient="records"), mimetype="application/json")
+
+@app.route("/drafts/<draft_id>/revise", methods=["POST"])
+def revise_draft(draft_id):
+    """Saves an edited draft body as a new revision."""
+    if draft_revisions.get_draft(draft_id, with_content=False) is None:
+        return jsonify({"error": "Unknown draft"}), 404
+    content = (request.json or {}).get("content")
+    if not content:
+        return jsonify({"error": "content is required"}), 400
+    rev = draft_revisions.save_revision(draft_id, content, source="dashboard", message=request.json.get("message"))
+    return jsonify({"message": f"Saved revision {rev}", "rev": rev})
+
+@app.route("/drafts/<draft_id>/history")
+def draft_history(draft_id):
+    """Revision list with tokens added/removed per edit."""
+    return jsonify(draft_revisions.history(draft_id))
+
+@app.route("/drafts/<draft_id>/revisions/<int:rev>")
+def draft_revision(draft_id, rev):
+    try:
+        return Response(draft_revisions.get_revision(draft_id, rev), mimetype="text/html")
+    except KeyError:
+        return jsonify({"error": "Unknown revision"}), 404
+
+@app.route("/drafts/<draft_id>/diff")
+def draft_diff(draft_id):
+    """Unified diff between two revisions (?from=1&to=3; `to` defaults to the latest)."""
+    try:
+        text = draft_revisions.diff(draft_id, request.args.get("from", 1, type=int), request.args.get("to", type=int))
+    except (KeyError, TypeError):
+        return jsonify({"error": "Unknown draft or revision"}), 404
+    return Response(text, mimetype="text/plain")
+
 @app.route("/approve", methods=["POST"])
 def approve_post():
-    """Approves a blog post and sends it to Ghost."""
+    """Approves a blog post and schedules its Ghost draft."""
     try:
-        index = int(request.json.get("index"))
-        drafts = load_drafts()
+        post = draft_revisions.get_draft(request.json.get("draft_id"))
 
-        if index < 0 or index >= len(drafts):
-            return jsonify({"error": "Invalid post index"}), 400
+        if post is None or post["status"] != "pending":
+            return jsonify({"error": "Invalid draft"}), 400
 
-        post = drafts.pop(index)
-        save_drafts(drafts)
+        # Publish the Ghost draft itself with the latest reviewed revision
+        if not publish_draft(post["draft_id"], post["title"], post["content"], post["image_url"]):
+            return jsonify({"error": "Ghost rejected the update; the draft is still pending"}), 502
 
-        post_to_ghost(post["title"], post["content"])
+        draft_revisions.set_status(post["draft_id"], "approved")
         logger.info(f"✅ Blog Approved: {post['title']}")
         ai_utils.notify_discord(f"✅ New AI blog was approved to be published: {post['title']}!")
         return jsonify({"message": "Post approved and published!"})
@@ -44,16 +94,14 @@ def approve_post():
 
 @app.route("/reject", methods=["POST"])
 def reject_post():
-    """Rejects a blog post and removes it from drafts."""
+    """Rejects a blog post and removes it from the review queue (its history is kept)."""
     try:
-        index = int(request.json.get("index"))
-        drafts = load_drafts()
+        rejected_post = draft_revisions.get_draft(request.json.get("draft_id"), with_content=False)
 
-        if index < 0 or index >= len(drafts):
-            return jsonify({"error": "Invalid post index"}), 400
+        if rejected_post is None or rejected_post["status"] != "pending":
+            return jsonify({"error": "Invalid draft"}), 400
 
-        rejected_post = drafts.pop(index)
-        save_drafts(drafts)
+        draft_revisions.set_status(rejected_post["draft_id"], "rejected")
         logger.warning(f"❌ Blog Rejected: {rejected_post['title']}")
 
         return jsonify({"message": "Post rejected and removed."})
@@ -61,4 +109,3 @@ def reject_post():
     except Exception as e:
         logger.error(f"❌ Rejection failed: {e}")
         return jsonify({"error": "Rejection failed"}), 500
-
@@ -0,0 +1,247 @@
+import os
+import re
+import json
+import zlib
+import sqlite3
+import difflib
+import argparse
+from datetime import datetime, timezone
+import ai_metrics
+from ai_logger import logger
+
+# Revision history for blog drafts awaiting review. The first version of a draft is stored
+# in full; every later edit is stored as a compressed delta against the previous revision,
+# so storage grows with the size of the edits rather than edits × article size. A full
+# keyframe is written every KEYFRAME_INTERVAL revisions (or when a delta would not be
+# smaller than the article) to bound how many deltas a read has to replay. Each revision
+# also records how many tokens it added/removed, so "what changed" needs no replay.
+
+DRAFTS_DB = os.getenv("AI_DRAFTS_DB", "drafts.db")
+KEYFRAME_INTERVAL = 20
+DRAFT_STATUSES = ("pending", "approved", "rejected")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS drafts (
+    draft_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    post_url TEXT,
+    image_url TEXT,
+    score INTEGER,
+    status TEXT NOT NULL DEFAULT 'pending',
+    head INTEGER NOT NULL,
+    created TEXT NOT NULL,
+    updated TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS revisions (
+    draft_id TEXT NOT NULL REFERENCES drafts (draft_id) ON DELETE CASCADE,
+    rev INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    body BLOB NOT NULL,
+    source TEXT,
+    message TEXT,
+    added INTEGER NOT NULL,
+    removed INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    created TEXT NOT NULL,
+    PRIMARY KEY (draft_id, rev)
+);
+CREATE INDEX IF NOT EXISTS drafts_status ON drafts (status, updated);
+"""
+
+
+def _connect():
+    conn = sqlite3.connect(DRAFTS_DB, timeout=30)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def tokenize(content):
+    """Splits HTML after every tag and newline; generated posts are often a single line."""
+    return [token for token in re.split(r"(?<=[>\n])", content) if token]
+
+
+def make_delta(old_tokens, new_tokens):
+    """
+    Delta that rebuilds `new_tokens` from `old_tokens`: a list of [start, end] ranges to
+    copy from the old version and literal token runs to insert. Returns (delta, added, removed).
+    """
+    delta, added, removed = [], 0, 0
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            delta.append([i1, i2])
+            continue
+        removed += i2 - i1
+        if j2 > j1:
+            delta.append("".join(new_tokens[j1:j2]))
+            added += j2 - j1
+    return delta, added, removed
+
+
+def apply_delta(old_tokens, delta):
+    return tokenize("".join("".join(old_tokens[op[0]:op[1]]) if isinstance(op, list) else op for op in delta))
+
+
+def _pack(value):
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode())
+
+
+def _unpack(blob):
+    return json.loads(zlib.decompress(blob))
+
+
+def _content_at(conn, draft_id, rev):
+    """Replays deltas from the closest keyframe at or before `rev`."""
+    keyframe = conn.execute(
+        "SELECT MAX(rev) FROM revisions WHERE draft_id = ? AND rev <= ? AND kind = 'full'", (draft_id, rev)
+    ).fetchone()[0]
+    if keyframe is None:
+        raise KeyError(f"Unknown draft revision {draft_id}@{rev}")
+    rows = conn.execute(
+        "SELECT kind, body FROM revisions WHERE draft_id = ? AND rev BETWEEN ? AND ? ORDER BY rev",
+        (draft_id, keyframe, rev),
+    ).fetchall()
+    tokens = tokenize(_unpack(rows[0][1]))
+    for _, body in rows[1:]:
+        tokens = apply_delta(tokens, _unpack(body))
+    return "".join(tokens)
+
+
+def save_revision(draft_id, content, title=None, source="generator", message=None, **fields):
+    """
+    Adds `content` as the next revision of `draft_id` (creating the draft on first save) and
+    returns the revision number. Saving unchanged content only updates the draft's fields.
+    Extra `fields` (post_url, image_url, score, status) are stored on the draft.
+    """
+    fields = {key: value for key, value in fields.items() if key in ("post_url", "image_url", "score", "status")}
+    with ai_metrics.span("draft_revision", dependency="sqlite"), _connect() as conn:
+        row = conn.execute("SELECT head FROM drafts WHERE draft_id = ?", (draft_id,)).fetchone()
+        now = _now()
+        if row is None:
+            rev, kind, body, added, removed = 1, "full", _pack(content), len(tokenize(content)), 0
+            conn.execute("INSERT INTO drafts (draft_id, title, head, created, updated) VALUES (?, ?, 0, ?, ?)",
+                         (draft_id, title or "Untitled Post", now, now))
+        else:
+            head = row[0]
+            previous = _content_at(conn, draft_id, head)
+            if previous == content:
+                rev = head
+                body = None
+            else:
+                rev = head + 1
+                old_tokens = tokenize(previous)
+                delta, added, removed = make_delta(old_tokens, tokenize(content))
+                body, kind = _pack(delta), "delta"
+                last_keyframe = conn.execute(
+                    "SELECT MAX(rev) FROM revisions WHERE draft_id = ? AND kind = 'full'", (draft_id,)).fetchone()[0]
+                full = _pack(content)
+                if rev - last_keyframe >= KEYFRAME_INTERVAL or len(body) >= len(full):
+                    body, kind = full, "full"
+
+        if body is not None:
+            conn.execute("INSERT INTO revisions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         (draft_id, rev, kind, body, source, message, added, removed, len(content), now))
+        if title:
+            fields["title"] = title
+        assignments = "".join(f", {key} = ?" for key in fields)
+        conn.execute(f"UPDATE drafts SET head = ?, updated = ?{assignments} WHERE draft_id = ?",
+                     (rev, now, *fields.values(), draft_id))
+
+    if body is not None:
+        logger.info(f"📝 Saved revision {rev} of draft '{title or draft_id}' ({kind}, {len(body)} bytes)")
+    return rev
+
+
+def get_revision(draft_id, rev=None):
+    """Content of `draft_id` at revision `rev` (the latest revision by default)."""
+    with _connect() as conn:
+        if rev is None:
+            row = conn.execute("SELECT head FROM drafts WHERE draft_id = ?", (draft_id,)).fetchone()
+            if row is None:
+                raise KeyError(f"Unknown draft {draft_id}")
+            rev = row[0]
+        return _content_at(conn, draft_id, rev)
+
+
+def get_draft(draft_id, with_content=True):
+    """Draft fields (and its latest content), or None."""
+    with _connect() as conn:
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT * FROM drafts WHERE draft_id = ?", (draft_id,)).fetchone()
+        if row is None:
+            return None
+        draft = dict(row)
+        if with_content:
+            draft["content"] = _content_at(conn, draft_id, draft["head"])
+    return draft
+
+
+def list_drafts(status="pending", with_content=True):
+    """Drafts with the given status, most recently updated first."""
+    with _connect() as conn:
+        ids = [row[0] for row in conn.execute(
+            "SELECT draft_id FROM drafts WHERE status = ? ORDER BY updated DESC", (status,))]
+    return [get_draft(draft_id, with_content) for draft_id in ids]
+
+
+def set_status(draft_id, status):
+    if status not in DRAFT_STATUSES:
+        raise ValueError(f"Unknown draft status: {status}")
+    with _connect() as conn:
+        conn.execute("UPDATE drafts SET status = ?, updated = ? WHERE draft_id = ?", (status, _now(), draft_id))
+
+
+def history(draft_id):
+    """Every revision's metadata (source, message, tokens added/removed, size) without replaying any deltas."""
+    with _connect() as conn:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(
+            "SELECT rev, kind, source, message, added, removed, length, LENGTH(body) AS stored_bytes, created "
+            "FROM revisions WHERE draft_id = ? ORDER BY rev", (draft_id,)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def diff(draft_id, old_rev, new_rev=None):
+    """Unified diff (split on tags/lines) between two revisions of a draft."""
+    new_rev = new_rev or get_draft(draft_id, with_content=False)["head"]
+    old, new = get_revision(draft_id, old_rev), get_revision(draft_id, new_rev)
+    return "".join(difflib.unified_diff(
+        [token.rstrip("\n") + "\n" for token in tokenize(old)],
+        [token.rstrip("\n") + "\n" for token in tokenize(new)],
+        fromfile=f"{draft_id}@{old_rev}", tofile=f"{draft_id}@{new_rev}",
+    ))
+
+
+def import_json_drafts(path):
+    """One-off migration of a legacy drafts JSON file (blog_drafts.json / drafts.json)."""
+    import ai_utils
+    imported = 0
+    for i, draft in enumerate(ai_utils.load_json(path, [])):
+        if not draft.get("content"):
+            continue
+        draft_id = draft.get("post_url", "").rstrip("/").rsplit("/", 1)[-1] or f"{os.path.basename(path)}-{i}"
+        fields = {key: draft[key] for key in ("post_url", "image_url", "score") if draft.get(key) is not None}
+        save_revision(draft_id, draft["content"], draft.get("title"), source="import", **fields)
+        imported += 1
+    logger.info(f"✅ Imported {imported} drafts from {path}")
+    return imported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Draft revision store.")
+    parser.add_argument("--import", dest="import_files", nargs="+", metavar="JSON", help="Import legacy drafts JSON files")
+    parser.add_argument("--history", metavar="DRAFT_ID", help="Show the revision history of a draft")
+    args = parser.parse_args()
+
+    for path in args.import_files or []:
+        import_json_drafts(path)
+    if args.history:
+        for revision in history(args.history):
+            print(f"r{revision['rev']:<4} {revision['created']}  {revision['kind']:<5} +{revision['added']:<5} "
+                  f"-{revision['removed']:<5} {revision['stored_bytes']:>7}B  {revision['source'] or ''} {revision['message'] or ''}")
@@ -0,0 +1,133 @@
+import os
+import sqlite3
+import pandas as pd
+from ai_logger import logger
+import engagement_store
+
+# Hourly, daily and weekly engagement rollups per post, kept in SQLite. Each update reads
+# only the snapshots newer than the stored watermark (partition pruning does the rest) and
+# merges them into the existing buckets, so reporting cost scales with the number of
+# buckets rather than raw rows. Raw partitions older than RAW_RETENTION_DAYS are
+# downsampled to one snapshot per post per day once they are safely rolled up.
+
+ROLLUP_DB = os.getenv("AI_ROLLUP_DB", "engagement_rollups.db")
+GRANULARITIES = ("hour", "day", "week")
+RAW_RETENTION_DAYS = 90
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    granularity TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    title TEXT NOT NULL,
+    samples INTEGER NOT NULL,
+    views_min INTEGER NOT NULL, views_max INTEGER NOT NULL,
+    clicks_min INTEGER NOT NULL, clicks_max INTEGER NOT NULL,
+    shares_min INTEGER NOT NULL, shares_max INTEGER NOT NULL,
+    PRIMARY KEY (granularity, bucket, title)
+);
+CREATE TABLE IF NOT EXISTS rollup_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Merges a batch into an existing bucket: Ghost counters are cumulative, so a bucket keeps
+# the first (min) and last (max) value seen; growth within the bucket is max - min.
+UPSERT = """
+INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (granularity, bucket, title) DO UPDATE SET
+    samples = samples + excluded.samples,
+    views_min = MIN(views_min, excluded.views_min), views_max = MAX(views_max, excluded.views_max),
+    clicks_min = MIN(clicks_min, excluded.clicks_min), clicks_max = MAX(clicks_max, excluded.clicks_max),
+    shares_min = MIN(shares_min, excluded.shares_min), shares_max = MAX(shares_max, excluded.shares_max)
+"""
+
+
+def _connect():
+    conn = sqlite3.connect(ROLLUP_DB, timeout=30)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def bucket_start(timestamps, granularity):
+    """Start of the hour/day/ISO week (Monday) each timestamp falls in."""
+    if granularity == "hour":
+        return timestamps.dt.floor("h")
+    if granularity == "day":
+        return timestamps.dt.floor("D")
+    return (timestamps - pd.to_timedelta(timestamps.dt.weekday, unit="D")).dt.floor("D")
+
+
+def get_watermark(conn):
+    row = conn.execute("SELECT value FROM rollup_state WHERE key = 'watermark'").fetchone()
+    return pd.Timestamp(row[0]) if row else None
+
+
+def update_rollups():
+    """Folds every snapshot newer than the watermark into the rollups. Returns rows ingested."""
+    with _connect() as conn:
+        watermark = get_watermark(conn)
+
+    df = engagement_store.read_engagement(columns=["title", "timestamp", "clicks", "shares", "views"], since=watermark)
+    if watermark is not None:
+        df = df[df["timestamp"] > watermark]
+    if df.empty:
+        logger.info("📈 Engagement rollups are up to date.")
+        return 0
+
+    rows = []
+    for granularity in GRANULARITIES:
+        buckets = df.assign(bucket=bucket_start(df["timestamp"], granularity).dt.strftime("%Y-%m-%dT%H:%M"))
+        grouped = buckets.groupby(["bucket", "title"], observed=True).agg(
+            samples=("views", "size"),
+            views_min=("views", "min"), views_max=("views", "max"),
+            clicks_min=("clicks", "min"), clicks_max=("clicks", "max"),
+            shares_min=("shares", "min"), shares_max=("shares", "max"),
+        ).reset_index()
+        grouped.insert(0, "granularity", granularity)
+        grouped["title"] = grouped["title"].astype(str)
+        rows.extend(grouped.astype(object).itertuples(index=False, name=None))  # Plain ints for sqlite3
+
+    new_watermark = df["timestamp"].max()
+    with _connect() as conn:  # One transaction: buckets and watermark move together
+        conn.executemany(UPSERT, rows)
+        conn.execute("INSERT OR REPLACE INTO rollup_state VALUES ('watermark', ?)", (new_watermark.isoformat(),))
+
+    logger.info(f"📈 Rolled up {len(df)} new snapshots into {len(rows)} buckets (watermark {new_watermark}).")
+    engagement_store.downsample_partitions(min(
+        pd.Timestamp.now().floor("D") - pd.Timedelta(days=RAW_RETENTION_DAYS),
+        new_watermark.floor("D"),
+    ))
+    return len(df)
+
+
+def query_rollups(granularity="day", since=None, titles=None):
+    """
+    Returns one row per (bucket, title) with cumulative clicks/shares/views at the end of
+    the bucket and their growth within it.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity}")
+
+    sql = ("SELECT bucket, title, samples, clicks_max, shares_max, views_max, "
+           "clicks_max - clicks_min, shares_max - shares_min, views_max - views_min "
+           "FROM rollups WHERE granularity = ?")
+    params = [granularity]
+    if since is not None:
+        sql += " AND bucket >= ?"
+        params.append(pd.Timestamp(since).strftime("%Y-%m-%dT%H:%M"))
+    if titles:
+        sql += f" AND title IN ({','.join('?' * len(titles))})"
+        params.extend(titles)
+
+    with _connect() as conn:
+        df = pd.read_sql_query(sql + " ORDER BY bucket, title", conn, params=params)
+    df.columns = ["bucket", "title", "samples", "clicks", "shares", "views",
+                  "clicks_growth", "shares_growth", "views_growth"]
+    df["bucket"] = pd.to_datetime(df["bucket"])
+    df["title"] = df["title"].astype("category")
+    return df
+
+
+if __name__ == "__main__":
+    update_rollups()
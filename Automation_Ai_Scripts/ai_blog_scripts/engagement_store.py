@@ -0,0 +1,116 @@
+import os
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from ai_logger import logger
+
+# Engagement history as a Parquet dataset partitioned by snapshot date:
+#   engagement_dataset/snapshot_date=2025-03-01/part-<run>-0.parquet
+# Counts are int32, titles are dictionary-encoded (pandas categorical) and timestamps are
+# real datetimes, so a year of snapshots stays small on disk and in memory. Readers pass
+# `columns` and `since`/`titles` so only the needed columns and partitions are scanned.
+
+DATASET_DIR = "engagement_dataset"
+COUNT_COLUMNS = ["clicks", "shares", "views"]
+
+SCHEMA = pa.schema([
+    ("title", pa.dictionary(pa.int32(), pa.string())),
+    ("timestamp", pa.timestamp("s")),
+    ("clicks", pa.int32()),
+    ("shares", pa.int32()),
+    ("views", pa.int32()),
+    ("snapshot_date", pa.string()),
+])
+FILE_SCHEMA = SCHEMA.remove(SCHEMA.get_field_index("snapshot_date"))  # The partition value lives in the path
+PARTITIONING = ds.partitioning(pa.schema([("snapshot_date", pa.string())]), flavor="hive")
+
+
+def normalize(df):
+    """Coerces raw engagement rows to the compact dataset dtypes."""
+    df = df.copy()
+    for col in COUNT_COLUMNS:
+        values = pd.to_numeric(df[col], errors="coerce") if col in df.columns else 0
+        df[col] = pd.Series(values, index=df.index).fillna(0).clip(0, 2**31 - 1).astype("int32")
+    df["title"] = df["title"].fillna("Untitled Post").astype(str).astype("category") if "title" in df.columns else "Untitled Post"
+    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce").dt.floor("s") if "timestamp" in df.columns else pd.Timestamp.now().floor("s")
+    df = df.dropna(subset=["timestamp"])
+    df["snapshot_date"] = df["timestamp"].dt.strftime("%Y-%m-%d")
+    return df[["title", "timestamp", "clicks", "shares", "views", "snapshot_date"]]
+
+
+def append_snapshots(df, root=DATASET_DIR):
+    """Appends engagement rows to the dataset (one new file per touched partition)."""
+    df = normalize(df)
+    if df.empty:
+        return 0
+    table = pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+    ds.write_dataset(
+        table, root, format="parquet", partitioning=PARTITIONING,
+        basename_template=f"part-{uuid.uuid4().hex[:12]}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    logger.info(f"✅ Appended {len(df)} engagement snapshots to {root}")
+    return len(df)
+
+
+def _dataset(root):
+    return ds.dataset(root, format="parquet", schema=SCHEMA, partitioning=PARTITIONING)
+
+
+def read_engagement(columns=None, since=None, until=None, titles=None, root=DATASET_DIR):
+    """
+    Reads engagement rows as a DataFrame. `since`/`until` prune whole date partitions before
+    any file is opened; `titles` and the timestamp bounds are pushed down into the scan.
+    """
+    if not os.path.isdir(root):
+        return pd.DataFrame(columns=columns or [f.name for f in SCHEMA])
+
+    filters = []
+    if since is not None:
+        since = pd.Timestamp(since)
+        filters += [ds.field("snapshot_date") >= since.strftime("%Y-%m-%d"), ds.field("timestamp") >= since.to_pydatetime()]
+    if until is not None:
+        until = pd.Timestamp(until)
+        filters += [ds.field("snapshot_date") <= until.strftime("%Y-%m-%d"), ds.field("timestamp") < until.to_pydatetime()]
+    if titles is not None:
+        filters.append(ds.field("title").cast(pa.string()).isin(list(titles)))
+
+    predicate = None
+    for expr in filters:
+        predicate = expr if predicate is None else predicate & expr
+
+    table = _dataset(root).to_table(columns=columns, filter=predicate)
+    return table.to_pandas()
+
+
+
+def downsample_partitions(before, root=DATASET_DIR):
+    """
+    Rewrites every date partition older than `before` to keep only the last snapshot of
+    each post that day. Already downsampled partitions (a single daily-*.parquet) are skipped.
+    """
+    if not os.path.isdir(root):
+        return 0
+    cutoff = f"snapshot_date={pd.Timestamp(before).strftime('%Y-%m-%d')}"
+    downsampled = 0
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if not name.startswith("snapshot_date=") or name >= cutoff:
+            continue
+        files = sorted(os.listdir(path))
+        if len(files) == 1 and files[0].startswith("daily-"):
+            continue
+
+        df = ds.dataset(path, format="parquet", schema=FILE_SCHEMA).to_table().to_pandas()
+        daily = df.sort_values("timestamp").groupby("title", observed=True).tail(1)
+        pq.write_table(pa.Table.from_pandas(daily, schema=FILE_SCHEMA, preserve_index=False),
+                       os.path.join(path, f"daily-{uuid.uuid4().hex[:12]}.parquet"))
+        for file in files:
+            os.remove(os.path.join(path, file))
+        downsampled += 1
+
+    if downsampled:
+        logger.info(f"🗜️ Downsampled {downsampled} raw engagement partitions older than {before:%Y-%m-%d} to daily snapshots")
+    return downsampled
@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from ai_logger import logger, log_event
+from site_config import load_sites, SITES_FILE
+
+# Runs the pipeline for several Ghost sites in parallel. Each worker process pre-imports
+# the heavy libraries once (pandas, sklearn, openai, ...) and forks every stage from that
+# warm state, so a batch of sites takes about as long as the slowest one. Each site runs
+# from its own state directory with its own environment and OpenAI budget.
+
+_base_env = None
+
+
+def init_worker():
+    """Process-pool initializer: remember the clean environment and warm up the imports."""
+    global _base_env
+    _base_env = dict(os.environ)
+    import subprocess_pipeline
+    subprocess_pipeline.warm_up()
+
+
+def run_site(site):
+    """Runs the full pipeline for one site inside a pool worker. Returns (name, succeeded, seconds)."""
+    import subprocess_pipeline
+    import ai_utils
+
+    # Start from the worker's clean environment so one site's keys never leak into the next
+    os.environ.clear()
+    os.environ.update(_base_env)
+    os.environ.update(site.environment())
+    missing = ai_utils.missing_api_keys()
+    if missing:
+        raise ValueError(f"❌ {site.env_file} is missing required keys: {', '.join(missing)}")
+
+    os.makedirs(site.state_dir, exist_ok=True)
+    os.makedirs(os.path.join(site.state_dir, "ai_images"), exist_ok=True)
+    os.chdir(site.state_dir)
+
+    start = time.time()
+    logger.info(f"🌐 Starting pipeline for site {site.name} in {site.state_dir}")
+    succeeded = subprocess_pipeline.run_pipeline(runner="fork")
+    return site.name, succeeded, time.time() - start
+
+
+def run_sites(sites, workers=None):
+    """Runs every site on a process pool and returns {name: succeeded}."""
+    workers = workers or len(sites)
+    start = time.time()
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+        futures = {executor.submit(run_site, site): site.name for site in sites}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                _, succeeded, elapsed = future.result()
+            except Exception as e:
+                logger.error(f"❌ Pipeline for site {name} crashed: {e}")
+                succeeded, elapsed = False, None
+            results[name] = succeeded
+            if succeeded:
+                logger.info(f"✅ Site {name} finished in {elapsed:.2f}s")
+            elif elapsed is not None:
+                logger.error(f"❌ Site {name} failed after {elapsed:.2f}s")
+            log_event("site_finished", stage="multi_site", site=name, outcome="ok" if succeeded else "failed",
+                      duration=round(elapsed, 3) if elapsed is not None else None)
+
+    logger.info(f"🎯 {sum(results.values())}/{len(results)} sites succeeded in {time.time() - start:.2f}s")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the AI blog pipeline for several sites in parallel.")
+    parser.add_argument("--sites", default=SITES_FILE, help="Sites file (default: sites.json)")
+    parser.add_argument("--only", help="Comma-separated site names to run")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per site)")
+    args = parser.parse_args()
+
+    sites = load_sites(args.sites)
+    if args.only:
+        wanted = set(args.only.split(","))
+        sites = [site for site in sites if site.name in wanted]
+    if not sites:
+        logger.error("❌ No sites to run.")
+        sys.exit(1)
+
+    results = run_sites(sites, args.workers)
+    sys.exit(0 if all(results.values()) else 1)
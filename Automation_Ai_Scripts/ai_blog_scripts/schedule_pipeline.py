@@ -1,40 +1,135 @@
-import schedule
-import time
-import subprocess
-import signal
+import os
 import sys
+import signal
+import argparse
+import threading
+from datetime import datetime, timedelta
 from ai_logger import logger
+from ai_utils import load_json, save_json, acquire_lock
+from subprocess_pipeline import stream_command, warm_up
+
+# Scheduler daemon for the AI pipeline. Jobs live in a persistent table (scheduler_jobs.json)
+# so a restart knows when each job last ran and can catch up a run missed during downtime.
+# Only one scheduler may run at a time (scheduler.lock), and the pipeline takes its own
+# pipeline.lock so a slow run is never overlapped by the next one.
+
+JOBS_FILE = "scheduler_jobs.json"
+SCHEDULER_LOCK_FILE = "scheduler.lock"
+
+# Daily jobs: name -> "HH:MM" (local time)
+DEFAULT_JOBS = {
+    "ai_pipeline": {"at": "02:00"},
+}
+
+stop_event = threading.Event()
+worker_mode = "cold"
+
+def next_occurrence(at, after):
+    """Returns the first datetime after `after` that falls on the daily time `at`."""
+    hour, minute = map(int, at.split(":"))
+    candidate = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if candidate <= after:
+        candidate += timedelta(days=1)
+    return candidate
+
+def load_jobs():
+    """Loads the job table, adding any new default jobs and scheduling ones never run."""
+    jobs = load_json(JOBS_FILE, {})
+    now = datetime.now()
+    for name, config in DEFAULT_JOBS.items():
+        job = jobs.setdefault(name, {})
+        if job.get("at") != config["at"]:
+            job["at"] = config["at"]
+            job["next_run"] = next_occurrence(config["at"], now).isoformat()
+        job.setdefault("next_run", next_occurrence(job["at"], now).isoformat())
+        job.setdefault("last_run", None)
+        job.setdefault("last_status", None)
+    save_json(JOBS_FILE, jobs)
+    return jobs
 
 def run_scheduled_pipeline():
-    """Triggers the AI pipeline at a scheduled time."""
-    logger.info("⏳ Running scheduled AI pipeline...")
-    
+    """Triggers the AI pipeline and returns True if it succeeded."""
+    logger.info(f"⏳ Running scheduled AI pipeline ({worker_mode} worker)...")
+
+    if worker_mode == "warm":
+        import subprocess_pipeline
+        succeeded = subprocess_pipeline.run_pipeline(runner="fork")
+    else:
+        succeeded = stream_command(["python3", "subprocess_pipeline.py"], "pipeline") == 0
+
+    if succeeded:
+        logger.info("✅ AI pipeline completed successfully!")
+    else:
+        logger.error("❌ AI pipeline execution failed or was skipped.")
+    return succeeded
+
+JOB_FUNCTIONS = {
+    "ai_pipeline": run_scheduled_pipeline,
+}
+
+def run_job(jobs, name):
+    """Runs one job and records the outcome and next deadline in the job table."""
+    job = jobs[name]
+    started = datetime.now()
     try:
-        result = subprocess.run(["python3", "subprocess_pipeline.py"], check=True, capture_output=True, text=True)
-        
-        logger.info(f"✅ AI pipeline completed successfully!\nOutput:\n{result.stdout}")
+        succeeded = JOB_FUNCTIONS[name]()
+    except Exception as e:
+        logger.error(f"❌ Job {name} raised an error: {e}")
+        succeeded = False
 
-        if result.stderr:
-            logger.warning(f"⚠️ Warnings from pipeline:\n{result.stderr}")
+    job["last_run"] = started.isoformat()
+    job["last_status"] = "ok" if succeeded else "failed"
+    job["next_run"] = next_occurrence(job["at"], datetime.now()).isoformat()
+    save_json(JOBS_FILE, jobs)
+    logger.info(f"🗓️ Next {name} run at {job['next_run']}")
 
-    except subprocess.CalledProcessError as e:
-        logger.error(f"❌ AI pipeline execution failed: {e}")
+def run_forever():
+    jobs = load_jobs()
 
-# Schedule the pipeline to run every day at 2 AM
-schedule.every().day.at("02:00").do(run_scheduled_pipeline)
-logger.info("🕒 Scheduled AI pipeline to run every day at 2 AM.")
+    # Catch up once for any run missed while the scheduler was down
+    now = datetime.now()
+    for name, job in jobs.items():
+        if name in JOB_FUNCTIONS and datetime.fromisoformat(job["next_run"]) < now:
+            logger.info(f"⏩ Missed {name} run scheduled for {job['next_run']}; catching up now.")
+            run_job(jobs, name)
+
+    while not stop_event.is_set():
+        name, deadline = min(
+            ((name, datetime.fromisoformat(job["next_run"])) for name, job in jobs.items() if name in JOB_FUNCTIONS),
+            key=lambda item: item[1],
+        )
+        # Sleep until the next deadline instead of polling; a signal wakes us immediately
+        if stop_event.wait(max(0.0, (deadline - datetime.now()).total_seconds())):
+            break
+        run_job(jobs, name)
 
 # Graceful shutdown handling
 def signal_handler(sig, frame):
     logger.info("🛑 Shutting down AI scheduler gracefully...")
-    sys.exit(0)
-
-signal.signal(signal.SIGINT, signal_handler)
-signal.signal(signal.SIGTERM, signal_handler)
+    stop_event.set()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the AI pipeline on a schedule.")
+    parser.add_argument("--profile", nargs="?", const="cprofile", choices=["cprofile", "sample"],
+                        help="Profile every stage of each scheduled run")
+    parser.add_argument("--worker", choices=["cold", "warm"], default="cold",
+                        help="warm: pre-import heavy libraries once and fork each stage from this process")
+    args = parser.parse_args()
+    if args.profile:
+        os.environ["AI_PROFILE"] = args.profile  # Inherited by subprocess_pipeline and its stages
+        logger.info(f"🔬 Profiling enabled ({args.profile}) for scheduled runs.")
+
+    scheduler_lock = acquire_lock(SCHEDULER_LOCK_FILE)
+    if scheduler_lock is None:
+        logger.error("❌ Another AI scheduler is already running. Exiting.")
+        sys.exit(1)
+
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    worker_mode = args.worker
+    if worker_mode == "warm":
+        warm_up()
+
     logger.info("🚀 AI Scheduler started. Waiting for scheduled tasks...")
-    
-    while True:
-        schedule.run_pending()
-        time.sleep(60)  # Check every minute
+    run_forever()
@@ -0,0 +1,50 @@
+import os
+import json
+from dataclasses import dataclass
+from dotenv import dotenv_values
+
+# Per-site configuration for running the pipeline against several Ghost blogs.
+# sites.json lists the sites; each one has its own .env file (API keys, Ghost URLs,
+# Discord webhook, SMTP settings) and its own state directory for JSON/CSV/model files:
+#
+#   [
+#     {"name": "bytewhere", "env_file": "sites/bytewhere.env", "blog_url": "https://bytewhere.com",
+#      "openai_rpm": 60, "openai_tpm": 90000},
+#     {"name": "second-blog", "env_file": "sites/second.env", "state_dir": "sites/second-blog"}
+#   ]
+
+SITES_FILE = "sites.json"
+STATE_ROOT = "sites"
+
+
+@dataclass
+class SiteConfig:
+    name: str
+    env_file: str
+    state_dir: str = None
+    blog_url: str = None
+    openai_rpm: int = None  # Per-site OpenAI request budget (requests/minute)
+    openai_tpm: int = None  # Per-site OpenAI token budget (tokens/minute)
+
+    def __post_init__(self):
+        self.state_dir = os.path.abspath(self.state_dir or os.path.join(STATE_ROOT, self.name))
+        self.env_file = os.path.abspath(self.env_file)
+
+    def environment(self):
+        """Returns the environment overlay for this site's pipeline run."""
+        env = {key: value for key, value in dotenv_values(self.env_file).items() if value is not None}
+        env["AI_SITE"] = self.name
+        env["AI_SITE_ENV_FILE"] = self.env_file
+        if self.blog_url:
+            env["BLOG_URL"] = self.blog_url
+        if self.openai_rpm:
+            env["AI_OPENAI_RPM"] = str(self.openai_rpm)
+        if self.openai_tpm:
+            env["AI_OPENAI_TPM"] = str(self.openai_tpm)
+        return env
+
+
+def load_sites(path=SITES_FILE):
+    """Loads every site from sites.json."""
+    with open(path, "r") as file:
+        return [SiteConfig(**entry) for entry in json.load(file)]
@@ -1,53 +1,300 @@
+import os
+import sys
+import logging
+import argparse
 import subprocess
 import time
-from ai_logger import logger
-from ai_utils import load_api_keys
+import hashlib
+from collections import deque
+from ai_logger import logger, log_event, new_run_id
+from ai_utils import load_api_keys, acquire_lock, load_json, save_json
+import ai_metrics
+import ai_ratelimit
 
 # Load API keys at the beginning of execution
 load_api_keys()
 
 
-# Define tasks in the correct execution order
+# Define tasks in the correct execution order. Each task declares the files it reads and
+# writes: a stage is skipped when its script and inputs hash the same as at its last
+# successful run, and a failed stage blocks every later stage that reads its outputs.
+# Inputs ending in "?" are optional: they are fingerprinted, but a failed producer does not
+# block the reader (e.g. the topic generator falls back to topics.json without a model).
+# `always_run` stages read external sources (Ghost), so there is nothing local to compare.
+# A stage must exit non-zero when it fails, or its stale outputs would be recorded as fresh.
 TASKS = [
-    ("📥 Fetching engagement data from Ghost...", "ai_fetch_data.py"),
-    ("📊 Running AI A/B Analysis...", "ai_ab_analysis.py"),
-    ("🤖 Training AI Predictor...", "ai_predictor.py"),
-    ("🔮 Generating AI-Predicted Blog Titles...", "ai_topic_generator.py"),
-    ("🖼️ Generating and Uploading Blog Image...", "ai_image_generator.py"),
-    ("📝 Generating and Publishing New Blog...", "ai_blog_generator.py")
+    {"description": "📥 Fetching engagement data from Ghost...", "script": "ai_fetch_data.py",
+     "inputs": [], "outputs": ["fetch_data.json"], "always_run": True},
+    {"description": "📊 Running AI A/B Analysis...", "script": "ai_ab_analysis.py",
+     # engagement_dataset/ is left out: it is the stage's own append-only snapshot history, no
+     # later stage reads it, and rerunning because it changed would append the same fetch twice
+     "inputs": ["fetch_data.json", "title_variations_log.json?"], "outputs": ["engagement_rollups.db", "ab_winners.json"]},
+    {"description": "🤖 Training AI Predictor...", "script": "ai_predictor.py",
+     "inputs": ["engagement_rollups.db"], "outputs": ["ab_predictor.pkl", "model_metrics.json"]},
+    {"description": "🔮 Generating AI-Predicted Blog Titles...", "script": "ai_topic_generator.py",
+     "inputs": ["ab_predictor.pkl?", "engagement_rollups.db", "ab_winners.json?", "topics.json?"],
+     "outputs": ["predicted_titles.json"]},
+    {"description": "🖼️ Generating and Uploading Blog Image...", "script": "ai_image_generator.py",
+     "inputs": ["predicted_titles.json"], "outputs": ["img_urls.json", "img_variants.json"]},
+    {"description": "📝 Generating and Publishing New Blog...", "script": "ai_blog_generator.py",
+     "inputs": ["predicted_titles.json", "img_urls.json"], "outputs": []},
 ]
 
-def run_task(description, script_name):
-    """Executes a subprocess, logs the result, and tracks execution time."""
+RUNS_DIR = "runs"  # runs/<run_id>/manifest.json
+STAGE_CACHE_FILE = os.path.join(RUNS_DIR, "stage_cache.json")  # Last successful fingerprint per stage
+PIPELINE_LOCK_FILE = "pipeline.lock"
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))  # Stages may run from a per-site state directory
+WARM_IMPORTS = ("numpy", "pandas", "sklearn", "requests", "openai", "PIL.Image")
+
+# "subprocess" starts a fresh interpreter per stage; "fork" forks each stage from this
+# (already warm) process so heavy imports are paid once per worker, not once per stage.
+STAGE_RUNNER = os.getenv("AI_STAGE_RUNNER", "subprocess")
+FAILURE_TAIL_LINES = 40  # Output lines copied into the log when a stage fails
+
+def script_path(script_name):
+    return os.path.join(SCRIPT_DIR, script_name)
+
+def warm_up():
+    """Pre-imports the heavy libraries once so every forked stage starts warm."""
+    start = time.time()
+    if SCRIPT_DIR not in sys.path:
+        sys.path.insert(0, SCRIPT_DIR)
+    for module in WARM_IMPORTS:
+        try:
+            __import__(module)
+        except ImportError:
+            logger.warning(f"⚠️ Could not pre-import {module}; stages will import it themselves.")
+    logger.info(f"🔥 Warm worker ready in {time.time() - start:.2f}s")
+
+_profile_mode = (None, "off")  # (raw AI_PROFILE, validated mode); per-site runs may change the env
+
+def profile_mode():
+    """AI_PROFILE if it names a profiler mode, else "off" (validated by ai_profiler, once per value)."""
+    global _profile_mode
+    raw = os.getenv("AI_PROFILE", "off")
+    if raw != _profile_mode[0]:
+        mode = "off"
+        if raw.strip().lower() not in ("", "off"):
+            import ai_profiler  # Only imported when profiling was asked for
+            mode = ai_profiler.normalize_mode(raw)
+        _profile_mode = (raw, mode)
+    return _profile_mode[1]
+
+def stage_command(script_name):
+    """Builds the child command, wrapping it in ai_profiler.py when AI_PROFILE is set."""
+    if profile_mode() != "off":
+        return ["python3", script_path("ai_profiler.py"), script_path(script_name), "--mode", profile_mode()]
+    return ["python3", script_path(script_name)]
+
+def stream_command(command, label, env=None):
+    """
+    Runs a command and echoes its output line by line as it arrives. Returns the exit code.
+    The child logs to the shared log file itself, so its lines are not logged a second time;
+    only the tail of a failed command's output (e.g. a traceback) is copied into the log.
+    """
+    env = {**(os.environ if env is None else env), "PYTHONUNBUFFERED": "1"}  # Lines arrive as they're written
+    tail = deque(maxlen=FAILURE_TAIL_LINES)
+    with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                          text=True, bufsize=1, env=env) as process:
+        for line in process.stdout:
+            sys.stdout.write(f"[{label}] {line}")
+            sys.stdout.flush()
+            tail.append(line.rstrip())
+    if process.returncode != 0 and tail:
+        logger.error(f"📄 [{label}] last {len(tail)} lines of output:\n" + "\n".join(tail))
+    return process.returncode
+
+def _run_forked(script_name, env):
+    """Runs a stage as `__main__` in a forked child of this process. Returns the exit code."""
+    import runpy
+    import ai_logger
+
+    ai_metrics.flush()  # Don't let the child inherit (and re-write) buffered samples
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            os.environ.update(env)
+            ai_logger.set_context(env["AI_RUN_ID"], script_name)
+            sys.argv = [script_path(script_name)]
+            if profile_mode() != "off":
+                import ai_profiler
+                ai_profiler.profile_script(script_path(script_name), profile_mode())
+            else:
+                runpy.run_path(script_path(script_name), run_name="__main__")
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except BaseException:
+            logger.exception(f"❌ {script_name} raised an unhandled exception")
+            code = 1
+        finally:
+            if "ai_notifier" in sys.modules:
+                sys.modules["ai_notifier"].drain()  # os._exit skips atexit handlers
+            ai_metrics.flush()
+            ai_logger.shutdown()
+            os._exit(code)
+
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status)
+
+def run_task(description, script_name, run_id=None, runner=None):
+    """Executes a stage, streams its output into the log, and tracks execution time."""
     logger.info(description)
     start_time = time.time()  # Track start time
 
-    try:
-        result = subprocess.run(["python3", script_name], check=True, capture_output=True, text=True)
-        elapsed_time = time.time() - start_time  # Compute time taken
+    # Child scripts tag their structured log records with the run ID and stage
+    env = {**os.environ, "AI_RUN_ID": run_id or "", "AI_STAGE": script_name}
+
+    if (runner or STAGE_RUNNER) == "fork":
+        returncode = _run_forked(script_name, env)
+    else:
+        returncode = stream_command(stage_command(script_name), script_name, env)
+    elapsed_time = time.time() - start_time  # Compute time taken
+
+    if returncode == 0:
         logger.info(f"✅ {script_name} completed successfully in {elapsed_time:.2f}s")
+        log_event("stage_finished", run_id=run_id, stage=script_name, duration=round(elapsed_time, 3), outcome="ok")
+        ai_metrics.observe("stage_duration", elapsed_time, stage=script_name, outcome="ok")
+        return True
+
+    logger.error(f"❌ {script_name} failed after {elapsed_time:.2f}s (exit code {returncode})")
+    log_event("stage_finished", logging.ERROR, run_id=run_id, stage=script_name,
+              duration=round(elapsed_time, 3), outcome="failed", returncode=returncode)
+    ai_metrics.observe("stage_duration", elapsed_time, stage=script_name, outcome="error")
+    return False
+
+def file_hash(path):
+    """Content hash of a file; directories hash their file names, sizes and mtimes."""
+    if os.path.isdir(path):
+        digest = hashlib.sha256()
+        for root, _, files in sorted(os.walk(path)):
+            for name in sorted(files):
+                stat = os.stat(os.path.join(root, name))
+                digest.update(f"{os.path.relpath(os.path.join(root, name), path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+        return digest.hexdigest()
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def input_path(entry):
+    return entry.rstrip("?")
+
+def fingerprint(task):
+    """Hashes of the stage script and every declared input."""
+    hashes = {task["script"]: file_hash(script_path(task["script"]))}
+    hashes.update({input_path(entry): file_hash(input_path(entry)) for entry in task["inputs"]})
+    return hashes
+
+def save_manifest(manifest):
+    path = os.path.join(RUNS_DIR, manifest["run_id"], "manifest.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    save_json(path, manifest)
+
+def unchanged_since_last_success(task, inputs, stage_cache):
+    """True if the inputs match the last successful run and its outputs were not touched since."""
+    cached = stage_cache.get(task["script"])
+    if task.get("always_run") or not cached or cached["inputs"] != inputs:
+        return False
+    return all(file_hash(path) == digest for path, digest in cached["outputs"].items())
+
+def run_pipeline(runner=None, resume_run_id=None, force=False):
+    """
+    Runs the AI pipeline in dependency order, skipping stages whose inputs are unchanged.
+    Returns False if it could not run or a stage failed.
+    """
+    lock = acquire_lock(PIPELINE_LOCK_FILE)
+    if lock is None:
+        logger.warning("⏭️ Another pipeline run is in progress. Skipping this run.")
+        return False
+
+    try:
+        completed = set()
+        if resume_run_id:
+            manifest = load_json(os.path.join(RUNS_DIR, resume_run_id, "manifest.json"), None)
+            if manifest is None:
+                logger.error(f"❌ No manifest found for run {resume_run_id}.")
+                return False
+            completed = {script for script, stage in manifest["stages"].items() if stage["status"] in ("ok", "skipped", "resumed")}
+            run_id = resume_run_id
+            logger.info(f"🔁 Resuming AI Blog Pipeline run {run_id} ({len(completed)} stages already done)...")
+        else:
+            run_id = new_run_id()
+            manifest = {"run_id": run_id, "started": time.strftime("%Y-%m-%dT%H:%M:%S"), "stages": {}}
+            logger.info(f"🚀 Starting AI Blog Pipeline (run {run_id})...")
 
-        # Capture output for debugging
-        if result.stdout:
-            logger.info(f"📄 Output from {script_name}:\n{result.stdout}")
+        start_pipeline_time = time.time()
+        os.makedirs(RUNS_DIR, exist_ok=True)
+        stage_cache = load_json(STAGE_CACHE_FILE, {})
+        failed_outputs = set()  # Outputs of failed or blocked stages
+        outcome = "ok"
 
-        if result.stderr:
-            logger.warning(f"⚠️ Warnings from {script_name}:\n{result.stderr}")
+        for task in TASKS:
+            script = task["script"]
+            record = {"status": None, "finished": None}
 
-    except subprocess.CalledProcessError as e:
-        elapsed_time = time.time() - start_time
-        logger.error(f"❌ {script_name} failed after {elapsed_time:.2f}s: {e}")
+            blocked_by = [entry for entry in task["inputs"] if entry in failed_outputs]
+            if blocked_by:
+                logger.warning(f"⛔ Skipping {script}: its inputs {blocked_by} come from a failed stage.")
+                record["status"] = "blocked"
+                failed_outputs.update(task["outputs"])
+            elif script in completed:
+                logger.info(f"⏩ {script} already completed in run {run_id}.")
+                record = {**manifest["stages"][script], "status": "resumed"}
+            else:
+                inputs = fingerprint(task)
+                record["inputs"] = inputs
+                if not force and unchanged_since_last_success(task, inputs, stage_cache):
+                    logger.info(f"⏩ Skipping {script}: inputs unchanged since its last successful run.")
+                    record["status"] = "skipped"
+                    record["outputs"] = stage_cache[script]["outputs"]
+                else:
+                    succeeded = run_task(task["description"], script, run_id, runner)
+                    outputs = {path: file_hash(path) for path in task["outputs"]}
+                    missing = [path for path, digest in outputs.items() if digest is None]
+                    if succeeded and missing:
+                        logger.error(f"❌ {script} exited cleanly but did not produce {missing}.")
+                        succeeded = False
+                    record["status"] = "ok" if succeeded else "failed"
+                    record["outputs"] = outputs
+                    if succeeded:
+                        stage_cache[script] = {"inputs": inputs, "outputs": outputs, "run_id": run_id}
+                        save_json(STAGE_CACHE_FILE, stage_cache)
+                    else:
+                        failed_outputs.update(task["outputs"])
 
-def run_pipeline():
-    """Runs the full AI pipeline in sequence."""
-    logger.info("🚀 Starting AI Blog Pipeline...")
-    start_pipeline_time = time.time()
+            if record["status"] in ("failed", "blocked"):
+                outcome = "failed"
+            record["finished"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+            manifest["stages"][script] = record
+            save_manifest(manifest)  # Checkpoint after every stage
 
-    for description, script in TASKS:
-        run_task(description, script)
+        total_pipeline_time = time.time() - start_pipeline_time
+        logger.info(f"🎯 Full pipeline execution finished in {total_pipeline_time:.2f}s!")
+        if outcome != "ok":
+            logger.warning(f"🔁 Rerun the failed stages with: python3 subprocess_pipeline.py --resume {run_id}")
+        usage = ai_ratelimit.run_cost(run_id)
+        logger.info(f"💰 OpenAI usage for run {run_id}: {usage['calls']} calls, {usage['tokens']} tokens, "
+                    f"{usage['images']} images, ${usage['cost']:.4f}")
+        log_event("pipeline_finished", run_id=run_id, stage="pipeline", duration=round(total_pipeline_time, 3),
+                  outcome=outcome, openai_cost=usage["cost"], openai_tokens=usage["tokens"])
+        return outcome == "ok"
+    finally:
+        lock.close()
 
-    total_pipeline_time = time.time() - start_pipeline_time
-    logger.info(f"🎯 Full pipeline execution finished in {total_pipeline_time:.2f}s!")
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the AI blog pipeline.")
+    parser.add_argument("--profile", nargs="?", const="cprofile", choices=["cprofile", "sample"],
+                        help="Profile every stage (files go to profiles/<run_id>/)")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Continue a run from its failed or blocked stages")
+    parser.add_argument("--force", action="store_true", help="Run every stage even if its inputs are unchanged")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    run_pipeline()
+    args = parse_args()
+    if args.profile:
+        os.environ["AI_PROFILE"] = args.profile  # Inherited by every stage subprocess
+    sys.exit(0 if run_pipeline(resume_run_id=args.resume, force=args.force) else 1)
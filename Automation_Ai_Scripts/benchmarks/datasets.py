@@ -0,0 +1,47 @@
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+# Synthetic engagement snapshots shaped like the output of ai_fetch_data.py.
+
+SIZES = {"10": 10, "10k": 10_000, "1m": 1_000_000}
+
+WORDS = np.array(("AI Automation Security Privacy Python Cloud Network Data Backup Linux Scripts DevOps "
+                  "Browser Passwords Phishing Encryption Startup Productivity Tools Guide Tips").split())
+
+
+def engagement_frame(rows, titles=None, seed=42):
+    """Builds `rows` snapshots over `titles` distinct titles, with views >= clicks >= shares."""
+    rng = np.random.default_rng(seed)
+    titles = titles or max(5, min(rows // 20, 5000))
+    words = rng.choice(WORDS, size=(titles, 5))
+    title_pool = np.array([" ".join(row) for row in words])
+
+    title_idx = rng.integers(0, titles, rows)
+    views = rng.integers(0, 5000, rows)
+    clicks = (views * rng.uniform(0.01, 0.2, rows)).astype(np.int64)
+    shares = (clicks * rng.uniform(0.0, 0.3, rows)).astype(np.int64)
+    start = np.datetime64("now", "s") - np.timedelta64(365 * 24 * 3600, "s")  # The last year
+    timestamps = start + rng.integers(0, 365 * 24 * 3600, rows).astype("timedelta64[s]")
+
+    return pd.DataFrame({
+        "title": title_pool[title_idx],
+        "timestamp": pd.to_datetime(np.sort(timestamps)).strftime("%Y-%m-%dT%H:%M:%S"),
+        "clicks": clicks,
+        "shares": shares,
+        "views": views,
+    })
+
+
+def write_fetch_data(path, rows, seed=42):
+    """Writes a fetch_data.json file (the A/B analysis input)."""
+    with open(path, "w") as file:
+        json.dump(engagement_frame(rows, seed=seed).to_dict(orient="records"), file)
+
+
+def write_engagement_dataset(root, rows, seed=42):
+    """Writes a partitioned Parquet engagement dataset (the predictor input)."""
+    import engagement_store
+    shutil.rmtree(root, ignore_errors=True)
+    engagement_store.append_snapshots(engagement_frame(rows, seed=seed), root)
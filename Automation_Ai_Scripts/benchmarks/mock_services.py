@@ -0,0 +1,268 @@
+import os
+import re
+import json
+import time
+import zlib
+import struct
+import random
+import argparse
+import threading
+from email.parser import BytesParser
+from email.policy import default as email_policy
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-ins for the OpenAI (chat, batch + DALL-E), Ghost Admin/Content and Discord webhook
+# APIs, with configurable latency and failure rate. Point the pipeline at them with
+# `mock_env(base_url)`; nothing ever leaves the machine.
+
+MOCK_ADMIN_KEY = "6489a1b2c3d4e5f60718293a:" + "ab" * 32  # key_id:hex secret, valid for generate_token
+DEFAULT_POST_COUNT = 200
+
+WORDS = ("ai automation security privacy python cloud network data backup linux scripts devops "
+         "browser passwords phishing encryption startup productivity tools guide tips").split()
+
+
+def tiny_png(size=64, color=(40, 120, 200)):
+    """Builds a valid solid-colour PNG without any imaging library."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    row = b"\x00" + bytes(color) * size
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(row * size)) + chunk(b"IEND", b"")
+
+
+def synthetic_posts(count, seed=7):
+    rng = random.Random(seed)
+    posts = []
+    for i in range(count):
+        title = " ".join(rng.choice(WORDS) for _ in range(5)).title()
+        body = " ".join(rng.choice(WORDS) for _ in range(400))
+        stamp = f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T09:00:00.000+00:00"
+        posts.append({
+            "id": f"post{i:05d}",
+            "title": title,
+            "slug": f"post-{i}",
+            "url": f"https://blog.example/post-{i}/",
+            "excerpt": body[:200],
+            "html": f"<article><h2>{title}</h2><p>{body}</p></article>",
+            "published_at": stamp,
+            "updated_at": stamp,
+            "meta": {"views": rng.randint(0, 5000), "clicks": rng.randint(0, 500), "shares": rng.randint(0, 50)},
+        })
+    return posts
+
+
+class MockState:
+    def __init__(self, latency=0.0, failure_rate=0.0, post_count=DEFAULT_POST_COUNT, seed=7):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.posts = synthetic_posts(post_count, seed)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.files = {}  # file_id -> bytes, for the batch API
+        self.batches = {}
+
+    def count(self, route):
+        with self.lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    state = None  # Set per server in start_mock_services
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", content_type="application/json", headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _inject(self):
+        """Applies the configured latency; returns True if this request should fail."""
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        if self.state.failure_rate and self.state.rng.random() < self.state.failure_rate:
+            if self.state.rng.random() < 0.5:
+                self._send(429, {"error": {"message": "Rate limit reached"}}, headers={"Retry-After": "1"})
+            else:
+                self._send(500, {"error": {"message": "Mock server error"}})
+            return True
+        return False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.state.count(f"GET {url.path}")
+        if url.path.startswith("/images/"):
+            return self._send(200, tiny_png(), "image/png")
+        if self._inject():
+            return
+        if re.match(r"^/ghost/api/(content|admin)/posts/?$", url.path):
+            return self._send(200, {"posts": self._filter_posts(parse_qs(url.query))})
+        match = re.match(r"^/v1/files/([\w-]+)/content$", url.path)
+        if match and match.group(1) in self.state.files:
+            return self._send(200, self.state.files[match.group(1)], "application/octet-stream")
+        match = re.match(r"^/v1/batches/([\w-]+)$", url.path)
+        if match and match.group(1) in self.state.batches:
+            return self._send(200, self._advance_batch(match.group(1)))
+        self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        self.state.count(f"POST {url.path}")
+        body = self._read_body()
+        if self._inject():
+            return
+        if url.path == "/v1/chat/completions":
+            return self._send(200, self._chat_completion(json.loads(body or b"{}")))
+        if url.path == "/v1/files":
+            return self._send(200, self._upload_file(body))
+        if url.path == "/v1/batches":
+            return self._send(200, self._create_batch(json.loads(body or b"{}")))
+        if url.path == "/v1/images/generations":
+            host = self.headers.get("Host")
+            return self._send(200, {"created": int(time.time()), "data": [{"url": f"http://{host}/images/generated.png"}]})
+        if re.match(r"^/ghost/api/admin/posts/?$", url.path):
+            post = (json.loads(body or b"{}").get("posts") or [{}])[0]
+            return self._send(201, {"posts": [{**post, "id": f"mock{self.state.rng.randint(0, 10**9)}"}]})
+        if re.match(r"^/ghost/api/admin/images/upload/?$", url.path):
+            host = self.headers.get("Host")
+            filename, content = self._multipart_file(body)
+            extension = os.path.splitext(filename or "")[1] or ".png"
+            return self._send(201, {"images": [{"url": f"http://{host}/images/uploaded-{len(content)}{extension}"}]})
+        if url.path.startswith("/discord/"):
+            return self._send(204)
+        self._send(404, {"error": "not found"})
+
+    def _filter_posts(self, query):
+        posts = self.state.posts
+        limit = query.get("limit", ["15"])[0]
+        if "order" in query and query["order"][0].endswith("desc"):
+            posts = list(reversed(posts))
+        return posts if limit == "all" else posts[: int(limit)]
+
+    def _multipart_file(self, body):
+        """(filename, content) of the `file` part of a multipart upload."""
+        message = BytesParser(policy=email_policy).parsebytes(f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode() + body)
+        part = next(p for p in message.iter_parts() if p.get_param("name", header="content-disposition") == "file")
+        return part.get_filename(), part.get_payload(decode=True)
+
+    def _upload_file(self, body):
+        """Stores an uploaded batch input file."""
+        filename, content = self._multipart_file(body)
+        file_id = f"file-mock{len(self.state.files):06d}"
+        with self.state.lock:
+            self.state.files[file_id] = content
+        return {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                "filename": filename, "purpose": "batch"}
+
+    def _create_batch(self, payload):
+        batch_id = f"batch_mock{len(self.state.batches):06d}"
+        batch = {
+            "id": batch_id, "object": "batch", "endpoint": payload.get("endpoint"), "errors": None,
+            "input_file_id": payload.get("input_file_id"), "completion_window": payload.get("completion_window"),
+            "status": "validating", "output_file_id": None, "error_file_id": None, "created_at": int(time.time()),
+            "metadata": payload.get("metadata"), "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        with self.state.lock:
+            self.state.batches[batch_id] = batch
+        return batch
+
+    def _advance_batch(self, batch_id):
+        """Each status poll moves a batch one step: validating -> in_progress -> completed."""
+        batch = self.state.batches[batch_id]
+        if batch["status"] == "validating":
+            lines = self.state.files.get(batch["input_file_id"], b"").decode().splitlines()
+            batch.update(status="in_progress", request_counts={"total": len(lines), "completed": 0, "failed": 0})
+        elif batch["status"] == "in_progress":
+            outputs = []
+            for line in self.state.files[batch["input_file_id"]].decode().splitlines():
+                request = json.loads(line)
+                outputs.append(json.dumps({
+                    "id": f"batch_req_{len(outputs)}", "custom_id": request["custom_id"], "error": None,
+                    "response": {"status_code": 200, "request_id": "mock", "body": self._chat_completion(request["body"])},
+                }))
+            output_id = f"file-mock{len(self.state.files):06d}"
+            with self.state.lock:
+                self.state.files[output_id] = "\n".join(outputs).encode()
+            batch.update(status="completed", output_file_id=output_id, completed_at=int(time.time()),
+                         request_counts={"total": len(outputs), "completed": len(outputs), "failed": 0})
+        return batch
+
+    def _chat_completion(self, payload):
+        prompt = (payload.get("messages") or [{}])[-1].get("content", "")
+        if "title" in prompt.lower() and "variation" in prompt.lower():
+            content = "\n".join(f"{i}. {' '.join(self.state.rng.choice(WORDS) for _ in range(6)).title()}" for i in range(1, 6))
+        elif "html" in prompt.lower():
+            paragraphs = "".join(f"<p>{' '.join(self.state.rng.choice(WORDS) for _ in range(80))}</p>" for _ in range(6))
+            content = f"<h2>Introduction</h2>{paragraphs}<h2>Conclusion</h2><p>Thanks for reading.</p>"
+        else:
+            content = " ".join(self.state.rng.choice(WORDS) for _ in range(40))
+        prompt_tokens = len(prompt.split())
+        completion_tokens = len(content.split())
+        return {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "mock"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+
+def start_mock_services(latency=0.0, failure_rate=0.0, port=0, post_count=DEFAULT_POST_COUNT):
+    """Starts the mock server on a background thread. Returns (server, base_url)."""
+    handler = type("BoundMockHandler", (MockHandler,), {"state": MockState(latency, failure_rate, post_count)})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def mock_env(base_url):
+    """Environment variables that point the pipeline scripts and chatbot modules at the mock server."""
+    return {
+        "OPENAI_API_KEY": "sk-mock",
+        "OPENAI_BASE_URL": f"{base_url}/v1",
+        "GHOST_ADMIN_API_KEY": MOCK_ADMIN_KEY,
+        "GHOST_CONTENT_API_KEY": "mock-content-key",
+        "GHOST_ADMIN_API_URL": f"{base_url}/ghost/api/admin/posts/",
+        "GHOST_API_URL": f"{base_url}/ghost/api/admin/posts/",
+        "GHOST_CONTENT_API_URL": f"{base_url}/ghost/api/content",
+        "GHOST_IMAGE_UPLOAD_URL": f"{base_url}/ghost/api/admin/images/upload/",
+        "DISCORD_WEBHOOK_URL": f"{base_url}/discord/webhook",
+        "BLOG_URL": base_url,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run mock OpenAI/Ghost/Discord services.")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every API call")
+    parser.add_argument("--failure-rate", dest="failure_rate", type=float, default=0.0, help="Fraction of calls that fail (429/500)")
+    parser.add_argument("--posts", type=int, default=DEFAULT_POST_COUNT)
+    args = parser.parse_args()
+
+    server, base_url = start_mock_services(args.latency, args.failure_rate, args.port, args.posts)
+    print(f"✅ Mock services running at {base_url}")
+    for key, value in mock_env(base_url).items():
+        print(f"export {key}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
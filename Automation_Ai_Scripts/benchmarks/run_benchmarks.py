@@ -0,0 +1,287 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import statistics
+import shutil
+import subprocess
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(BENCH_DIR, "..", "ai_blog_scripts")
+CHATBOT_DIR = os.path.join(BENCH_DIR, "..", "chatbots")
+sys.path[:0] = [BENCH_DIR, SCRIPTS_DIR, CHATBOT_DIR]
+
+import datasets
+from mock_services import start_mock_services, mock_env
+
+# Offline benchmark suite. Every external API is served by mock_services, every dataset
+# is synthetic, and results are written to JSON so runs can be compared between commits:
+#   python3 run_benchmarks.py --sizes 10,10k --output before.json
+#   python3 run_benchmarks.py --sizes 10,10k --output after.json --compare before.json
+
+SCENARIOS = []
+
+
+def scenario(name, sized=False):
+    """Registers `func(size)`, which does any setup and returns the callable to time."""
+    def decorator(func):
+        SCENARIOS.append((name, sized, func))
+        return func
+    return decorator
+
+
+def timed_runs(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        "runs": repeat,
+        "min": round(min(timings), 6),
+        "median": round(statistics.median(timings), 6),
+        "mean": round(statistics.fmean(timings), 6),
+    }
+
+
+def seed_engagement(size):
+    """Writes a fresh engagement dataset and rebuilds its rollups from scratch."""
+    import engagement_store
+    import engagement_rollups
+    datasets.write_engagement_dataset(engagement_store.DATASET_DIR, datasets.SIZES[size])
+    if os.path.exists(engagement_rollups.ROLLUP_DB):
+        os.remove(engagement_rollups.ROLLUP_DB)
+    engagement_rollups.update_rollups()
+
+
+@scenario("ab_analysis", sized=True)
+def bench_ab_analysis(size):
+    import ai_ab_analysis
+    datasets.write_fetch_data(ai_ab_analysis.LOG_JSON_FILE, datasets.SIZES[size])
+    return ai_ab_analysis.process_engagement_data
+
+
+@scenario("ab_stats", sized=True)
+def bench_ab_stats(size):
+    import ai_ab_analysis
+    seed_engagement(size)
+    return ai_ab_analysis.run_ab_analysis
+
+
+@scenario("engagement_rollups", sized=True)
+def bench_engagement_rollups(size):
+    """Incremental rollup update after one more day of snapshots."""
+    import engagement_store
+    import engagement_rollups
+    seed_engagement(size)
+    batch = datasets.engagement_frame(max(datasets.SIZES[size] // 365, 10))
+    runs = iter(range(1, 10**6))
+
+    def run():
+        # Every run is a new, later snapshot batch so the watermark always advances
+        stamp = datetime.now().replace(microsecond=0) + timedelta(minutes=next(runs))
+        engagement_store.append_snapshots(batch.assign(timestamp=stamp.isoformat()))
+        engagement_rollups.update_rollups()
+    return run
+
+
+@scenario("predictor_train", sized=True)
+def bench_predictor_train(size):
+    import ai_predictor
+    seed_engagement(size)
+    return ai_predictor.train_ai_model
+
+
+@scenario("predictor_predict", sized=True)
+def bench_predictor_predict(size):
+    import ai_predictor
+    seed_engagement(size)
+    ai_predictor.train_ai_model()
+    return ai_predictor.predict_best_title
+
+
+@scenario("draft_store")
+def bench_draft_store(_):
+    """Review queue: 100 ~8 KB drafts saved and edited once, the pending list replayed, then all approved."""
+    import draft_revisions
+    content = "<p>" + "lorem ipsum " * 700 + "</p>"  # ~8 KB article
+    runs = iter(range(10**6))
+
+    def run():
+        batch = next(runs)
+        draft_ids = [f"queue-{batch}-{i}" for i in range(100)]
+        for draft_id in draft_ids:
+            draft_revisions.save_revision(draft_id, content, f"Draft {draft_id}", score=75)
+            draft_revisions.save_revision(draft_id, content.replace("</p>", " Edited.</p>"), source="dashboard")
+        draft_revisions.list_drafts("pending")  # What the dashboard renders: every head revision replayed
+        draft_revisions.history(draft_ids[0])
+        for draft_id in draft_ids:
+            draft_revisions.set_status(draft_id, "approved")  # Keep the pending queue the same size every run
+    return run
+
+
+@scenario("draft_revisions")
+def bench_draft_revisions(_):
+    """100 small edits to an ~8 KB draft in the delta-compressed revision store, then a full history read."""
+    import draft_revisions
+    paragraphs = [f"<p>{'lorem ipsum ' * 60}</p>" for _ in range(12)]
+    runs = iter(range(10**6))
+
+    def run():
+        draft_id = f"bench-{next(runs)}"
+        for i in range(100):
+            paragraphs[i % len(paragraphs)] = f"<p>Edit {i}: {'lorem ipsum ' * 60}</p>"
+            draft_revisions.save_revision(draft_id, "<article>" + "".join(paragraphs) + "</article>", f"Draft {draft_id}")
+        draft_revisions.history(draft_id)
+        draft_revisions.get_revision(draft_id)
+    return run
+
+
+@scenario("image_processing")
+def bench_image_processing(_):
+    """Hero + thumbnail variants of a 1024x1024 PNG, uploaded to the mock Ghost API."""
+    import ai_utils
+    import ai_image_processing
+    from mock_services import tiny_png
+    with open("source.png", "wb") as file:
+        file.write(tiny_png(1024))
+    upload_url, token = os.environ["GHOST_IMAGE_UPLOAD_URL"], ai_utils.generate_token(os.environ["GHOST_ADMIN_API_KEY"])
+    return lambda: ai_image_processing.upload_variants(ai_image_processing.process_image("source.png"), upload_url, token)
+
+
+@scenario("openai_create")
+def bench_openai_create(_):
+    import ai_utils
+    return lambda: [ai_utils.openai_create("Write a short intro about backups.") for _ in range(10)]
+
+
+@scenario("batch_generation")
+def bench_batch_generation(_):
+    """Titles, ranking and posts for a 10-topic backlog through the mock Batch API."""
+    import ai_utils
+    import ai_batch_generator
+    ai_utils.save_json(ai_batch_generator.BACKLOG_FILE, [f"Backlog Topic {i}" for i in range(10)])
+    return lambda: ai_batch_generator.run_batch_generation(poll_interval=0.01)
+
+
+@scenario("chatbot_cache_refresh")
+def bench_chatbot_cache_refresh(_):
+    import post_cache
+    return lambda: post_cache.refresh(full=True)
+
+
+@scenario("chatbot_search")
+def bench_chatbot_search(_):
+    import post_cache
+    import search_index
+    post_cache.refresh(full=True)
+    search_index.sync(post_cache.all_posts())
+    queries = ["python automation", "secur", "network backup", "phishing passwords", "cloud devops tips"]
+    return lambda: [search_index.search(query) for query in queries * 20]
+
+
+@scenario("chatbot_recommend_rank")
+def bench_chatbot_recommend_rank(_):
+    import post_cache
+    import search_index
+    import recommender
+    post_cache.refresh(full=True)
+    search_index.sync(post_cache.all_posts())
+    queries = ["how do I automate backups", "keep my passwords safe", "learn linux scripting"]
+    return lambda: [recommender.rank(query) for query in queries * 20]
+
+
+@scenario("pipeline_run")
+def bench_pipeline_run(_):
+    """Full subprocess pipeline against the mocks (opt-in: --pipeline), run from a scratch copy of the scripts."""
+    workdir = os.path.abspath("pipeline")
+    shutil.copytree(SCRIPTS_DIR, workdir, ignore=shutil.ignore_patterns("__pycache__", "*.json", "*.log*", "*.csv", "*.pkl"))
+    os.makedirs(os.path.join(workdir, "ai_images"), exist_ok=True)
+    datasets.write_fetch_data(os.path.join(workdir, "fetch_data.json"), 100)
+    with open(os.path.join(workdir, "topics.json"), "w") as file:
+        json.dump({"topics": [["Home Network Security", "Password Managers"]]}, file)
+    return lambda: subprocess.run(["python3", "subprocess_pipeline.py", "--force"], cwd=workdir, capture_output=True, check=False)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r") as file:
+        baseline = json.load(file)["results"]
+    print(f"\n📊 Compared with {baseline_path}")
+    print(f"{'scenario':<36} {'before':>10} {'after':>10} {'change':>9}")
+    for name, result in results.items():
+        if name not in baseline or "median" not in result or "median" not in baseline[name]:
+            continue
+        before, after = baseline[name]["median"], result["median"]
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"{name:<36} {before:>10.4f} {after:>10.4f} {change:>+8.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run offline benchmarks for the AI blog scripts.")
+    parser.add_argument("--sizes", default="10,10k", help="Dataset sizes for sized scenarios (10, 10k, 1m)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0, help="Mock API latency in seconds")
+    parser.add_argument("--failure-rate", dest="failure_rate", type=float, default=0.0)
+    parser.add_argument("--only", help="Comma-separated scenario names to run")
+    parser.add_argument("--pipeline", action="store_true", help="Include the full pipeline scenario")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    args = parser.parse_args()
+
+    output_path = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+
+    server, base_url = start_mock_services(args.latency, args.failure_rate)
+    os.environ.update(mock_env(base_url))
+    os.environ.setdefault("AI_METRICS_DB", os.path.join(tempfile.gettempdir(), "bench_metrics.db"))
+    os.chdir(tempfile.mkdtemp(prefix="ai_bench_"))
+
+    only = set(args.only.split(",")) if args.only else None
+    results = {}
+    for name, sized, func in SCENARIOS:
+        if only and name not in only:
+            continue
+        if name == "pipeline_run" and not args.pipeline:
+            continue
+        for size in (args.sizes.split(",") if sized else [None]):
+            label = f"{name}[{size}]" if size else name
+            try:
+                target = func(size)
+                logging.getLogger("AI_Pipeline_Logger").setLevel(logging.WARNING)  # ai_logger resets it on import
+                results[label] = timed_runs(target, args.repeat)
+                print(f"✅ {label:<36} median {results[label]['median']:.4f}s")
+            except Exception as e:
+                results[label] = {"error": repr(e)}
+                print(f"❌ {label:<36} {e!r}")
+
+    report = {
+        "commit": git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {"sizes": args.sizes, "repeat": args.repeat, "latency": args.latency, "failure_rate": args.failure_rate},
+        "results": results,
+    }
+    with open(output_path, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\n💾 Results written to {output_path}")
+
+    if baseline_path:
+        compare(results, baseline_path)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,42 @@
 import openai
-import requests
 import discord
 import json
 import os
+import sys
 from discord.ext import commands
 from dotenv import load_dotenv
 from datetime import datetime
 import jwt
 import asyncio
+import post_cache
+import search_index
+import recommender
+import summary_service
+import blog_watcher
+import content_pool
+
+# Share the pipeline's OpenAI rate limiter so the bot and the pipeline draw from one budget
+PIPELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ai_blog_scripts")
+sys.path.append(PIPELINE_DIR)
+os.environ.setdefault("AI_RATELIMIT_DB", os.path.join(PIPELINE_DIR, "ratelimit.db"))
+import ai_ratelimit
 
 # Load environment variables (store API keys in .env file for security)
 load_dotenv()
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
+openai.max_retries = 0  # ai_ratelimit.call_with_retry retries against the shared budget
 GHOST_API_URL = os.getenv("GHOST_API_URL")  
 GHOST_ADMIN_API_KEY = os.getenv("GHOST_ADMIN_API_KEY")
 DISCORD_BOT_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
-DISCORD_CHANNEL_ID = os.getenv("DISCORD_CHANNEL_ID")
+DISCORD_CHANNEL_ID = int(os.getenv("DISCORD_CHANNEL_ID", 0))
 REQUESTS_FILE = "blog_requests.json"
 
+# Load the persisted search index and keep it in step with the post cache
+search_index.load()
+post_cache.add_listener(search_index.on_posts_changed)
+post_cache.add_listener(summary_service.on_posts_changed)
+
 
 def print_message(message):
     print(message)
@@ -32,12 +50,17 @@ def openai_create(prompt, content="You are an AI assistant", model="gpt-4-turbo"
     :param model: The GPT model to use (default: "gpt-4-turbo").
     :return: The AI-generated response.
     """
+    estimated = ai_ratelimit.estimate_tokens(prompt, content)
     try:
-        output = openai.chat.completions.create(
-            model=model,
-            messages=[{"role": "system", "content": content},
-                    {"role": "user", "content": prompt}]
+        output = ai_ratelimit.call_with_retry(
+            lambda: openai.chat.completions.create(
+                model=model,
+                messages=[{"role": "system", "content": content},
+                        {"role": "user", "content": prompt}]
+            ),
+            model, estimated,
         )
+        ai_ratelimit.record_usage(model, output.usage, estimated=estimated)
         return output
     except Exception as e:
         print(f"❌ OpenAI API Error: {e}")
@@ -61,46 +84,25 @@ def generate_token(key):
     token = jwt.encode(payload, bytes.fromhex(secret), algorithm="HS256", headers=header)
     return token
 
-async def notify_new_blog():
-    """Checks for new blog posts and notifies Discord"""
-    last_notified = None
-
-    while True:
-        response = requests.get("https://bytewhere.com/ghost/api/content/posts/?key=YOUR_CONTENT_API_KEY")
-        if response.status_code == 200:
-            posts = response.json().get("posts", [])
-            if posts:
-                latest = posts[0]
-                title = latest["title"]
-                url = f"https://bytewhere.com/{latest['slug']}"
-                
-                if last_notified != title:
-                    last_notified = title
-                    channel = bot.get_channel(DISCORD_CHANNEL_ID)  # Replace with actual channel ID
-                    await channel.send(f"📢 **New Blog Published!**\n**{title}**\n🔗 {url} @everyone")
-
-        await asyncio.sleep(3600)  # Check every hour
-
-
-# Fetch blog posts from Ghost API
-def fetch_blog_posts():
-    jwt_token = generate_token(GHOST_ADMIN_API_KEY)
-    
-    params = {"key": jwt_token, "limit": "all"}
-
-    response = requests.get(GHOST_API_URL, params=params)
-
-    if response.status_code == 200:
-        print_message("Response code", response.status_code)
-        return response.json().get("posts", [])
-    return []
+# Fetch the blog posts most relevant to a query from the local retrieval index
+def fetch_blog_posts(user_query, k=recommender.TOP_K):
+    ranked = [post_cache.get_post(post_id) for post_id, _ in recommender.rank(user_query, k)]
+    posts = [post for post in ranked if post] or post_cache.latest_posts(k)
+    return [
+        {
+            "title": post["title"],
+            "excerpt": (post.get("custom_excerpt") or post.get("excerpt") or "")[:300],
+            "url": post_cache.post_url(post),
+        }
+        for post in posts
+    ]
 
 # AI Blog Post Recommendation
 def recommend_blog(user_query):
-    blog_posts = fetch_blog_posts()
+    blog_posts = fetch_blog_posts(user_query)
     
     prompt = f"""
-    You are an AI assistant for a tech blog. Based on the user's query, recommend the most relevant blog post from the following:
+    You are an AI assistant for a tech blog. Based on the user's query, recommend the most relevant blog post from the following candidates:
     {json.dumps(blog_posts, indent=2)}
     
     User Query: {user_query}
@@ -111,19 +113,29 @@ def recommend_blog(user_query):
     """
     
     response = openai_create(prompt)
+    if not response:
+        return "⚠️ I couldn't come up with a recommendation right now. Please try again in a minute."
 
     return response.choices[0].message.content
 
-# AI Blog Post Summarizer
+# AI Blog Post Summarizer (used by summary_service on cache misses)
+def summarize_text(blog_text):
+    ai_response = openai_create(f"Summarize the following blog post: {blog_text}")
+    return ai_response.choices[0].message.content if ai_response else None
+
+summary_service.set_summarizer(summarize_text)
+
+# Text-only GPT call used by the content pool refiller and custom polls
+def generate_text(prompt, content="You are an AI assistant"):
+    ai_response = openai_create(prompt, content=content)
+    return ai_response.choices[0].message.content if ai_response else None
+
+content_pool.set_generator(generate_text)
+
 def summarize_blog(blog_url):
-    response = requests.get(blog_url)
-    if response.status_code == 200:
-        blog_text = response.text  # Assume it's HTML, needs parsing
-        prompt = f"Summarize the following blog post: {blog_text[:3000]}"  # Limit content to 3000 chars
-        ai_response = openai_create(prompt)
-        return ai_response.choices[0].message.content
-    
-    return "Couldn't fetch the blog post."
+    post = post_cache.find_by_url(blog_url)
+    summary_text = summary_service.summarize_post(post) if post else summary_service.summarize_url(blog_url)
+    return summary_text or "Couldn't fetch the blog post."
 
 # Initialize Discord Bot
 intents = discord.Intents.default()
@@ -132,6 +144,31 @@ intents.message_content = True
 
 bot = commands.Bot(command_prefix="!", intents=intents, help_command=None)
 
+background_started = False
+watcher_task = None  # Keep a reference so the task isn't garbage collected
+
+
+def report_task_exit(task):
+    if not task.cancelled() and task.exception():
+        print(f"❌ Background task {task.get_coro().__name__} stopped: {task.exception()!r}")
+
+@bot.event
+async def on_ready():
+    """Warms the post cache once, then starts the background refreshers and the new post watcher"""
+    global background_started
+    if background_started:
+        return  # on_ready fires again on reconnect
+    background_started = True
+    await asyncio.get_running_loop().run_in_executor(None, post_cache.warm)
+    if post_cache.latest_posts():
+        search_index.sync(post_cache.all_posts())
+    summary_service.start_precompute_worker()
+    content_pool.start_refiller()
+    post_cache.start_refresher()
+    global watcher_task
+    watcher_task = asyncio.create_task(blog_watcher.watch(lambda: bot.get_channel(DISCORD_CHANNEL_ID)))
+    watcher_task.add_done_callback(report_task_exit)
+
 # Discord Command: Help
 @bot.command(name="help")
 async def help_command(ctx):
@@ -146,6 +183,8 @@ async def help_command(ctx):
     - `!request [topic]` → Request a blog on a specific topic
     - `!search [keyword]` → Search blogs on our site using that keyword
     - `!digest` → Get weekly digest 
+    - `!fact` → Get a fun tech fact
+    - `!poll [question]` → Start a poll (a ready-made one if you don't ask a question)
     - `!about` → Learn more about this bot
     """
     await ctx.send(help_text)
@@ -153,61 +192,63 @@ async def help_command(ctx):
 # Discord Command: Get Latest Blog post   
 @bot.command(name="latest")
 async def latest_blog(ctx):
-    """Fetches the latest published blog post from Ghost API"""
-    GHOST_API_URL = "https://bytewhere.com/ghost/api/content/posts/?key=YOUR_CONTENT_API_KEY"
-    
-    response = requests.get(GHOST_API_URL)
-    if response.status_code == 200:
-        posts = response.json().get("posts", [])
-        if posts:
-            latest = posts[0]
-            title = latest["title"]
-            url = f"https://bytewhere.com/{latest['slug']}"
-            await ctx.send(f"📰 **Latest Blog Post:**\n**{title}**\n🔗 {url}")
-        else:
-            await ctx.send("❌ No blog posts found.")
+    """Sends the latest published blog post from the post cache"""
+    posts = post_cache.latest_posts(1)
+    if posts:
+        latest = posts[0]
+        await ctx.send(f"📰 **Latest Blog Post:**\n**{latest['title']}**\n🔗 {post_cache.post_url(latest)}")
     else:
-        await ctx.send("⚠️ Could not fetch latest blog post. Try again later.")
+        await ctx.send("❌ No blog posts found.")
 
 # Discord Command: Schedule Blogs
 @bot.command(name="schedule")
 async def blog_schedule(ctx):
-    """Fetch upcoming scheduled posts"""
-    GHOST_API_URL = "https://bytewhere.com/ghost/api/admin/posts/?key=YOUR_ADMIN_API_KEY&filter=status:scheduled"
-    
-    response = requests.get(GHOST_API_URL)
-    if response.status_code == 200:
-        posts = response.json().get("posts", [])
-        if posts:
-            schedule_list = "\n".join([f"📅 **{p['title']}** - {p['published_at']}" for p in posts])
-            await ctx.send(f"📆 **Upcoming Scheduled Posts:**\n{schedule_list}")
-        else:
-            await ctx.send("❌ No upcoming posts scheduled.")
+    """Sends upcoming scheduled posts from the post cache"""
+    posts = post_cache.scheduled_posts()
+    if posts:
+        schedule_list = "\n".join([f"📅 **{p['title']}** - {p['published_at']}" for p in posts])
+        await ctx.send(f"📆 **Upcoming Scheduled Posts:**\n{schedule_list}")
     else:
-        await ctx.send("⚠️ Could not fetch scheduled posts. Try again later.")
+        await ctx.send("❌ No upcoming posts scheduled.")
 
 # Discord Command: Did You Know?
 @bot.command(name="fact")
 async def tech_fact(ctx):
-    """Fetches a random AI-generated fun fact"""
-    fact_prompt = "Tell me a cool fun fact about computers or the internet. Format it like this: Did you know [fact]?"
-    
-    ai_fact = openai_create(fact_prompt, content="You are a tech expert sharing fun facts.")
-    fact = ai_fact.choices[0].message.content
-    await ctx.send(f"💡 **Did you know:** {fact}")
+    """Sends a fun fact from the pre-generated content pool"""
+    fact = content_pool.take("facts")
+    if fact:
+        await ctx.send(f"💡 **Did you know:** {fact}")
+    else:
+        await ctx.send("⏳ I'm still thinking up new facts. Try again in a minute!")
 
 
-@bot.command(name="poll")
-async def start_poll(ctx, *, question):
-    """Creates a poll with AI-generated choices"""
-    poll_prompt = f"Generate 3 voting options for this question:\n{question}"
-    
-    ai_choices = openai_create(poll_prompt, content="You are an AI that generates poll choices.").choices[0].message.content.split("\n")
+async def send_poll(ctx, question, options):
+    numbers = ["1️⃣", "2️⃣", "3️⃣"]
+    lines = "\n".join(f"{number} {option}" for number, option in zip(numbers, options))
+    poll_message = await ctx.send(f"📊 **POLL:** {question}\n{lines}")
+    for number in numbers[:len(options)]:
+        await poll_message.add_reaction(number)
 
-    poll_message = await ctx.send(f"📊 **POLL:** {question}\n1️⃣ {ai_choices[0]}\n2️⃣ {ai_choices[1]}\n3️⃣ {ai_choices[2]}")
-    await poll_message.add_reaction("1️⃣")
-    await poll_message.add_reaction("2️⃣")
-    await poll_message.add_reaction("3️⃣")
+
+@bot.command(name="poll")
+async def start_poll(ctx, *, question=None):
+    """Starts a ready-made poll, or one with AI-generated choices for your own question"""
+    if question is None:
+        poll = content_pool.take("polls")
+        if poll:
+            await send_poll(ctx, poll["question"], poll["options"])
+        else:
+            await ctx.send("⏳ No polls ready yet. Try `!poll [your question]`!")
+        return
+
+    # Custom questions can't come from the pool; the GPT call runs off the event loop
+    poll_prompt = f"Generate 3 short voting options for this question, one per line:\n{question}"
+    ai_choices = await asyncio.to_thread(generate_text, poll_prompt, "You are an AI that generates poll choices.")
+    options = content_pool.parse_options(ai_choices)
+    if not options:
+        await ctx.send("❌ Couldn't come up with poll options for that question. Try rephrasing it!")
+        return
+    await send_poll(ctx, question, options)
 
 @bot.command(name="request")
 async def request_topic(ctx, *, topic):
@@ -230,14 +271,14 @@ async def request_topic(ctx, *, topic):
 @bot.command(name="recommend")
 async def recommend(ctx, *, query: str):
     await ctx.send("🔍 Finding the best blog post for you...")
-    recommendation = recommend_blog(query)
+    recommendation = await asyncio.to_thread(recommend_blog, query)
     await ctx.send(recommendation)
 
 # Discord Command: Summarize Blog Post via url
 @bot.command(name="summary")
 async def summary(ctx, *, url: str):
     await ctx.send("📄 Summarizing blog post...")
-    summary_text = summarize_blog(url)
+    summary_text = await asyncio.to_thread(summarize_blog, url)
     await ctx.send(summary_text)
 # Discord command: Shows a list of topics
 @bot.command(name="topics")
@@ -266,25 +307,20 @@ async def about_bot(ctx):
 
 @bot.command(name="search")
 async def search_blog(ctx, *, keyword):
-    """Searches for blog posts containing the keyword"""
-    response = requests.get(f"https://bytewhere.com/ghost/api/content/posts/?key=YOUR_CONTENT_API_KEY&filter=title:{keyword}")
-    
-    if response.status_code == 200:
-        posts = response.json().get("posts", [])
-        if posts:
-            result_list = "\n".join([f"🔗 **{p['title']}**: https://bytewhere.com/{p['slug']}" for p in posts])
-            await ctx.send(f"🔍 **Search Results for '{keyword}':**\n{result_list}")
-        else:
-            await ctx.send(f"❌ No results found for '{keyword}'.")
+    """Searches blog posts with the local full-text index, ranked by relevance"""
+    posts = [doc for _, doc in search_index.search(keyword)]
+    if posts:
+        result_list = "\n".join([f"🔗 **{p['title']}**: {post_cache.post_url(p)}" for p in posts])
+        await ctx.send(f"🔍 **Search Results for '{keyword}':**\n{result_list}")
+    else:
+        await ctx.send(f"❌ No results found for '{keyword}'.")
 
 @bot.command(name="digest")
 async def weekly_digest(ctx):
-    """Sends the top posts of the week"""
-    response = requests.get("https://bytewhere.com/ghost/api/content/posts/?key=YOUR_CONTENT_API_KEY&limit=5")
-    
-    if response.status_code == 200:
-        posts = response.json().get("posts", [])
-        digest_list = "\n".join([f"🔗 **{p['title']}**: https://bytewhere.com/{p['slug']}" for p in posts])
+    """Sends the top posts of the week from the post cache"""
+    posts = post_cache.latest_posts(5)
+    if posts:
+        digest_list = "\n".join([f"🔗 **{p['title']}**: {post_cache.post_url(p)}" for p in posts])
         await ctx.send(f"📅 **Weekly Blog Digest:**\n{digest_list}")
     else:
         await ctx.send("⚠️ Could not fetch the weekly digest.")
@@ -0,0 +1,189 @@
+import os
+import hmac
+import json
+import time
+import hashlib
+import asyncio
+import requests
+from datetime import datetime
+from aiohttp import web
+import post_cache
+
+# Watches Ghost for newly published posts. Polls use a conditional GET for a single,
+# field-trimmed post, so an idle poll costs a 304. A persisted high-watermark keeps
+# restarts from re-announcing or skipping posts. In webhook mode Ghost pushes
+# `post.published` events and polling only runs as a slow safety net.
+
+NOTIFY_STATE_FILE = "notify_state.json"
+NOTIFY_MODE = os.getenv("NOTIFY_MODE", "poll")  # "poll" or "webhook"
+POLL_INTERVAL = int(os.getenv("NOTIFY_POLL_INTERVAL", 60))
+WEBHOOK_FALLBACK_INTERVAL = 900  # Safety-net poll while webhooks are active
+WEBHOOK_HOST = os.getenv("NOTIFY_WEBHOOK_HOST", "127.0.0.1")  # Put a reverse proxy in front to expose it
+WEBHOOK_PORT = int(os.getenv("NOTIFY_WEBHOOK_PORT", 8088))
+WEBHOOK_PATH = "/ghost/webhook"
+GHOST_WEBHOOK_SECRET = os.getenv("GHOST_WEBHOOK_SECRET")
+SIGNATURE_MAX_AGE = 300  # Seconds; older signed requests are treated as replays
+
+POST_FIELDS = "id,title,slug,url,published_at"
+REQUEST_TIMEOUT = 10
+
+_announce_lock = asyncio.Lock()  # The webhook and the poll loop may see the same post at once
+
+
+def _published(value):
+    """Parses Ghost timestamps, which use either `Z` or `+00:00` depending on the API."""
+    return datetime.fromisoformat(value.replace("Z", "+00:00")) if value else None
+
+
+def is_new(state, post):
+    watermark = _published(state.get("last_published_at"))
+    return watermark is None or _published(post["published_at"]) > watermark
+
+
+def load_state():
+    try:
+        with open(NOTIFY_STATE_FILE, "r") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_state(state):
+    tmp_path = f"{NOTIFY_STATE_FILE}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(state, file, indent=2)
+    os.replace(tmp_path, NOTIFY_STATE_FILE)
+
+
+def _get_posts(params, headers=None):
+    params = {"key": post_cache.GHOST_CONTENT_API_KEY, "fields": POST_FIELDS, "order": "published_at asc", **params}
+    return requests.get(f"{post_cache.GHOST_CONTENT_API_URL}/posts/", params=params, headers=headers or {}, timeout=REQUEST_TIMEOUT)
+
+
+def poll_new_posts(state):
+    """
+    Returns posts published after the watermark, oldest first.
+    Only the newest post is requested (conditionally) unless it is past the watermark.
+    """
+    headers = {}
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+
+    response = _get_posts({"limit": 1, "order": "published_at desc"}, headers)
+    if response.status_code == 304:
+        return []
+    response.raise_for_status()
+
+    state["etag"] = response.headers.get("ETag")
+    state["last_modified"] = response.headers.get("Last-Modified")
+    posts = response.json().get("posts", [])
+    if not posts:
+        return []
+
+    latest = posts[0]
+    watermark = state.get("last_published_at")
+    if not watermark:
+        # First run: start watching from the current latest post without announcing it
+        advance_watermark(state, latest)
+        return []
+    if not is_new(state, latest):
+        return []
+
+    response = _get_posts({"limit": "all", "filter": f"published_at:>'{watermark}'"})
+    response.raise_for_status()
+    return response.json().get("posts", []) or [latest]
+
+
+def advance_watermark(state, post):
+    if is_new(state, post):
+        state["last_published_at"] = post["published_at"]
+        state["last_id"] = post["id"]
+    save_state(state)
+
+
+async def announce(channel, state, posts):
+    """Sends one message per new post and moves the watermark past each one as it goes."""
+    async with _announce_lock:  # is_new and the watermark update must not interleave across the send
+        for post in posts:
+            if not is_new(state, post):
+                continue  # Already announced (e.g. webhook and poll both saw it)
+            url = post_cache.post_url(post)
+            await channel.send(f"📢 **New Blog Published!**\n**{post['title']}**\n🔗 {url} @everyone")
+            advance_watermark(state, post)
+
+
+async def poll_loop(get_channel, state, interval):
+    while True:
+        try:
+            channel = get_channel()
+            if channel is None:
+                # DISCORD_CHANNEL_ID unset/wrong or the guild cache isn't ready; don't advance the watermark
+                print("⚠️ Announcement channel not available; skipping new post check.")
+            else:
+                posts = await asyncio.to_thread(poll_new_posts, state)
+                if posts:
+                    await announce(channel, state, posts)
+                else:
+                    save_state(state)
+        except Exception as e:  # Never let one bad cycle kill the watcher
+            print(f"⚠️ New post check failed: {e!r}")
+        await asyncio.sleep(interval)
+
+
+def verify_signature(body, header):
+    """
+    Validates Ghost's `X-Ghost-Signature: sha256=<hex>, t=<timestamp ms>` header, rejecting
+    unsigned requests and signatures older than SIGNATURE_MAX_AGE.
+    """
+    if not GHOST_WEBHOOK_SECRET:
+        return False
+    try:
+        parts = dict(part.strip().split("=", 1) for part in header.split(","))
+        signed_at = int(parts["t"]) / 1000
+    except (AttributeError, ValueError, KeyError):
+        return False
+    if abs(time.time() - signed_at) > SIGNATURE_MAX_AGE:
+        return False
+    expected = hmac.new(GHOST_WEBHOOK_SECRET.encode(), body + parts.get("t", "").encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, parts.get("sha256", ""))
+
+
+async def start_webhook_server(get_channel, state):
+    """Receives Ghost `post.published` webhooks and announces the post immediately."""
+    async def handle(request):
+        body = await request.read()
+        if not verify_signature(body, request.headers.get("X-Ghost-Signature")):
+            return web.Response(status=401)
+
+        try:
+            post = json.loads(body).get("post", {}).get("current") or {}
+        except (ValueError, AttributeError):  # Signed but not the payload we expect
+            return web.Response(status=400)
+        if post.get("status") == "published" and post.get("published_at"):
+            post_cache.upsert(post)
+            channel = get_channel()
+            if channel is None:
+                return web.Response(status=503)  # Ghost retries; the safety-net poll also catches it
+            await announce(channel, state, [post])
+        return web.Response(status=204)
+
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+    print(f"✅ Listening for Ghost webhooks on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+
+async def watch(get_channel):
+    """Entry point: runs the watcher in the configured mode until the bot stops."""
+    state = load_state()
+    interval = POLL_INTERVAL
+    if NOTIFY_MODE == "webhook" and not GHOST_WEBHOOK_SECRET:
+        print("❌ NOTIFY_MODE=webhook requires GHOST_WEBHOOK_SECRET; falling back to polling.")
+    elif NOTIFY_MODE == "webhook":
+        await start_webhook_server(get_channel, state)
+        interval = WEBHOOK_FALLBACK_INTERVAL
+    await poll_loop(get_channel, state, interval)
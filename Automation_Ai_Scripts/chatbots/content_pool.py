@@ -0,0 +1,182 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import deque
+
+# Ready-made content for !fact and !poll. A background thread asks GPT for a whole batch
+# of facts or polls in one prompt whenever a pool drops below LOW_WATER, validates and
+# de-duplicates the items, and keeps them in a ring buffer persisted to POOL_FILE. The
+# commands only pop from the pool, so they answer instantly and never wait on GPT.
+
+POOL_FILE = "content_pool.json"
+CAPACITY = 60  # Ready items kept per kind
+LOW_WATER = 15  # Refill when fewer items than this are ready
+BATCH_SIZE = 20  # Items requested per prompt
+SEEN_LIMIT = 1000  # Recently served/queued items remembered for de-duplication
+REFILL_CHECK_INTERVAL = 600  # Seconds between checks when nothing was taken
+MAX_FACT_CHARS = 300
+MAX_QUESTION_CHARS = 200
+MAX_OPTION_CHARS = 80
+POLL_OPTIONS = 3
+
+KINDS = ("facts", "polls")
+PROMPTS = {
+    "facts": (
+        f"Write {BATCH_SIZE} different, surprising and accurate fun facts about computers, the internet or technology. "
+        'Reply with JSON only: {"facts": ["fact", ...]}. Each fact is one sentence without a "Did you know" prefix.',
+        "You are a tech expert sharing fun facts.",
+    ),
+    "polls": (
+        f"Write {BATCH_SIZE} different fun community poll questions about technology, each with exactly {POLL_OPTIONS} short answer options. "
+        'Reply with JSON only: {"polls": [{"question": "...", "options": ["...", "...", "..."]}, ...]}',
+        "You are an AI that generates poll choices.",
+    ),
+}
+
+_lock = threading.Lock()
+_pools = None
+_seen = None
+_generator = None
+_wake = threading.Event()
+
+
+def set_generator(generate):
+    """Sets the `generate(prompt, content) -> str` callable used for refills (the chatbot's GPT call)."""
+    global _generator
+    _generator = generate
+
+
+def _load():
+    global _pools, _seen
+    if _pools is None:
+        try:
+            with open(POOL_FILE, "r") as file:
+                data = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        _pools = {kind: deque(data.get(kind, []), maxlen=CAPACITY) for kind in KINDS}
+        _seen = deque(data.get("seen", []), maxlen=SEEN_LIMIT)
+    return _pools
+
+
+def _save():
+    data = {kind: list(pool) for kind, pool in _pools.items()}
+    data["seen"] = list(_seen)
+    tmp_path = f"{POOL_FILE}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(data, file, indent=2)
+    os.replace(tmp_path, POOL_FILE)
+
+
+def _key(text):
+    return hashlib.sha1(re.sub(r"[^a-z0-9]+", " ", text.lower()).strip().encode()).hexdigest()[:16]
+
+
+def _clean(text):
+    return re.sub(r"^\s*(?:[-*•]|\d+[.)]|[1-9]️⃣)\s*", "", str(text or "")).strip().strip('"').strip()
+
+
+def _validate_fact(fact):
+    fact = _clean(fact)
+    question = re.match(r"^did you know[:,]?\s*(that\s+)?", fact, flags=re.IGNORECASE)
+    if question:  # "Did you know that X?" -> "X."
+        fact = fact[question.end():].strip().rstrip("?") + "."
+    if not 20 <= len(fact) <= MAX_FACT_CHARS:
+        return None
+    return fact[0].upper() + fact[1:]
+
+
+def parse_options(text, count=POLL_OPTIONS):
+    """Poll options from a GPT reply (JSON list or one per line), or None if there aren't `count` usable ones."""
+    try:
+        options = json.loads(text)
+    except (TypeError, ValueError):
+        options = None
+    if not isinstance(options, list):  # e.g. a bare number or quoted string is valid JSON too
+        options = str(text or "").split("\n")
+    options = [_clean(option) for option in options if isinstance(option, str)]
+    options = list(dict.fromkeys(option for option in options if 0 < len(option) <= MAX_OPTION_CHARS))
+    return options[:count] if len(options) >= count else None
+
+
+def _validate_poll(poll):
+    if not isinstance(poll, dict):
+        return None
+    question = _clean(poll.get("question"))
+    options = parse_options(json.dumps(poll.get("options") or []))
+    if not question or len(question) > MAX_QUESTION_CHARS or not options:
+        return None
+    return {"question": question, "options": options}
+
+
+def parse_batch(kind, text):
+    """Validated items from one batched reply; tolerates prose or code fences around the JSON."""
+    match = re.search(r"\{.*\}", text or "", re.DOTALL)
+    try:
+        items = json.loads(match.group(0)).get(kind, []) if match else []
+    except (ValueError, AttributeError):
+        items = []
+    if kind == "facts" and not items:
+        items = (text or "").split("\n")  # Plain numbered list fallback
+    validate = _validate_fact if kind == "facts" else _validate_poll
+    return [item for item in map(validate, items) if item]
+
+
+def _item_key(kind, item):
+    return _key(item if kind == "facts" else item["question"])
+
+
+def refill(kind):
+    """Generates one batch for `kind` and adds the new, unique items. Returns the number added."""
+    if _generator is None:
+        return 0
+    items = parse_batch(kind, _generator(*PROMPTS[kind]))
+    added = 0
+    with _lock:
+        pool = _load()[kind]
+        for item in items:
+            key = _item_key(kind, item)
+            if key in _seen or len(pool) >= CAPACITY:
+                continue
+            pool.append(item)
+            _seen.append(key)
+            added += 1
+        _save()
+    print(f"🧺 Added {added} {kind} to the content pool ({len(pool)} ready)")
+    return added
+
+
+def take(kind):
+    """Pops the oldest ready item (a fact string or a poll dict), or None if the pool is empty."""
+    with _lock:
+        pool = _load()[kind]
+        item = pool.popleft() if pool else None
+        if item is not None:
+            _save()
+        low = len(pool) < LOW_WATER
+    if low:
+        _wake.set()
+    return item
+
+
+def size(kind):
+    with _lock:
+        return len(_load()[kind])
+
+
+def start_refiller():
+    """Starts a daemon thread that tops up every pool below LOW_WATER."""
+    def loop():
+        while True:
+            _wake.clear()
+            for kind in KINDS:
+                try:
+                    if size(kind) < LOW_WATER:
+                        refill(kind)
+                except Exception as e:
+                    print(f"⚠️ Content pool refill failed for {kind}: {e}")
+            _wake.wait(REFILL_CHECK_INTERVAL)
+
+    threading.Thread(target=loop, daemon=True).start()
@@ -0,0 +1,97 @@
+from html.parser import HTMLParser
+
+# Tags whose text never belongs to the readable body of a post
+SKIP_TAGS = {"head", "script", "style", "noscript", "template", "svg", "nav", "footer", "form"}
+BLOCK_TAGS = {"p", "div", "br", "li", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "tr", "section", "article"}
+
+
+class TextExtractor(HTMLParser):
+    """Collects readable text from HTML, skipping markup that carries no content."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+    def text(self):
+        lines = (" ".join(line.split()) for line in "".join(self.parts).splitlines())
+        return "\n".join(line for line in lines if line)
+
+
+def html_to_text(html):
+    """Returns the readable text of an HTML fragment or page."""
+    parser = TextExtractor()
+    parser.feed(html or "")
+    parser.close()
+    return parser.text()
+
+
+class ArticleExtractor(TextExtractor):
+    """
+    Streaming extractor for full pages: keeps the text inside `<article>` (or the whole body
+    when the page has none) and can stop early once enough article text has been read.
+    """
+
+    def __init__(self, max_chars=None):
+        super().__init__()
+        self.max_chars = max_chars
+        self.article_parts = []
+        self._article_depth = 0
+        self._article_chars = 0
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "article":
+            self._article_depth += 1
+        super().handle_starttag(tag, attrs)
+        if self._article_depth and tag in BLOCK_TAGS:
+            self.article_parts.append("\n")
+
+    def handle_endtag(self, tag):
+        super().handle_endtag(tag)
+        if self._article_depth and tag in BLOCK_TAGS:
+            self.article_parts.append("\n")
+        if tag == "article" and self._article_depth:
+            self._article_depth -= 1
+            if not self._article_depth and self._article_chars:
+                self.done = True  # Main article finished, the rest is page chrome
+
+    def handle_data(self, data):
+        super().handle_data(data)
+        if self._article_depth and not self._skip_depth:
+            self.article_parts.append(data)
+            self._article_chars += len(data)
+            if self.max_chars and self._article_chars >= self.max_chars:
+                self.done = True
+
+    def text(self):
+        if self._article_chars:
+            self.parts = self.article_parts
+        body = super().text()
+        return body[: self.max_chars] if self.max_chars else body
+
+
+def extract_article_text(chunks, max_chars=None):
+    """Feeds decoded HTML chunks through `ArticleExtractor`, stopping as soon as the article is read."""
+    parser = ArticleExtractor(max_chars)
+    for chunk in chunks:
+        parser.feed(chunk)
+        if parser.done:
+            break
+    return parser.text()
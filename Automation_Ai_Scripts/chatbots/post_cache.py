@@ -0,0 +1,210 @@
+import os
+import time
+import threading
+import requests
+from datetime import datetime
+from dotenv import load_dotenv
+import jwt
+
+# In-memory index of Ghost posts shared by the chatbot commands.
+# Warmed once at startup, then refreshed incrementally by `updated_at`.
+load_dotenv()
+
+BLOG_URL = os.getenv("BLOG_URL", "https://bytewhere.com")
+GHOST_CONTENT_API_URL = os.getenv("GHOST_CONTENT_API_URL", f"{BLOG_URL}/ghost/api/content")
+GHOST_CONTENT_API_KEY = os.getenv("GHOST_CONTENT_API_KEY")
+GHOST_API_URL = os.getenv("GHOST_API_URL")  # Admin posts endpoint (scheduled posts)
+GHOST_ADMIN_API_KEY = os.getenv("GHOST_ADMIN_API_KEY")
+
+CACHE_TTL = int(os.getenv("POST_CACHE_TTL", 300))  # Seconds before a refresh is due
+REFRESH_INTERVAL = int(os.getenv("POST_CACHE_REFRESH", 120))  # Background refresh period
+FULL_RESYNC_EVERY = 30  # Full reload every N refreshes to drop deleted/unpublished posts
+REQUEST_TIMEOUT = 10
+
+_lock = threading.Lock()
+_posts = {}  # post id -> post
+_ordered = []  # published posts, newest first
+_scheduled = []
+_last_updated_at = None
+_last_refresh = 0.0
+_refresh_count = 0
+_refreshing = False
+_listeners = []
+
+
+def _admin_token():
+    key_id, secret = GHOST_ADMIN_API_KEY.split(":")
+    iat = int(datetime.now().timestamp())
+    header = {"alg": "HS256", "kid": key_id, "typ": "JWT"}
+    payload = {"exp": iat + 5 * 60, "iat": iat, "aud": "/admin/"}
+    return jwt.encode(payload, bytes.fromhex(secret), algorithm="HS256", headers=header)
+
+
+def fetch_posts(since=None):
+    """Fetches published posts from the Content API, optionally only those updated after `since`."""
+    params = {"key": GHOST_CONTENT_API_KEY, "limit": "all", "order": "updated_at asc"}
+    if since:
+        params["filter"] = f"updated_at:>'{since}'"
+
+    response = requests.get(f"{GHOST_CONTENT_API_URL}/posts/", params=params, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json().get("posts", [])
+
+
+def fetch_scheduled_posts():
+    """Fetches upcoming scheduled posts from the Admin API."""
+    if not GHOST_API_URL or not GHOST_ADMIN_API_KEY:
+        return []
+
+    headers = {"Authorization": f"Ghost {_admin_token()}"}
+    params = {"filter": "status:scheduled", "fields": "id,title,slug,published_at", "order": "published_at asc"}
+    response = requests.get(GHOST_API_URL, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json().get("posts", [])
+
+
+def add_listener(callback):
+    """Registers `callback(changed_posts, removed_ids)`, called after every refresh that changes the index."""
+    _listeners.append(callback)
+
+
+def _notify(changed, removed):
+    if not changed and not removed:
+        return
+    for callback in list(_listeners):
+        try:
+            callback(changed, removed)
+        except Exception as e:
+            print(f"❌ Post cache listener failed: {e}")
+
+
+def _rebuild_order():
+    global _ordered
+    _ordered = sorted(_posts.values(), key=lambda p: p.get("published_at") or "", reverse=True)
+
+
+def refresh(full=False):
+    """Pulls new/updated posts from Ghost and merges them into the index."""
+    global _last_updated_at, _last_refresh, _refresh_count, _scheduled
+
+    full = full or _last_updated_at is None or _refresh_count % FULL_RESYNC_EVERY == 0
+    posts = fetch_posts(None if full else _last_updated_at)
+
+    try:
+        scheduled = fetch_scheduled_posts()
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️ Could not refresh scheduled posts: {e}")
+        scheduled = _scheduled
+
+    with _lock:
+        removed = []
+        if full:
+            fresh_ids = {p["id"] for p in posts}
+            removed = [post_id for post_id in _posts if post_id not in fresh_ids]
+            for post_id in removed:
+                del _posts[post_id]
+
+        changed = [p for p in posts if _posts.get(p["id"], {}).get("updated_at") != p.get("updated_at")]
+        for post in changed:
+            _posts[post["id"]] = post
+
+        if posts:
+            latest = max(p.get("updated_at") or "" for p in posts)
+            _last_updated_at = max(_last_updated_at or "", latest)
+
+        _scheduled = scheduled
+        _rebuild_order()
+        _last_refresh = time.monotonic()
+        _refresh_count += 1
+
+    _notify(changed, removed)
+    return len(changed)
+
+
+def warm():
+    """Loads the full post set. Called once at bot startup."""
+    try:
+        count = refresh(full=True)
+        print(f"✅ Post cache warmed with {count} posts.")
+    except Exception as e:  # Bad JSON or a listener error must not stop the bot's startup
+        print(f"❌ Post cache warm-up failed: {e!r}")
+
+
+def _refresh_in_background():
+    global _refreshing
+    try:
+        refresh()
+    except Exception as e:  # Keep the refresher thread alive whatever went wrong
+        print(f"⚠️ Background post refresh failed: {e!r}")
+    finally:
+        _refreshing = False
+
+
+def _revalidate_if_stale():
+    """Serves stale data immediately and refreshes in the background once the TTL has passed."""
+    global _refreshing
+    if time.monotonic() - _last_refresh < CACHE_TTL:
+        return
+    with _lock:
+        if _refreshing:
+            return
+        _refreshing = True
+    threading.Thread(target=_refresh_in_background, daemon=True).start()
+
+
+def start_refresher(interval=REFRESH_INTERVAL):
+    """Starts a daemon thread that keeps the index fresh."""
+    def loop():
+        global _refreshing
+        while True:
+            time.sleep(interval)
+            with _lock:
+                if _refreshing:
+                    continue
+                _refreshing = True
+            _refresh_in_background()
+
+    threading.Thread(target=loop, daemon=True).start()
+
+
+def upsert(post):
+    """Adds or replaces a single post (e.g. from a webhook) without a Ghost round trip."""
+    with _lock:
+        _posts[post["id"]] = post
+        _rebuild_order()
+    _notify([post], [])
+
+
+def get_post(post_id):
+    return _posts.get(post_id)
+
+
+def find_by_url(url):
+    """Returns the cached post whose URL matches `url` (ignoring a trailing slash), if any."""
+    url = url.rstrip("/")
+    return next((p for p in _ordered if post_url(p).rstrip("/") == url), None)
+
+
+def all_posts():
+    _revalidate_if_stale()
+    return list(_ordered)
+
+
+def latest_posts(limit=1):
+    _revalidate_if_stale()
+    return _ordered[:limit]
+
+
+def scheduled_posts():
+    _revalidate_if_stale()
+    return list(_scheduled)
+
+
+def search_titles(keyword):
+    """Case-insensitive title match over the cached posts."""
+    keyword = keyword.lower()
+    return [p for p in all_posts() if keyword in p.get("title", "").lower()]
+
+
+def post_url(post):
+    return post.get("url") or f"{BLOG_URL}/{post['slug']}"
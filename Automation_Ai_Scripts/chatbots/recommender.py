@@ -0,0 +1,72 @@
+import threading
+import numpy as np
+from scipy.sparse import csr_matrix, diags
+import search_index
+
+# Local retrieval stage for !recommend: TF-IDF vectors for every cached post kept in one
+# L2-normalized sparse matrix, so ranking a query is a single matrix-vector product.
+
+TOP_K = 5
+
+_lock = threading.Lock()
+_generation = -1
+_post_ids = []
+_vocab = {}  # term -> column
+_idf = None
+_matrix = None  # shape (posts, terms), rows L2-normalized
+
+
+def _rebuild():
+    """Rebuilds the TF-IDF matrix when the search index has changed since the last build."""
+    global _generation, _post_ids, _vocab, _idf, _matrix
+
+    generation, docs = search_index.snapshot()
+    if generation == _generation:
+        return
+
+    post_ids = list(docs)
+    vocab = {}
+    rows, cols, values = [], [], []
+    for row, post_id in enumerate(post_ids):
+        for term, tf in docs[post_id].items():
+            rows.append(row)
+            cols.append(vocab.setdefault(term, len(vocab)))
+            values.append(tf)
+
+    tf = 1 + np.log(np.asarray(values, dtype=np.float32))  # Sublinear TF
+    matrix = csr_matrix((tf, (rows, cols)), shape=(len(post_ids), len(vocab)), dtype=np.float32)
+
+    doc_freq = np.bincount(cols, minlength=len(vocab))
+    idf = (np.log((1 + len(post_ids)) / (1 + doc_freq)) + 1).astype(np.float32)
+    matrix = matrix @ diags(idf)
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    matrix = diags(1 / np.where(norms == 0, 1, norms)) @ matrix
+
+    _generation, _post_ids, _vocab, _idf, _matrix = generation, post_ids, vocab, idf, matrix
+
+
+def rank(query, k=TOP_K):
+    """Returns up to `k` (post id, cosine similarity) pairs for the query, best first."""
+    with _lock:
+        _rebuild()
+        if _matrix is None or not _post_ids:
+            return []
+
+        query_vector = np.zeros(len(_vocab), dtype=np.float32)
+        for term in search_index.tokenize(query):
+            column = _vocab.get(term)
+            if column is not None:
+                query_vector[column] += 1
+
+        if not query_vector.any():
+            return []
+
+        nonzero = query_vector > 0
+        query_vector[nonzero] = (1 + np.log(query_vector[nonzero])) * _idf[nonzero]
+        scores = _matrix @ (query_vector / np.linalg.norm(query_vector))
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(_post_ids[i], float(scores[i])) for i in top if scores[i] > 0]
@@ -0,0 +1,212 @@
+import os
+import re
+import json
+import math
+import bisect
+import threading
+from collections import Counter
+from html_text import html_to_text
+
+# Local BM25 full-text index over cached blog posts (titles, excerpts and body text).
+
+SEARCH_INDEX_FILE = "search_index.json"
+INDEX_VERSION = 1
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_WEIGHT = 3  # Title terms count as this many body occurrences
+PREFIX_WEIGHT = 0.6  # Score multiplier for prefix-expanded terms
+MAX_PREFIX_EXPANSIONS = 25
+
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "was", "what", "when", "with", "you", "your",
+}
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+SUFFIXES = ("ational", "ization", "fulness", "ousness", "iveness", "ations", "ation", "ating", "ated",
+            "ates", "ator", "ate", "ments", "ment", "ness", "ings", "ing", "ies", "ied", "ers", "er",
+            "ed", "ly", "es", "s")
+
+_lock = threading.Lock()
+_docs = {}  # post id -> {"title", "url", "slug", "updated_at", "length", "terms": {term: tf}}
+_postings = {}  # term -> {post id: tf}
+_total_length = 0
+_sorted_terms = None  # Lazily rebuilt for prefix lookups
+_generation = 0  # Bumped on every change so dependent views know when to rebuild
+
+
+def stem(word):
+    """Light suffix-stripping stemmer (keeps at least a 3-letter stem)."""
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[: -len(suffix)]
+            if suffix in ("ies", "ied"):
+                word += "y"
+            break
+    return word
+
+
+def tokenize(text):
+    """Lowercases, splits, drops stop words and stems."""
+    return [stem(token) for token in TOKEN_RE.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def _document_terms(post):
+    body = html_to_text(post.get("html") or post.get("plaintext") or "")
+    excerpt = post.get("custom_excerpt") or post.get("excerpt") or ""
+    terms = Counter(tokenize(f"{excerpt} {body}"))
+    for term in tokenize(post.get("title", "")):
+        terms[term] += TITLE_WEIGHT
+    return terms
+
+
+def _add(post_id, doc):
+    global _total_length, _sorted_terms, _generation
+    _generation += 1
+    _docs[post_id] = doc
+    _total_length += doc["length"]
+    for term, tf in doc["terms"].items():
+        if term not in _postings:
+            _postings[term] = {}
+            _sorted_terms = None
+        _postings[term][post_id] = tf
+
+
+def _remove(post_id):
+    global _total_length, _sorted_terms, _generation
+    doc = _docs.pop(post_id, None)
+    if not doc:
+        return
+    _generation += 1
+    _total_length -= doc["length"]
+    for term in doc["terms"]:
+        postings = _postings.get(term)
+        if postings is None:
+            continue
+        postings.pop(post_id, None)
+        if not postings:
+            del _postings[term]
+            _sorted_terms = None
+
+
+def index_posts(posts):
+    """Adds or re-indexes posts whose `updated_at` changed. Returns the number indexed."""
+    indexed = 0
+    with _lock:
+        for post in posts:
+            current = _docs.get(post["id"])
+            if current and current["updated_at"] == post.get("updated_at"):
+                continue
+            terms = _document_terms(post)
+            _remove(post["id"])
+            _add(post["id"], {
+                "title": post.get("title", ""),
+                "url": post.get("url"),
+                "slug": post.get("slug", ""),
+                "updated_at": post.get("updated_at"),
+                "length": sum(terms.values()),
+                "terms": dict(terms),
+            })
+            indexed += 1
+    return indexed
+
+
+def remove_posts(post_ids):
+    with _lock:
+        for post_id in post_ids:
+            _remove(post_id)
+
+
+def sync(posts):
+    """Makes the index match `posts` exactly (drops documents that no longer exist)."""
+    live_ids = {post["id"] for post in posts}
+    stale_ids = [post_id for post_id in list(_docs) if post_id not in live_ids]
+    remove_posts(stale_ids)
+    if index_posts(posts) or stale_ids:
+        save()
+
+
+def on_posts_changed(changed, removed):
+    """`post_cache` listener: keeps the index in step with the cached post set."""
+    remove_posts(removed)
+    if index_posts(changed) or removed:
+        save()
+
+
+def snapshot():
+    """Returns (generation, {post id: term counts}) for building derived views such as TF-IDF vectors."""
+    with _lock:
+        return _generation, {post_id: doc["terms"] for post_id, doc in _docs.items()}
+
+
+def _expand(term):
+    """Returns [(term, weight)] for an exact query term plus its prefix completions."""
+    global _sorted_terms
+    if _sorted_terms is None:
+        _sorted_terms = sorted(_postings)
+
+    matches = [(term, 1.0)] if term in _postings else []
+    start = bisect.bisect_left(_sorted_terms, term)
+    for candidate in _sorted_terms[start:start + MAX_PREFIX_EXPANSIONS + 1]:
+        if not candidate.startswith(term):
+            break
+        if candidate != term:
+            matches.append((candidate, PREFIX_WEIGHT))
+    return matches
+
+
+def search(query, limit=5):
+    """Returns up to `limit` (score, doc) pairs ranked by BM25 relevance."""
+    raw_terms = [token for token in TOKEN_RE.findall(query.lower()) if token not in STOP_WORDS]
+    if not raw_terms:
+        return []
+
+    scores = Counter()
+    with _lock:
+        doc_count = len(_docs)
+        if not doc_count:
+            return []
+        avg_length = _total_length / doc_count
+
+        for raw in raw_terms:
+            expansions = dict(_expand(stem(raw)))
+            for term, weight in _expand(raw):
+                expansions[term] = max(weight, expansions.get(term, 0))
+
+            for term, weight in expansions.items():
+                postings = _postings[term]
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for post_id, tf in postings.items():
+                    norm = 1 - BM25_B + BM25_B * _docs[post_id]["length"] / avg_length
+                    scores[post_id] += weight * idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+
+        return [(score, _docs[post_id]) for post_id, score in scores.most_common(limit)]
+
+
+def save(path=SEARCH_INDEX_FILE):
+    """Persists the index so the bot can start without re-tokenizing every post."""
+    with _lock:
+        data = {"version": INDEX_VERSION, "docs": _docs}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(data, file)
+    os.replace(tmp_path, path)
+
+
+def load(path=SEARCH_INDEX_FILE):
+    """Loads a persisted index; postings are rebuilt from the stored per-document term counts."""
+    if not os.path.exists(path):
+        return 0
+    try:
+        with open(path, "r") as file:
+            data = json.load(file)
+    except (json.JSONDecodeError, OSError) as e:
+        print(f"⚠️ Ignoring unreadable search index: {e}")
+        return 0
+    if data.get("version") != INDEX_VERSION:
+        return 0
+
+    with _lock:
+        for post_id, doc in data.get("docs", {}).items():
+            _add(post_id, doc)
+    return len(_docs)
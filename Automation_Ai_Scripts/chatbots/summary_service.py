@@ -0,0 +1,142 @@
+import os
+import json
+import queue
+import hashlib
+import threading
+import requests
+from datetime import datetime, timedelta, timezone
+from html_text import extract_article_text, html_to_text
+
+# Summaries for !summary, cached by URL and validated with the page ETag/Last-Modified
+# and a hash of the extracted article text, so repeat requests skip GPT entirely.
+
+SUMMARY_CACHE_FILE = "summary_cache.json"
+MAX_ARTICLE_CHARS = 6000  # Article text sent to GPT (tags and <head> already stripped)
+PRECOMPUTE_WINDOW_DAYS = 7  # Only newly published posts are summarized ahead of time
+REQUEST_TIMEOUT = 15
+
+_lock = threading.Lock()
+_cache = None
+_summarizer = None
+_pending = queue.Queue()
+
+
+def _normalize_url(url):
+    return url.split("#")[0].split("?")[0].rstrip("/")
+
+
+def _content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _load_cache():
+    global _cache
+    if _cache is None:
+        try:
+            with open(SUMMARY_CACHE_FILE, "r") as file:
+                _cache = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            _cache = {}
+    return _cache
+
+
+def _store(url, entry):
+    with _lock:
+        cache = _load_cache()
+        cache[url] = entry
+        tmp_path = f"{SUMMARY_CACHE_FILE}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(cache, file, indent=2)
+        os.replace(tmp_path, SUMMARY_CACHE_FILE)
+
+
+def set_summarizer(summarize):
+    """Sets the `summarize(text) -> str` callable used for cache misses (the chatbot's GPT call)."""
+    global _summarizer
+    _summarizer = summarize
+
+
+def cached_summary(url):
+    entry = _load_cache().get(_normalize_url(url))
+    return entry["summary"] if entry else None
+
+
+def _summarize_text(url, text, etag=None, last_modified=None):
+    """Returns the cached summary when the article text is unchanged, otherwise asks GPT."""
+    content_hash = _content_hash(text)
+    entry = _load_cache().get(url)
+    if entry and etag is None and last_modified is None:
+        # No HTTP response (summarize_post): keep the validators from the last page download
+        etag, last_modified = entry.get("etag"), entry.get("last_modified")
+    if entry and entry.get("content_hash") == content_hash:
+        if etag != entry.get("etag") or last_modified != entry.get("last_modified"):
+            _store(url, {**entry, "etag": etag, "last_modified": last_modified})
+        return entry["summary"]
+
+    summary = _summarizer(text)
+    if summary:
+        _store(url, {
+            "summary": summary,
+            "content_hash": content_hash,
+            "etag": etag,
+            "last_modified": last_modified,
+            "summarized_at": datetime.now(timezone.utc).isoformat(),
+        })
+    return summary
+
+
+def summarize_url(url):
+    """Summarizes a blog post URL, using a conditional GET so unchanged pages cost a 304."""
+    url = _normalize_url(url)
+    entry = _load_cache().get(url, {})
+
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    with requests.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+        if response.status_code == 304 and entry:
+            return entry["summary"]
+        if response.status_code != 200:
+            return None
+
+        response.encoding = response.encoding or "utf-8"
+        text = extract_article_text(response.iter_content(chunk_size=8192, decode_unicode=True), MAX_ARTICLE_CHARS)
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+
+    if not text:
+        return None
+    return _summarize_text(url, text, etag, last_modified)
+
+
+def summarize_post(post):
+    """Summarizes a cached Ghost post from its HTML, without downloading the page."""
+    url = post.get("url")
+    text = html_to_text(post.get("html") or "")[:MAX_ARTICLE_CHARS]
+    if not url or not text:
+        return None
+    return _summarize_text(_normalize_url(url), text)
+
+
+def on_posts_changed(changed, removed):
+    """`post_cache` listener: queues recently published posts without a summary for pre-computation."""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=PRECOMPUTE_WINDOW_DAYS)).isoformat()
+    for post in changed:
+        if (post.get("published_at") or "") >= cutoff and post.get("url"):
+            _pending.put(post)
+
+
+def start_precompute_worker():
+    """Starts a daemon thread that summarizes queued posts in the background."""
+    def loop():
+        while True:
+            post = _pending.get()
+            try:
+                summarize_post(post)
+            except Exception as e:
+                print(f"⚠️ Summary pre-compute failed for {post.get('url')}: {e}")
+
+    threading.Thread(target=loop, daemon=True).start()
@@ -0,0 +1,77 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ai_blog_scripts"))
+
+import ai_dedup
+
+# Known pairs for calibrating ai_dedup.THRESHOLD:
+#   python3 -m pytest tests
+
+ORIGINAL = """<h2>Why Password Managers Matter</h2>
+<p>Reusing the same password across websites is one of the most common security mistakes people make.
+When a single service suffers a data breach, attackers try the leaked email and password combination
+on banking, email and shopping sites within hours. A password manager removes that risk by generating
+a long, random and unique password for every account and storing it in an encrypted vault.</p>
+<h2>Choosing a Password Manager</h2>
+<p>Look for end-to-end encryption, a zero-knowledge design, support for two-factor authentication and
+apps for every device you use. Popular options include Bitwarden, 1Password and KeePassXC. Bitwarden is
+open source and free for individuals, while KeePassXC keeps your vault entirely offline.</p>
+<h2>Getting Started</h2>
+<p>Install the browser extension, create a strong master passphrase you can remember, and import the
+passwords saved in your browser. Then change the passwords of your email and banking accounts first,
+because they unlock everything else. Enable two-factor authentication on the vault itself.</p>"""
+
+# The same article rewritten sentence by sentence, as a regenerated post would be
+PARAPHRASE = """<h2>Why You Need a Password Manager</h2>
+<p>Using one password on many websites is among the most common security mistakes people make.
+When a service suffers a data breach, attackers quickly try the leaked email and password combination
+on banking, email and shopping sites. A password manager removes this risk by creating a long, random,
+unique password for each account and keeping it in an encrypted vault.</p>
+<h2>How to Choose a Password Manager</h2>
+<p>Check for end-to-end encryption, a zero-knowledge design, two-factor authentication support and
+apps for all of your devices. Good options include Bitwarden, 1Password and KeePassXC. Bitwarden is
+free for individuals and open source, and KeePassXC keeps the vault completely offline.</p>
+<h2>First Steps</h2>
+<p>Install the browser extension, pick a strong master passphrase you will remember, and import the
+passwords your browser saved. Next, change the passwords of your banking and email accounts first,
+since they unlock everything else. Turn on two-factor authentication for the vault too.</p>"""
+
+# A different article on a neighbouring topic
+DISTINCT = """<h2>Spotting Phishing Emails</h2>
+<p>Phishing emails pretend to come from a bank, a delivery company or your employer and try to make
+you click a link or open an attachment. The message usually creates urgency: an account will be locked,
+a parcel is waiting or an invoice is overdue. Attackers then collect the password you type on a fake
+login page.</p>
+<h2>Warning Signs</h2>
+<p>Check the sender address carefully, hover over links before clicking them and be suspicious of
+unexpected attachments. Spelling mistakes, generic greetings and requests for personal information are
+classic red flags. Legitimate companies rarely ask you to confirm credentials by email.</p>
+<h2>What to Do</h2>
+<p>Report the message to your email provider or IT team, delete it and never reply. If you already
+entered a password, change it immediately and enable two-factor authentication on the account.</p>"""
+
+
+@pytest.fixture(autouse=True)
+def index(tmp_path, monkeypatch):
+    import ai_metrics
+    monkeypatch.setattr(ai_dedup, "DEDUP_DB", str(tmp_path / "dedup_index.db"))
+    monkeypatch.setattr(ai_metrics, "METRICS_DB", str(tmp_path / "metrics.db"))
+    ai_dedup.add_document("ghost:original", "Why Password Managers Matter", ORIGINAL)
+    yield
+    ai_metrics.flush()  # Write the lookup spans here, not to ./metrics.db at exit
+
+
+def test_paraphrase_is_duplicate():
+    duplicate = ai_dedup.find_duplicate(PARAPHRASE)
+    assert duplicate is not None
+    assert duplicate["key"] == "ghost:original"
+
+
+def test_distinct_article_is_new():
+    assert ai_dedup.find_duplicate(DISTINCT) is None
+
+
+def test_empty_body_is_new():
+    assert ai_dedup.find_duplicate("") is None
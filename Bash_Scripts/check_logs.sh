@@ -0,0 +1,24 @@
+#!/bin/bash
+# Quick health report for the AI pipeline logs (uses Python_Scripts/log_process.py).
+# Usage: ./check_logs.sh [log_dir] [runs]
+
+LOG_DIR="${1:-.}"
+RUNS="${2:-30}"
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+LOG_PROCESS="$SCRIPT_DIR/../Python_Scripts/log_process.py"
+
+if ! ls "$LOG_DIR"/ai_pipeline.jsonl* >/dev/null 2>&1; then
+    echo "❌ No ai_pipeline.jsonl logs in $LOG_DIR (run the pipeline with AI_LOG_JSON=1)"
+    exit 1
+fi
+
+echo "⏱️ Stage durations over the last $RUNS runs:"
+python3 "$LOG_PROCESS" "$LOG_DIR" --event stage_finished --group-by stage --stat duration --last-runs "$RUNS"
+
+echo
+echo "📋 Stage outcomes over the last $RUNS runs:"
+python3 "$LOG_PROCESS" "$LOG_DIR" --event stage_finished --group-by outcome --last-runs "$RUNS"
+
+echo
+echo "❌ Errors in the last 24h:"
+python3 "$LOG_PROCESS" "$LOG_DIR" --level ERROR --since 24h --tail 20
@@ -0,0 +1,167 @@
+import argparse
+import glob
+import gzip
+import json
+import os
+import re
+import sys
+from collections import OrderedDict, defaultdict, deque
+from datetime import datetime, timedelta, timezone
+
+# Streams JSON Lines logs (including rotated and gzipped files) one record at a time,
+# filters them and prints aggregations, so multi-gigabyte logs never sit in memory.
+#
+# Examples:
+#   python3 log_process.py ai_pipeline.jsonl --event stage_finished --group-by stage --stat duration --last-runs 30
+#   python3 log_process.py ai_pipeline.jsonl --level ERROR --since 24h
+#   python3 log_process.py ai_pipeline.jsonl --run-id 3f2a9c1b7d4e --tail 50
+
+
+def log_files(path):
+    """Returns `path` plus its rotations (path.1, path.2.gz, ...) ordered oldest first."""
+    if os.path.isdir(path):
+        path = os.path.join(path, "ai_pipeline.jsonl")
+
+    def rotation_number(name):
+        match = re.search(r"\.(\d+)(\.gz)?$", name)
+        return int(match.group(1)) if match else 0
+
+    rotated = [name for name in glob.glob(f"{glob.escape(path)}.*") if re.search(r"\.\d+(\.gz)?$", name)]
+    files = sorted(rotated, key=rotation_number, reverse=True)
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_records(files):
+    """Yields parsed records from each file in turn, skipping lines that are not valid JSON."""
+    for name in files:
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(name, "rt", encoding="utf-8", errors="replace") as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def parse_since(value):
+    """Accepts an ISO timestamp or a relative age such as 30m, 24h or 7d."""
+    match = re.fullmatch(r"(\d+)([mhd])", value)
+    if match:
+        unit = {"m": "minutes", "h": "hours", "d": "days"}[match.group(2)]
+        return datetime.now(timezone.utc) - timedelta(**{unit: int(match.group(1))})
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def build_filter(args):
+    since = parse_since(args.since) if args.since else None
+    pattern = re.compile(args.grep, re.IGNORECASE) if args.grep else None
+
+    def matches(record):
+        if args.level and record.get("level") != args.level.upper():
+            return False
+        for key in ("stage", "run_id", "outcome", "event"):
+            wanted = getattr(args, key)
+            if wanted and record.get(key) != wanted:
+                return False
+        if since and datetime.fromisoformat(record["ts"]) < since:
+            return False
+        if pattern and not pattern.search(record.get("msg", "")):
+            return False
+        return True
+
+    return matches
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3) if values else None,
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+        "max": values[-1] if values else None,
+    }
+
+
+def aggregate(records, group_by, stat, last_runs):
+    """
+    Groups matching records by `group_by` and collects the numeric `stat` field.
+    With `last_runs`, only the most recent N run IDs are kept (older runs are evicted as newer ones appear).
+    """
+    runs = OrderedDict()  # run_id -> {group: [values]}
+    for record in records:
+        run_id = record.get("run_id") or "-"
+        if run_id not in runs:
+            runs[run_id] = defaultdict(list)
+            if last_runs and len(runs) > last_runs:
+                runs.popitem(last=False)
+        value = record.get(stat) if stat else 1
+        if isinstance(value, (int, float)):
+            runs[run_id][record.get(group_by, "-")].append(value)
+
+    groups = defaultdict(list)
+    for run in runs.values():
+        for group, values in run.items():
+            groups[group].extend(values)
+    return {group: summarize(values) for group, values in sorted(groups.items())}, len(runs)
+
+
+def print_table(results, group_by):
+    print(f"{group_by:<30} {'count':>7} {'mean':>10} {'p50':>10} {'p95':>10} {'max':>10}")
+    for group, stats in results.items():
+        row = [stats[key] if stats[key] is not None else "-" for key in ("mean", "p50", "p95", "max")]
+        print(f"{str(group):<30} {stats['count']:>7} " + " ".join(f"{str(value):>10}" for value in row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query AI pipeline JSON Lines logs.")
+    parser.add_argument("path", nargs="?", default="ai_pipeline.jsonl", help="Log file or directory")
+    parser.add_argument("--since", help="ISO timestamp or relative age (30m, 24h, 7d)")
+    parser.add_argument("--level", help="Only records at this level (INFO, WARNING, ERROR)")
+    parser.add_argument("--stage", help="Only records from this stage")
+    parser.add_argument("--run-id", dest="run_id", help="Only records from this run")
+    parser.add_argument("--outcome", help="Only records with this outcome (ok, failed, ...)")
+    parser.add_argument("--event", help="Only records for this event (stage_finished, ...)")
+    parser.add_argument("--grep", help="Regex matched against the message")
+    parser.add_argument("--group-by", dest="group_by", help="Aggregate by this field")
+    parser.add_argument("--stat", help="Numeric field to aggregate (e.g. duration); counts records if omitted")
+    parser.add_argument("--last-runs", dest="last_runs", type=int, help="Only aggregate the most recent N runs")
+    parser.add_argument("--tail", type=int, help="Print only the last N matching records")
+    parser.add_argument("--json", action="store_true", help="Print aggregations as JSON")
+    args = parser.parse_args()
+
+    files = log_files(args.path)
+    if not files:
+        print(f"❌ No log files found for {args.path}")
+        sys.exit(1)
+
+    matches = build_filter(args)
+    records = (record for record in read_records(files) if matches(record))
+
+    if args.group_by:
+        results, run_count = aggregate(records, args.group_by, args.stat, args.last_runs)
+        if args.json:
+            print(json.dumps(results, indent=2))
+        else:
+            print(f"📊 {run_count} run(s) across {len(files)} file(s)")
+            print_table(results, args.group_by)
+        return
+
+    if args.tail:
+        records = deque(records, maxlen=args.tail)
+    for record in records:
+        print(json.dumps(record, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()